@@ -1,9 +1,10 @@
 import os
+import threading
 from datetime import timedelta
 from flask import Flask, redirect, render_template_string
 from dotenv import load_dotenv
 
-from app.db import init_db
+from app.db import get_session, init_db
 
 # Blueprints (deine bestehenden)
 from app.blueprints.core.routes import core_bp
@@ -16,9 +17,36 @@ from app.blueprints.admin.routes import admin_bp  # ok, auch wenn /admin -> Dash
 # Meta-Blueprint (Healthcheck)
 from app.blueprints.meta.routes import meta_bp
 
+# Versions-Token der Medien (Feed-URLs)
+from app.services.media_service import backfill_media_versions
+
+# Asset-Registry (Altbestand an Thumbnails)
+from app.services.asset_service import sweep_legacy_thumbnails
+
 # Settings
 from app.services.settings_service import ensure_default_settings, get_settings_dict
 
+# Hintergrund-Transcoding (H.264-Renditions)
+from app.services.transcode_service import configure_transcoding, resume_transcodes
+
+# Bild-Derivate (Display-Profile)
+from app.services.derivative_service import parse_display_profiles
+
+# Single-Flight/Parallelitätslimit für Thumbnails
+from app.services.single_flight import thumb_flight
+
+# Optionaler gepackter Thumbnail-Speicher (experimentell)
+from app.services.thumb_pack import configure_thumb_pack
+
+# Upload-Nachbearbeitung im Hintergrund (Probe, Thumbnails)
+from app.services.ingest_service import configure_ingest, ingest_target, resume_ingests
+
+# Uploads: hashend direkt in den Medienordner spoolen
+from app.services.upload_service import UploadRequest
+
+# CLI (flask slidepi ...)
+from app.cli import slidepi_cli
+
 # Rollen-Helpers
 from app.services.roles import get_current_role, has_role, can
 
@@ -26,6 +54,7 @@ from app.services.roles import get_current_role, has_role, can
 def create_app() -> Flask:
     load_dotenv()
     app = Flask(__name__, template_folder="templates", static_folder="static")
+    app.request_class = UploadRequest
 
     # Secrets / DB
     app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev-secret-change-me")
@@ -44,9 +73,75 @@ def create_app() -> Flask:
     app.config["MAX_CONTENT_LENGTH"] = max_mb * 1024 * 1024
     app.config["ALLOWED_MIME_PREFIXES"] = ("image/", "video/")
 
+    # Auslieferung von /media/raw: "none" (send_file, nutzt wsgi.file_wrapper falls
+    # vom Server angeboten), "x-accel" (nginx, internal location) oder "x-sendfile"
+    # (Apache/lighttpd). Range-Requests übernimmt im Offload-Fall der Webserver.
+    app.config["MEDIA_OFFLOAD"] = os.getenv("MEDIA_OFFLOAD", "none").strip().lower()
+    app.config["MEDIA_ACCEL_PREFIX"] = os.getenv("MEDIA_ACCEL_PREFIX", "/_protected_media/")
+    app.config["USE_X_SENDFILE"] = app.config["MEDIA_OFFLOAD"] == "x-sendfile"
+
+    # Video-Renditions: Zielauflösung/-bitrate des Displays; TRANSCODE=0 schaltet ab
+    app.config["TRANSCODE_ENABLED"] = os.getenv("TRANSCODE", "1").strip().lower() not in ("0", "false", "no", "off")
+    app.config["TRANSCODE_MAX_WIDTH"] = int(os.getenv("TRANSCODE_MAX_WIDTH", "1920"))
+    app.config["TRANSCODE_MAX_HEIGHT"] = int(os.getenv("TRANSCODE_MAX_HEIGHT", "1080"))
+    app.config["TRANSCODE_MAX_KBPS"] = int(os.getenv("TRANSCODE_MAX_KBPS", "8000"))
+    configure_transcoding(
+        enabled=app.config["TRANSCODE_ENABLED"],
+        max_width=app.config["TRANSCODE_MAX_WIDTH"],
+        max_height=app.config["TRANSCODE_MAX_HEIGHT"],
+        max_kbps=app.config["TRANSCODE_MAX_KBPS"],
+    )
+
+    # Display-Profile für Bild-Derivate (/media/display), z. B. "1920x1080,3840x2160"
+    app.config["DISPLAY_PROFILES"] = parse_display_profiles(os.getenv("DISPLAY_PROFILES", "1920x1080"))
+
+    # Max. parallele Thumbnail-/Derivat-Erzeugungen (schont die CPU für die Wiedergabe)
+    app.config["THUMB_WORKERS"] = int(os.getenv("THUMB_WORKERS", "2"))
+    thumb_flight.set_max_concurrent(app.config["THUMB_WORKERS"])
+
+    # Max. gleichzeitige Push-Verbindungen (/api/feed/stream); jede hält einen Server-Thread
+    app.config["SSE_MAX_STREAMS"] = int(os.getenv("SSE_MAX_STREAMS", "16"))
+
+    # Parallele Nachbearbeitungen neuer Uploads (Remux/Probe/Thumbnails)
+    app.config["INGEST_WORKERS"] = int(os.getenv("INGEST_WORKERS", "2"))
+    configure_ingest(app.config["INGEST_WORKERS"])
+
+    # Experimentell: Thumbnails in einer mmap-Pack-Datei statt als einzelne Dateien
+    # (spart Inodes/SD-Blöcke; Ladezeit vorher auf der Zielhardware messen)
+    app.config["THUMB_PACK"] = os.getenv("THUMB_PACK", "0").strip().lower() in ("1", "true", "yes", "on")
+    configure_thumb_pack(
+        os.path.abspath(os.path.join(app.root_path, "media", "_thumbs")) if app.config["THUMB_PACK"] else None
+    )
+
     # DB initialisieren
     init_db()
 
+    # Versions-Token für Bestandsmedien (einmalig; danach liest der Feed nur die Spalte)
+    db = get_session()
+    try:
+        backfill_media_versions(db)
+    finally:
+        db.close()
+
+    # Nach Neustart liegengebliebene Transcode-/Ingest-Jobs wieder aufnehmen – erst beim
+    # ersten Request: CLI-Läufe, Skripte und der Reloader-Elternprozess (DEBUG)
+    # bedienen keine Requests und starten so keine zweiten Worker
+    resume_lock = threading.Lock()
+    resumed = []
+
+    @app.before_request
+    def resume_background_jobs():
+        if resumed:
+            return
+        with resume_lock:
+            if resumed:
+                return
+            resumed.append(True)
+            resume_transcodes(os.path.join(app.root_path, "media", "_renditions"))
+            resume_ingests(ingest_target(app))
+            # Thumbnails im alten Namensschema (<name>_thumb.jpg) einmalig entfernen
+            sweep_legacy_thumbnails(os.path.join(app.root_path, "media", "_thumbs"))
+
     # Standard-Settings sicherstellen (idempotent)
     ensure_default_settings()
 
@@ -67,6 +162,9 @@ def create_app() -> Flask:
         # Route ist (noch) nicht vorhanden; App bleibt lauffähig in PyCharm
         pass
 
+    # Wartungsbefehle
+    app.cli.add_command(slidepi_cli)
+
     # Settings + Rollen für Templates bereitstellen
     @app.context_processor
     def inject_settings_and_roles():
@@ -1,17 +1,35 @@
 # app/blueprints/api/routes.py
 from __future__ import annotations
-from typing import List, Dict, Any
-from flask import Blueprint, jsonify, request, make_response
+from typing import List, Dict, Any, Iterator
+from flask import Blueprint, Response, current_app, jsonify, request, make_response
 from app.db import get_session
 
 from app.services.settings_service import get_setting
+from app.services.feed_cache import (
+    FeedEntry,
+    cached_feed_entries,
+    compute_feed_delta,
+    current_generation,
+    get_cached_feed,
+    get_or_build_feed,
+    invalidate_feed_cache,
+    revalidation_due,
+    wait_for_feed_change,
+)
+from app.services.media_cache import clear_media_cache
+from app.services.revision_service import FeedRevision, get_feed_revision, revision_etag, revision_token
+from app.services.device_service import is_valid_device_id, touch_device, list_devices, assign_device
 from app.services.playlist_service import (
     get_or_create_default_playlist,
     get_playlist_items,
     sort_playlist,
     remove_item,
-    list_active_feed,
+    feed_items,
+    list_active_feed_rows,
     set_item_duration,
+    FeedRow,
+    feed_item_type,
+    effective_duration,
 )
 from app.blueprints.auth.routes import role_required
 
@@ -28,7 +46,7 @@ from app.services.category_service import (
 )
 from app.models.media import Media
 
-import os, sys, time, platform, shutil, hashlib, json
+import os, sys, time, platform, shutil, json, threading
 
 try:
     import psutil  # type: ignore
@@ -37,55 +55,295 @@ except Exception:
 
 api_bp = Blueprint("api", __name__)
 
+# SSE: Heartbeat hält Proxies/Browser wach, MAX_AGE gibt den Thread regelmäßig frei
+# (EventSource verbindet sich danach selbstständig neu).
+SSE_HEARTBEAT_S = 15
+SSE_MAX_AGE_S = 300
+SSE_RETRY_MS = 3000
+
+# Offene Streams (Obergrenze: SSE_MAX_STREAMS, darüber 503 -> Player pollt)
+_sse_lock = threading.Lock()
+_sse_open = 0
+
+# Kompakt-Feed: Werte pro JSON-Chunk (hält Encoder-Puffer klein)
+COMPACT_CHUNK = 512
+
 # -----------------------
 # Helpers
 # -----------------------
-def _feed_etag(feed_payload: list[dict[str, Any]]) -> str:
-    serial = json.dumps(
-        [
-            {
-                "media_id": it.get("media_id"),
-                "duration": it.get("duration"),
-                "mime": it.get("mime"),
-                "path": it.get("path"),
-            }
-            for it in feed_payload
-        ],
-        sort_keys=True,
-        ensure_ascii=False,
-        separators=(",", ":"),
-    ).encode("utf-8", errors="ignore")
-    return hashlib.sha256(serial).hexdigest()
+def _default_duration() -> int:
+    raw = get_setting("default_duration")
+    try:
+        return int(raw) if raw is not None and str(raw).strip() else 10
+    except (TypeError, ValueError):
+        return 10
+
+def _current_feed_revision(db, playlist_id: int | None = None) -> FeedRevision:
+    """Revision der Playlist (None/unbekannt -> aktive Playlist, notfalls 'Default' anlegen)."""
+    rev = get_feed_revision(db, playlist_id) if playlist_id is not None else None
+    if rev is None:
+        rev = get_feed_revision(db)
+    if rev is None:
+        get_or_create_default_playlist(db)
+        rev = get_feed_revision(db)
+    return rev
+
+def _dumps(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _build_feed(playlist_id: int | None = None) -> FeedEntry:
+    db = get_session()
+    try:
+        # Revision VOR dem Feed lesen: ein paralleler Write macht den ETag höchstens älter, nie neuer
+        rev = _current_feed_revision(db, playlist_id)
+        rows = list_active_feed_rows(db, rev[0])
+    finally:
+        db.close()
+    default_duration = _default_duration()
+    payload = feed_items(rows, default_duration)
+    token = revision_token(rev)
+    body = _dumps({"ok": True, "revision": token, "feed": payload})
+    # Spaltenformat gleich mit erzeugen: der Player holt den Feed kompakt,
+    # bei warmem Cache kostet das dann weder DB-Zugriff noch Serialisierung
+    compact = list(_compact_feed_chunks(rows, token, default_duration))
+    return FeedEntry(rev[0], body, revision_etag(rev), token, payload, compact)
+
+def _revalidate(entry: FeedEntry, playlist_id: int | None) -> FeedEntry | None:
+    """
+    Vergleicht den Snapshot mit der persistierten Revision (Änderungen aus
+    anderen Prozessen, z. B. CLI). Veraltet -> verwerfen, None zurück.
+    """
+    db = get_session()
+    try:
+        token = revision_token(_current_feed_revision(db, playlist_id))
+    finally:
+        db.close()
+    if token == entry.revision:
+        return entry
+    same_global = token.rsplit(".", 1)[-1] == entry.revision.rsplit(".", 1)[-1]
+    if not same_global:
+        # Medien von außen geändert (CLI: migrate-storage, probe-media): Pfade/Versionen neu laden
+        clear_media_cache()
+    invalidate_feed_cache(entry.playlist_id if same_global else None)
+    return None
+
+def _revalidate_cached_feeds() -> None:
+    """
+    Prüft fällige Snapshots gegen die persistierte Revision (Heartbeat der
+    Push-Streams), damit Änderungen aus CLI/anderen Workern die Streams wecken.
+    """
+    active = get_cached_feed()
+    for entry in cached_feed_entries():
+        if revalidation_due(entry):
+            if _revalidate(entry, None if entry is active else entry.playlist_id) is None:
+                return  # invalidiert -> Streams wachen auf, Rest beim nächsten Heartbeat
+
+def _delta_body(entry: FeedEntry, since: str) -> bytes | None:
+    """Serialisierte Delta-Antwort (pro Entry + since gecacht) oder None -> Vollabzug."""
+    body = entry.deltas.get(since)
+    if body is None:
+        delta = compute_feed_delta(since, entry)
+        if delta is None:
+            return None
+        body = _dumps({"ok": True, "delta": True, "since": since, "revision": entry.revision, **delta})
+        entry.deltas[since] = body
+    return body
+
+def _compact_feed_chunks(rows: List[FeedRow], token: str, default_duration: int) -> Iterator[str]:
+    """
+    Spaltenorientierter Feed als Stream:
+    {"ok", "format": "columnar", "revision", "count", "mimes": [...],
+     "columns": {"playlist_item_id": [...], "position": [...], "media_id": [...],
+                 "mime": [<index in mimes>], "duration": [...], "filename": [...],
+                 "version": [...], "width": [...], "height": [...], "playable": [...]}}
+    URLs leitet der Client aus media_id + version ab (/media/raw/<id>/<version>
+    bzw. /media/display/<id>/<version> für Bilder, /media/thumb/<id>/<version>;
+    ohne version unversioniert).
+    """
+    rows = [r for r in rows if feed_item_type(r.mime) != "unknown"]
+    mime_idx: Dict[str, int] = {}
+    for r in rows:
+        mime_idx.setdefault(r.mime, len(mime_idx))
+
+    yield (
+        '{"ok":true,"format":"columnar","revision":' + json.dumps(token)
+        + ',"count":' + str(len(rows))
+        + ',"mimes":' + json.dumps(list(mime_idx), ensure_ascii=False)
+        + ',"columns":{'
+    )
+    columns = (
+        ("playlist_item_id", lambda r: r.playlist_item_id),
+        ("position", lambda r: r.position),
+        ("media_id", lambda r: r.media_id),
+        ("mime", lambda r: mime_idx[r.mime]),
+        ("duration", lambda r: effective_duration(r.duration_override_s, default_duration)),
+        ("filename", lambda r: r.filename),
+        ("version", lambda r: r.version),
+        ("width", lambda r: r.width),
+        ("height", lambda r: r.height),
+        ("playable", lambda r: r.playable),
+    )
+    for n, (name, get) in enumerate(columns):
+        yield ("," if n else "") + json.dumps(name) + ":["
+        for i in range(0, len(rows), COMPACT_CHUNK):
+            part = json.dumps([get(r) for r in rows[i:i + COMPACT_CHUNK]],
+                              ensure_ascii=False, separators=(",", ":"))
+            yield ("," if i else "") + part[1:-1]
+        yield "]"
+    yield "}}"
+
+def _compact_feed_response(entry: FeedEntry):
+    """Spaltenformat aus dem Snapshot streamen (Chunks liegen fertig im FeedEntry)."""
+    resp = Response(iter(entry.compact), mimetype="application/json")
+    resp.headers["ETag"] = entry.etag
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+def _feed_not_modified(etag: str):
+    resp = make_response("", 304)
+    resp.headers["ETag"] = etag
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
 
 # -----------------------
 # Feed für den Player (mit ETag/304)
 # -----------------------
 @api_bp.get("/feed")
 def api_feed():
-    raw = get_setting("default_duration")
+    """
+    Vollständiger Feed oder – mit ?since=<revision> – nur die Änderungen seit
+    dieser Revision. Ist `since` zu alt/unbekannt, kommt der Vollabzug.
+    ?format=compact liefert den Vollabzug spaltenorientiert (aus dem Snapshot).
+    ?device=<id> liefert für registrierte Displays (POST /api/devices/<id>) den
+    Snapshot der zugewiesenen Playlist (Displays mit gleicher Playlist teilen
+    ihn sich); unbekannte IDs bekommen die aktive Playlist.
+    """
+    inm = request.headers.get("If-None-Match")
+    since = (request.args.get("since") or "").strip()
+    compact = request.args.get("format") == "compact"
+    device = (request.args.get("device") or "").strip()
+    if device and not is_valid_device_id(device):
+        return jsonify({"ok": False, "error": "invalid device id"}), 400
     try:
-        default_duration = int(raw) if raw is not None and str(raw).strip() else 10
-    except (TypeError, ValueError):
-        default_duration = 10
+        playlist_id = touch_device(device) if device else None
+        entry = get_cached_feed(playlist_id)
+        if entry is not None and revalidation_due(entry):
+            entry = _revalidate(entry, playlist_id)
+        if entry is None:
+            # Cache leer (z. B. nach Neustart): Revision reicht für die 304-Prüfung
+            if inm:
+                db = get_session()
+                try:
+                    etag = revision_etag(_current_feed_revision(db, playlist_id))
+                finally:
+                    db.close()
+                if inm == etag:
+                    return _feed_not_modified(etag)
+            entry = get_or_build_feed(lambda: _build_feed(playlist_id), playlist_id)
+        if inm and inm == entry.etag:
+            return _feed_not_modified(entry.etag)
+        body = _delta_body(entry, since) if since else None
+        if body is None and compact:
+            return _compact_feed_response(entry)
+        body = body or entry.body
+    except Exception as e:
+        return jsonify({"ok": False, "error": f"feed-error: {e}"}), 500
+
+    resp = make_response(body)
+    resp.mimetype = "application/json"
+    resp.headers["ETag"] = entry.etag
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+# -----------------------
+# Push-Kanal (Server-Sent Events) für Playlist-Änderungen
+# -----------------------
+@api_bp.get("/feed/stream")
+def api_feed_stream():
+    """
+    Sendet `event: revision` bei jeder Feed-Invalidierung.
+    Hält keine DB-Session: gewartet wird auf eine Condition im Feed-Cache;
+    im Heartbeat werden fällige Snapshots gegen die persistierte Revision
+    geprüft (Änderungen aus CLI/anderen Prozessen).
+    Jeder Stream belegt einen Server-Thread; über SSE_MAX_STREAMS hinaus
+    kommt 503 und der Player bleibt beim Polling.
+    """
+    global _sse_open
+    with _sse_lock:
+        if _sse_open >= current_app.config.get("SSE_MAX_STREAMS", 16):
+            resp = jsonify({"ok": False, "error": "too many streams"})
+            resp.status_code = 503
+            resp.headers["Retry-After"] = str(SSE_MAX_AGE_S)
+            return resp
+        _sse_open += 1
+
+    def release():
+        global _sse_open
+        with _sse_lock:
+            _sse_open -= 1
+
+    def stream():
+        last = current_generation()
+        yield f"retry: {SSE_RETRY_MS}\n"
+        yield f"event: revision\ndata: {last}\n\n"
+        deadline = time.monotonic() + SSE_MAX_AGE_S
+        while time.monotonic() < deadline:
+            gen = wait_for_feed_change(last, timeout=SSE_HEARTBEAT_S)
+            if gen == last:
+                _revalidate_cached_feeds()
+                gen = current_generation()
+            if gen == last:
+                yield ": ping\n\n"
+                continue
+            last = gen
+            yield f"event: revision\ndata: {gen}\n\n"
 
+    resp = Response(stream(), mimetype="text/event-stream")
+    resp.call_on_close(release)
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"  # nginx: nicht puffern
+    return resp
+
+# -----------------------
+# Displays (Multi-Display)
+# -----------------------
+@api_bp.get("/devices")
+@role_required(("admin", "editor"))
+def api_list_devices():
     db = get_session()
     try:
-        payload = list_active_feed(db, default_duration=default_duration)
-        etag = _feed_etag(payload)
-
-        inm = request.headers.get("If-None-Match")
-        if inm and inm == etag:
-            resp = make_response("", 304)
-            resp.headers["ETag"] = etag
-            resp.headers["Cache-Control"] = "no-store"
-            return resp
+        return jsonify({"ok": True, "devices": [
+            {
+                "id": d.id,
+                "name": d.name,
+                "playlist_id": d.playlist_id,
+                "last_seen": d.last_seen.isoformat(timespec="seconds") if d.last_seen else None,
+            }
+            for d in list_devices(db)
+        ]})
+    finally:
+        db.close()
 
-        resp = jsonify({"ok": True, "feed": payload})
-        resp.headers["ETag"] = etag
-        resp.headers["Cache-Control"] = "no-store"
-        return resp
-    except Exception as e:
-        return jsonify({"ok": False, "error": f"feed-error: {e}"}), 500
+@api_bp.post("/devices/<string:device_id>")
+@role_required(("admin", "editor"))
+def api_assign_device(device_id: str):
+    """Payload: {"playlist_id": int | null, "name": str (optional)}"""
+    if not is_valid_device_id(device_id):
+        return jsonify({"ok": False, "error": "invalid device id"}), 400
+    data = request.get_json(silent=True) or {}
+    playlist_id = data.get("playlist_id")
+    name = data.get("name")
+    if playlist_id is not None and not isinstance(playlist_id, int):
+        return jsonify({"ok": False, "error": "playlist_id must be int or null"}), 400
+    if name is not None and not isinstance(name, str):
+        return jsonify({"ok": False, "error": "name must be a string"}), 400
+
+    db = get_session()
+    try:
+        d = assign_device(db, device_id, playlist_id, name)
+        if not d:
+            return jsonify({"ok": False, "error": "playlist not found"}), 404
+        return jsonify({"ok": True, "device": {"id": d.id, "name": d.name, "playlist_id": d.playlist_id}})
     finally:
         db.close()
 
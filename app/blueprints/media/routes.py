@@ -19,9 +19,14 @@ from app.services.media_service import (
     add_media_record,
     get_media as svc_get_media,
     is_allowed_mime,
-    secure_unique_path,
     ensure_thumbnail,
-    probe_video_duration_seconds,
+    thumb_filename_for,
+    thumb_mime,
+    SPRITE,
+    SPRITE_FRAMES,
+    thumb_width_for,
+    media_url as svc_media_url,
+    playback_note,
 )
 # Services für Ordner/Kategorien – je nachdem was vorhanden ist
 try:
@@ -37,6 +42,32 @@ except Exception:
     svc_create_category = None  # type: ignore
 
 from app.services.playlist_service import get_or_create_default_playlist, add_item_to_playlist_end
+from app.services.feed_cache import invalidate_feed_cache
+from app.services.revision_service import bump_global_revision
+from app.services.derivative_service import (
+    get_image_derivative,
+    negotiate_format,
+    pick_profile,
+)
+from app.services.asset_service import delete_media_assets, register_media_assets
+from app.services.thumb_pack import get_thumb_pack
+from app.services.storage_service import allocate_media_path
+from app.services.ingest_service import DONE_STATES, enqueue_ingest, ingest_progress, ingest_target
+from app.services.upload_service import (
+    MAX_CHUNK_BYTES,
+    UploadError,
+    create_upload_session,
+    discard_upload_session,
+    find_duplicate,
+    get_upload_session,
+    hash_file,
+    ingest_lock,
+    is_complete,
+    save_upload,
+    session_status,
+    write_chunk,
+)
+from app.services.media_cache import get_media_entry, entry_for_media, evict_media_entry
 from app.blueprints.auth.routes import role_required
 
 media_bp = Blueprint("media", __name__)
@@ -115,6 +146,69 @@ def attach_folder_alias(items):
                 pass
 
 
+def get_thumbs_dir() -> str:
+    media_dir = os.path.abspath(os.path.join(current_app.root_path, ".", "media"))
+    return os.path.join(media_dir, "_thumbs")
+
+def get_renditions_dir() -> str:
+    media_dir = os.path.abspath(os.path.join(current_app.root_path, ".", "media"))
+    return os.path.join(media_dir, "_renditions")
+
+def get_derivatives_dir() -> str:
+    media_dir = os.path.abspath(os.path.join(current_app.root_path, ".", "media"))
+    return os.path.join(media_dir, "_derivatives")
+
+IMMUTABLE_MAX_AGE = 31536000  # 1 Jahr
+
+def _mark_immutable(resp, etag: str):
+    """Versionierte URL: darf ohne Revalidierung aus dem Browser-Cache kommen."""
+    resp.set_etag(etag)
+    resp.cache_control.no_cache = None
+    resp.cache_control.public = True
+    resp.cache_control.max_age = IMMUTABLE_MAX_AGE
+    resp.cache_control.immutable = True
+    return resp
+
+def send_media_file(path: str, mime: str, etag: str | None = None):
+    """
+    Liefert eine Mediendatei aus – je nach MEDIA_OFFLOAD direkt oder per
+    X-Accel-Redirect an nginx (der dann auch Range-Requests bedient).
+    X-Sendfile erledigt Flask selbst (USE_X_SENDFILE).
+    Mit `etag` (versionierte URL) als immutable mit starkem ETag.
+    """
+    if current_app.config.get("MEDIA_OFFLOAD") == "x-accel":
+        media_dir = os.path.abspath(os.path.join(current_app.root_path, ".", "media"))
+        rel = os.path.relpath(os.path.abspath(path), media_dir)
+        if not rel.startswith(".."):
+            prefix = current_app.config.get("MEDIA_ACCEL_PREFIX", "/_protected_media/").rstrip("/")
+            resp = current_app.response_class(status=200, mimetype=mime)
+            resp.headers["X-Accel-Redirect"] = f"{prefix}/{rel.replace(os.sep, '/')}"
+            resp.headers["Accept-Ranges"] = "bytes"
+            return _mark_immutable(resp, etag) if etag else resp
+    if etag:
+        resp = send_file(path, mimetype=mime, as_attachment=False, conditional=True, etag=etag)
+        return _mark_immutable(resp, etag)
+    return send_file(path, mimetype=mime, as_attachment=False, conditional=True)
+
+
+@media_bp.app_template_global("media_url")
+def media_url_global(kind: str, m) -> str:
+    """
+    Versionierte URL für Templates: {{ media_url('thumb', m) }}.
+    `m` ist ein Media-Objekt (kein DB-Zugriff) oder eine media_id.
+    """
+    thumbs_dir = get_thumbs_dir()
+    if isinstance(m, int):
+        media_id, entry = m, get_media_entry(m, thumbs_dir)
+    else:
+        media_id, entry = m.id, entry_for_media(m, thumbs_dir)
+    return svc_media_url(kind, media_id, entry.version if entry else None)
+
+
+# {{ playback_note(m) }}: "nicht abspielbar, …" bzw. None (Kacheln, Playlist-Verwaltung)
+media_bp.add_app_template_global(playback_note, "playback_note")
+
+
 @media_bp.app_errorhandler(RequestEntityTooLarge)
 def handle_file_too_large(e):
     max_mb = int(current_app.config.get("MAX_CONTENT_LENGTH", 0) / (1024 * 1024))
@@ -150,7 +244,8 @@ def list_media():
         return render_template("media_grid.html",
                                items=items,
                                folders=folders,
-                               active_folder=active_folder)
+                               active_folder=active_folder,
+                               sprite_frames=SPRITE_FRAMES)
     finally:
         db.close()
 
@@ -162,6 +257,57 @@ def playlist_manage():
 
 
 # ---------------------- UPLOAD ----------------------
+def _ingest_saved_file(save_path: str, safe_name: str, mime: str, target_id: int | None,
+                       content_hash: str | None = None) -> tuple[Media, bool]:
+    """
+    Übernahme einer fertig gespeicherten Datei (Formular-, Batch- und Chunk-Upload):
+    Media-Datensatz anlegen (ingest_status 'pending') und die Nachbearbeitung
+    (Remux/Dauer, Thumbnails/Derivate, Transcode) in den Hintergrund geben.
+    Gibt (medium, neu_angelegt) zurück; bei gleichem Inhalts-Hash wird die
+    Datei verworfen und das bestehende Medium geliefert.
+    """
+    db = get_session()
+    try:
+        with ingest_lock(content_hash or save_path):
+            dup = find_duplicate(db, content_hash)
+            if dup is not None:
+                os.remove(save_path)
+                return dup, False
+
+            m = add_media_record(
+                db,
+                filename=safe_name,
+                path=save_path,
+                mime=mime,
+                content_hash=content_hash,
+                ingest_status="pending",
+            )
+            if target_id:
+                assign_media_container(m, target_id)
+            db.commit()
+            media_id = m.id
+    finally:
+        db.close()
+
+    enqueue_ingest(media_id, ingest_target(current_app))
+    return m, True
+
+
+def _discard_reserved(save_path: str) -> None:
+    """Von allocate_media_path reservierte Datei nach gescheitertem Speichern/Ingest entfernen."""
+    try:
+        os.remove(save_path)
+    except OSError:
+        pass
+
+
+def _upload_result(m: Media, created: bool) -> dict:
+    # wenn alias, gib folder_id trotzdem zurück
+    fid = getattr(m, "folder_id", None) or getattr(m, "category_id", None)
+    return {"id": m.id, "filename": m.filename, "folder_id": fid, "duplicate": not created,
+            "status": m.ingest_status or "ready"}
+
+
 @media_bp.route("/upload", methods=["POST"])
 @role_required(("admin", "editor"))
 def upload_media():
@@ -186,69 +332,366 @@ def upload_media():
         return redirect(url_for("core.index"))
 
     media_dir = os.path.abspath(os.path.join(current_app.root_path, ".", "media"))
-    thumbs_dir = os.path.join(media_dir, "_thumbs")
     os.makedirs(media_dir, exist_ok=True)
-    os.makedirs(thumbs_dir, exist_ok=True)
 
-    safe_name, save_path = secure_unique_path(media_dir, f.filename)
-    f.save(save_path)
+    safe_name, save_path = allocate_media_path(media_dir, f.filename)
+    try:
+        content_hash = save_upload(f, save_path)  # Umbenennen des hashenden Spools, keine Kopie
+        m, created = _ingest_saved_file(save_path, safe_name, f.mimetype or "application/octet-stream",
+                                        target_id, content_hash)
+    except Exception:
+        _discard_reserved(save_path)
+        raise
+
+    if "application/json" in (request.headers.get("Accept") or ""):
+        return jsonify({"ok": True, **_upload_result(m, created)})
+
+    if not created:
+        flash(f"Datei bereits vorhanden als „{m.filename}“.", "info")
+    goto = url_for("media.list_media", folder_id=target_id) if target_id else url_for("media.list_media")
+    return redirect(goto)
+
+
+# ---------------------- BATCH-UPLOAD + FORTSCHRITT ----------------------
+# POST /media/upload/batch   mehrere 'files' in einem Request -> sofort IDs pro Datei
+# GET  /media/ingest?ids=..  Status der Nachbearbeitung (pending/running/ready/failed)
+# GET  /media/tiles?ids=..   fertige Grid-Kacheln (HTML) zum Einfügen ohne Reload
+
+MAX_PROGRESS_IDS = 500
+
+
+def _parse_ids(raw: str | None) -> list[int]:
+    ids = []
+    for part in (raw or "").split(","):
+        part = part.strip()
+        if part.isdigit():
+            ids.append(int(part))
+    return ids[:MAX_PROGRESS_IDS]
+
+
+@media_bp.post("/upload/batch")
+@role_required(("admin", "editor"))
+def upload_batch():
+    files = [f for f in request.files.getlist("files") if f and f.filename]
+    if not files:
+        return jsonify({"ok": False, "error": "no files"}), 400
+    target_id = request.form.get("target_folder_id", type=int) \
+        or request.form.get("category_id", type=int)
+    allowed_prefixes = current_app.config.get("ALLOWED_MIME_PREFIXES", ("image/", "video/"))
+    media_dir = os.path.abspath(os.path.join(current_app.root_path, ".", "media"))
+    os.makedirs(media_dir, exist_ok=True)
+
+    items = []
+    for f in files:
+        if not is_allowed_mime(f.mimetype or "", allowed_prefixes):
+            items.append({"filename": f.filename, "error": "Nicht unterstützter Dateityp."})
+            continue
+        save_path = None
+        try:
+            safe_name, save_path = allocate_media_path(media_dir, f.filename)
+            content_hash = save_upload(f, save_path)
+            m, created = _ingest_saved_file(save_path, safe_name, f.mimetype, target_id, content_hash)
+        except OSError as e:
+            if save_path:
+                _discard_reserved(save_path)
+            current_app.logger.warning("Batch-Upload %s fehlgeschlagen: %s", f.filename, e)
+            items.append({"filename": f.filename, "error": "Speichern fehlgeschlagen."})
+            continue
+        except Exception:
+            if save_path:
+                _discard_reserved(save_path)
+            raise
+        items.append({"upload_name": f.filename, **_upload_result(m, created)})
+    return jsonify({"ok": True, "items": items})
+
+
+@media_bp.get("/ingest")
+@role_required(("admin", "editor"))
+def ingest_status():
+    progress = ingest_progress(_parse_ids(request.args.get("ids")))
+    items = [{"id": i, **p} if p else {"id": i, "status": "missing"} for i, p in progress.items()]
+    resp = jsonify({"ok": True, "items": items,
+                    "done": all(it["status"] in DONE_STATES + ("missing",) for it in items)})
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
 
-    duration = None
-    if (f.mimetype or "").startswith("video/"):
-        duration = probe_video_duration_seconds(save_path)
+@media_bp.get("/tiles")
+@role_required(("admin", "editor"))
+def media_tiles():
+    ids = _parse_ids(request.args.get("ids"))
+    db = get_session()
+    try:
+        rows = db.execute(select(Media).where(Media.id.in_(ids)).order_by(Media.id.desc())).scalars().all()
+        return render_template("media_tiles.html", items=rows, sprite_frames=SPRITE_FRAMES)
+    finally:
+        db.close()
+
+
+# ---------------------- CHUNK-UPLOAD (fortsetzbar) ----------------------
+# POST   /media/uploads                 {filename, size, mime, folder_id} -> 201 + Location
+# PATCH  /media/uploads/<id>            Upload-Offset: n, Body = Chunk    -> 204 + Upload-Offset
+# GET    /media/uploads/<id>            Status inkl. empfangener Bereiche (zum Fortsetzen)
+# HEAD   /media/uploads/<id>            Upload-Offset / Upload-Length (tus-kompatibel)
+# POST   /media/uploads/<id>/finalize   Ingest wie /media/upload       -> {ok, id, filename, folder_id}
+# DELETE /media/uploads/<id>            Abbrechen
+
+def _upload_error(e: UploadError):
+    return jsonify({"ok": False, "error": str(e)}), e.status
 
+
+@media_bp.post("/uploads")
+@role_required(("admin", "editor"))
+def create_upload():
+    data = request.get_json(silent=True) or {}
+    filename = (data.get("filename") or "").strip()
+    mime = (data.get("mime") or "").strip() or "application/octet-stream"
+    size = data.get("size", request.headers.get("Upload-Length"))
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "error": "size fehlt"}), 400
+    if not filename:
+        return jsonify({"ok": False, "error": "filename fehlt"}), 400
+    if not is_allowed_mime(mime, current_app.config.get("ALLOWED_MIME_PREFIXES", ("image/", "video/"))):
+        return jsonify({"ok": False, "error": "Nicht unterstützter Dateityp."}), 400
+    # Ziel-Ordner jetzt prüfen, nicht erst beim Finalisieren (dort wäre es ein 500)
+    folder_id = data.get("folder_id")
+    if folder_id in (None, "", "null"):
+        folder_id = None
+    elif isinstance(folder_id, bool) or not str(folder_id).isdigit():
+        return jsonify({"ok": False, "error": "folder_id muss eine Zahl sein."}), 400
+    else:
+        folder_id = int(folder_id)
+
+    media_dir = os.path.abspath(os.path.join(current_app.root_path, ".", "media"))
     db = get_session()
     try:
-        m = add_media_record(
-            db,
-            filename=safe_name,
-            path=save_path,
-            mime=(f.mimetype or "application/octet-stream"),
-            duration_s=duration
-        )
-        if target_id:
-            assign_media_container(m, target_id)
-        db.commit()
+        if folder_id is not None and not resolve_container_by_id(db, folder_id):
+            return jsonify({"ok": False, "error": "Ziel-Ordner existiert nicht."}), 400
+        s = create_upload_session(db, media_dir, filename, size, mime, folder_id=folder_id)
+        # ein Chunk = ein Request, also auch an MAX_CONTENT_LENGTH gebunden
+        max_chunk = min(MAX_CHUNK_BYTES, current_app.config.get("MAX_CONTENT_LENGTH") or MAX_CHUNK_BYTES)
+        resp = jsonify({"ok": True, **session_status(s), "max_chunk": max_chunk})
+    except UploadError as e:
+        return _upload_error(e)
+    finally:
+        db.close()
+    resp.status_code = 201
+    resp.headers["Location"] = url_for("media.upload_status", upload_id=s.id)
+    return resp
 
-        ensure_thumbnail(m, thumbs_dir)
+
+@media_bp.route("/uploads/<string:upload_id>", methods=["GET", "HEAD"])
+@role_required(("admin", "editor"))
+def upload_status(upload_id: str):
+    db = get_session()
+    try:
+        s = get_upload_session(db, upload_id)
+        if s is None:
+            abort(404)
+        status = session_status(s)
     finally:
         db.close()
+    resp = jsonify({"ok": True, **status}) if request.method == "GET" else current_app.response_class(status=200)
+    resp.headers["Upload-Offset"] = str(status["offset"])
+    resp.headers["Upload-Length"] = str(status["size"])
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
 
-    if "application/json" in (request.headers.get("Accept") or ""):
-        # wenn alias, gib folder_id trotzdem zurück
-        fid = getattr(m, "folder_id", None) or getattr(m, "category_id", None)
-        return jsonify({"ok": True, "id": m.id, "filename": m.filename, "folder_id": fid})
 
-    goto = url_for("media.list_media", folder_id=target_id) if target_id else url_for("media.list_media")
-    return redirect(goto)
+@media_bp.route("/uploads/<string:upload_id>", methods=["PATCH"])
+@role_required(("admin", "editor"))
+def upload_chunk(upload_id: str):
+    try:
+        offset = int(request.headers.get("Upload-Offset", ""))
+    except ValueError:
+        return jsonify({"ok": False, "error": "Upload-Offset fehlt"}), 400
+    length = request.content_length
+    if not length:
+        return jsonify({"ok": False, "error": "Content-Length fehlt"}), 411
+    db = get_session()
+    try:
+        # direkt aus dem Request-Stream in die Zieldatei, ohne Werkzeug-Spooling
+        s = write_chunk(db, upload_id, offset, length, request.stream)
+        status = session_status(s)
+    except UploadError as e:
+        return _upload_error(e)
+    finally:
+        db.close()
+    resp = current_app.response_class(status=204)
+    resp.headers["Upload-Offset"] = str(status["offset"])
+    return resp
 
 
-# ---------------------- RAW / THUMB ----------------------
-@media_bp.route("/raw/<int:media_id>")
-def raw_media(media_id: int):
+@media_bp.post("/uploads/<string:upload_id>/finalize")
+@role_required(("admin", "editor"))
+def finalize_upload(upload_id: str):
     db = get_session()
     try:
-        m = svc_get_media(db, media_id)
-        if not m or not os.path.isfile(m.path):
+        s = get_upload_session(db, upload_id)
+        if s is None:
             abort(404)
-        return send_file(m.path, mimetype=m.mime, as_attachment=False, conditional=True)
+        if s.media_id is None:
+            if not is_complete(s):
+                return jsonify({"ok": False, "error": "Upload unvollständig.", **session_status(s)}), 409
+            # Chunks kamen ungeordnet: Hash in einem sequentiellen Durchgang
+            m, _created = _ingest_saved_file(s.path, s.filename, s.mime, s.folder_id, hash_file(s.path))
+            s.media_id = m.id
+            db.commit()
+        m = db.get(Media, s.media_id)
+        fid = (getattr(m, "folder_id", None) or getattr(m, "category_id", None)) if m else None
+        return jsonify({"ok": True, "id": s.media_id, "filename": m.filename if m else s.filename,
+                        "folder_id": fid, "duplicate": bool(m) and m.path != s.path})
     finally:
         db.close()
 
 
-@media_bp.route("/thumb/<int:media_id>")
-def thumb_media(media_id: int):
+@media_bp.route("/uploads/<string:upload_id>", methods=["DELETE"])
+@role_required(("admin", "editor"))
+def cancel_upload(upload_id: str):
     db = get_session()
     try:
-        m = svc_get_media(db, media_id)
-        if not m or not os.path.isfile(m.path):
+        s = get_upload_session(db, upload_id)
+        if s is None:
             abort(404)
-        media_dir = os.path.abspath(os.path.join(current_app.root_path, ".", "media"))
-        thumbs_dir = os.path.join(media_dir, "_thumbs")
-        thumb_path = ensure_thumbnail(m, thumbs_dir)
-        return send_file(thumb_path, mimetype="image/jpeg", as_attachment=False, conditional=True)
+        discard_upload_session(db, s)
     finally:
         db.close()
+    return current_app.response_class(status=204)
+
+
+# ---------------------- RAW / THUMB ----------------------
+# Beide Routen lesen aus dem LRU-Cache (media_cache): im Normalfall keine
+# DB-Session und kein zusätzliches isfile() pro Request.
+# Mit <version> (siehe media_service.media_url) sind die Antworten immutable;
+# ein veralteter Token wird auf die aktuelle URL umgeleitet.
+def _stale_version_redirect(kind: str, entry):
+    url = svc_media_url(kind, entry.id, entry.version)
+    if request.query_string:
+        url += "?" + request.query_string.decode("latin-1")
+    resp = redirect(url)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+@media_bp.route("/raw/<int:media_id>")
+@media_bp.route("/raw/<int:media_id>/<string:version>")
+def raw_media(media_id: int, version: str | None = None):
+    entry = get_media_entry(media_id, get_thumbs_dir())
+    if entry is None:
+        abort(404)
+    if version is not None and version != entry.version:
+        return _stale_version_redirect("raw", entry)
+    try:
+        return send_media_file(entry.path, entry.mime, etag=version)
+    except FileNotFoundError:
+        evict_media_entry(media_id)
+        abort(404)
+
+
+@media_bp.route("/display/<int:media_id>")
+@media_bp.route("/display/<int:media_id>/<string:version>")
+def display_media(media_id: int, version: str | None = None):
+    """
+    Bild in Display-Größe (derivative_service): Profil aus ?fit=<w>x<h>
+    (Bildschirm in Gerätepixeln), Format aus dem Accept-Header (WebP/JPEG).
+    Nicht ableitbare Medien (Videos, GIFs, ...) kommen unverändert.
+    """
+    entry = get_media_entry(media_id, get_thumbs_dir())
+    if entry is None:
+        abort(404)
+    if version is not None and version != entry.version:
+        return _stale_version_redirect("display", entry)
+
+    profiles = current_app.config["DISPLAY_PROFILES"]
+    w, _, h = (request.args.get("fit") or "").lower().partition("x")
+    fit = (int(w), int(h)) if w.isdigit() and h.isdigit() else None
+    profile = pick_profile(profiles, fit)
+    fmt = negotiate_format(request.headers.get("Accept"))
+
+    derived = get_image_derivative(
+        entry, entry.version, get_derivatives_dir(), profiles, profile, fmt,
+        on_created=lambda created: register_media_assets(entry.id, entry.version, "derivative", created),
+    )
+    try:
+        if derived is None:
+            return send_media_file(entry.path, entry.mime, etag=version)
+        path, mime = derived
+        etag = f"d-{version}-{profile[0]}x{profile[1]}-{fmt}" if version is not None else None
+        resp = send_media_file(path, mime, etag=etag)
+        resp.vary.add("Accept")
+        return resp
+    except FileNotFoundError:
+        evict_media_entry(media_id)
+        abort(404)
+
+
+@media_bp.route("/thumb/<int:media_id>")
+@media_bp.route("/thumb/<int:media_id>/<string:version>")
+def thumb_media(media_id: int, version: str | None = None):
+    """
+    Thumbnail aus dem Satz von ensure_thumbnail. ?w=<px> wählt die kleinste
+    passende Breite und verhandelt WebP/JPEG über Accept; ohne ?w das
+    320er-JPEG wie bisher.
+    """
+    entry = get_media_entry(media_id, get_thumbs_dir())
+    if entry is None:
+        abort(404)
+    if version is not None and version != entry.version:
+        return _stale_version_redirect("thumb", entry)
+    _ensure_thumb_set(entry)
+
+    requested = request.args.get("w", type=int)
+    width = thumb_width_for(requested)
+    fmt = negotiate_format(request.headers.get("Accept")) if requested else "jpeg"
+    resp = _send_thumb_file(entry, thumb_filename_for(entry.id, entry.version, width, fmt),
+                            thumb_mime(fmt), f"t-{entry.version}-{width}-{fmt}", immutable=version is not None)
+    if requested:
+        resp.vary.add("Accept")
+    return resp
+
+
+@media_bp.route("/sprite/<int:media_id>")
+@media_bp.route("/sprite/<int:media_id>/<string:version>")
+def sprite_media(media_id: int, version: str | None = None):
+    """Sprite-Sheet (SPRITE_FRAMES Kacheln nebeneinander) für Hover-Scrubbing von Videos."""
+    entry = get_media_entry(media_id, get_thumbs_dir())
+    if entry is None or not entry.mime.startswith("video/"):
+        abort(404)
+    if version is not None and version != entry.version:
+        return _stale_version_redirect("sprite", entry)
+    _ensure_thumb_set(entry)
+    return _send_thumb_file(entry, thumb_filename_for(entry.id, entry.version, SPRITE, "jpeg"),
+                            thumb_mime("jpeg"), f"s-{entry.version}", immutable=version is not None)
+
+
+def _ensure_thumb_set(entry) -> None:
+    """Thumbnail-Satz (inkl. Sprite bei Videos) einmal pro Cache-Eintrag sicherstellen + registrieren."""
+    if not entry.thumb_ready:
+        register_media_assets(entry.id, entry.version, "thumb",
+                              ensure_thumbnail(entry, os.path.dirname(entry.thumb_path), entry.version))
+        entry.thumb_ready = True
+
+
+def _send_thumb_file(entry, name: str, mime: str, etag: str, immutable: bool):
+    """Datei aus dem Thumbnail-Satz – aus dem Pack (Slice, kein open/stat) oder von der Platte."""
+    pack = get_thumb_pack()
+    try:
+        if pack is not None:
+            data = pack.get(name)
+            if data is None:
+                raise FileNotFoundError(name)
+            resp = current_app.response_class(data, mimetype=mime)
+            resp.set_etag(etag)
+            resp.make_conditional(request)
+        else:
+            resp = send_file(os.path.join(os.path.dirname(entry.thumb_path), name), mimetype=mime,
+                             as_attachment=False, conditional=True)
+    except FileNotFoundError:
+        evict_media_entry(entry.id)
+        abort(404)
+    return _mark_immutable(resp, etag) if immutable else resp
 
 
 # ---------------------- PLAYLIST QUICK ACTION ----------------------
@@ -285,7 +728,10 @@ def rename_media(media_id: int):
             flash("Medium nicht gefunden.", "error")
         else:
             m.filename = new_name
+            bump_global_revision(db)
             db.commit()
+            evict_media_entry(media_id)
+            invalidate_feed_cache()
             flash("Name aktualisiert.", "success")
     finally:
         db.close()
@@ -305,19 +751,19 @@ def delete_media(media_id: int):
         try:
             if m.path and os.path.isfile(m.path):
                 os.remove(m.path)
-            media_dir = os.path.abspath(os.path.join(current_app.root_path, ".", "media"))
-            thumbs_dir = os.path.join(media_dir, "_thumbs")
-            for name in os.listdir(thumbs_dir) if os.path.isdir(thumbs_dir) else []:
-                if name.endswith("_thumb.jpg") and name.startswith(os.path.splitext(os.path.basename(m.filename))[0]):
-                    try:
-                        os.remove(os.path.join(thumbs_dir, name))
-                    except Exception:
-                        pass
+            if m.rendition_path and os.path.isfile(m.rendition_path):
+                os.remove(m.rendition_path)
         except Exception:
             pass
+        # Thumbnails + Derivate über die Registry (Index auf media_id, kein Verzeichnis-Scan);
+        # Zeilen explizit löschen, SQLite erzwingt ON DELETE CASCADE nicht
+        delete_media_assets(db, m.id)
 
         db.delete(m)
+        bump_global_revision(db)
         db.commit()
+        evict_media_entry(media_id)
+        invalidate_feed_cache()
         flash("Medium gelöscht.", "success")
     finally:
         db.close()
@@ -0,0 +1,219 @@
+# app/cli.py
+"""
+Wartungsbefehle: `flask --app main slidepi <befehl>`.
+
+    flask --app main slidepi rebuild-thumbs              # nur fehlende/veraltete
+    flask --app main slidepi rebuild-thumbs --force -j 4 # alles neu, 4 Prozesse
+    flask --app main slidepi gc-assets --dry-run         # verwaiste Thumbnails/Derivate zählen
+    flask --app main slidepi compact-thumbs              # Thumbnail-Pack kompaktieren (THUMB_PACK=1)
+    flask --app main slidepi hash-media                  # Inhalts-Hash für Bestandsmedien nachtragen
+    flask --app main slidepi migrate-storage --dry-run   # flache Originale in media/<ab>/ verschieben
+    flask --app main slidepi probe-media [--force]       # Maße/Codec/Bitrate/fps für Bestandsmedien nachtragen
+"""
+from __future__ import annotations
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from sqlalchemy import select
+
+from app.db import get_session
+from app.models.media import Media
+from app.services.asset_service import collect_asset_garbage, register_media_assets
+from app.services.media_service import apply_media_info, probe_media
+from app.services.revision_service import bump_global_revision
+from app.services.storage_service import migrate_media_storage
+from app.services.thumb_pack import configure_thumb_pack, get_thumb_pack
+from app.services.upload_service import hash_file
+from app.services.rebuild_service import (
+    clear_rebuild_state,
+    list_media_jobs,
+    load_rebuild_state,
+    rebuild_media_job,
+    rebuild_spec,
+    save_rebuild_state,
+)
+
+slidepi_cli = AppGroup("slidepi", help="SlidePi-Wartung.")
+
+STATE_FLUSH_EVERY = 25
+
+
+@slidepi_cli.command("rebuild-thumbs")
+@click.option("-j", "--workers", type=int, default=None, help="Anzahl Prozesse (Standard: CPU-Kerne).")
+@click.option("--force", is_flag=True, help="Auch aktuelle Thumbnails/Derivate neu erzeugen.")
+def rebuild_thumbs(workers: int | None, force: bool) -> None:
+    """Thumbnails und Bild-Derivate aller Medien parallel (neu) erzeugen."""
+    media_dir = os.path.abspath(os.path.join(current_app.root_path, "media"))
+    thumbs_dir = os.path.join(media_dir, "_thumbs")
+    derivatives_dir = os.path.join(media_dir, "_derivatives")
+    profiles = current_app.config["DISPLAY_PROFILES"]
+    spec = rebuild_spec(profiles)
+
+    db = get_session()
+    try:
+        jobs = list_media_jobs(db)
+    finally:
+        db.close()
+
+    done = load_rebuild_state(thumbs_dir, spec) if force else set()
+    if done:
+        click.echo(f"Setze abgebrochenen Lauf fort: {len(done)} bereits erledigt.")
+    jobs = [j for j in jobs if j.id not in done]
+
+    counts = {"built": 0, "skipped": 0, "missing": 0, "error": 0}
+    workers = workers or os.cpu_count() or 1
+    pack_dir = thumbs_dir if get_thumb_pack() is not None else None
+    with ProcessPoolExecutor(max_workers=workers, initializer=configure_thumb_pack, initargs=(pack_dir,)) as ex, \
+            click.progressbar(length=len(jobs), label="Thumbnails") as bar:
+        futures = [ex.submit(rebuild_media_job, j, thumbs_dir, derivatives_dir, profiles, force) for j in jobs]
+        try:
+            for n, fut in enumerate(as_completed(futures), 1):
+                media_id, status, version, created = fut.result()
+                if status.startswith("error"):
+                    counts["error"] += 1
+                    click.echo(f"\n#{media_id}: {status}", err=True)
+                else:
+                    # Registry im Elternprozess pflegen (Worker haben keine DB-Session);
+                    # idempotent, trägt auch Dateien übersprungener Medien nach
+                    for kind in ("thumb", "derivative"):
+                        register_media_assets(media_id, version, kind,
+                                              [(v, p) for k, v, p in created if k == kind])
+                    counts[status] += 1
+                    done.add(media_id)
+                if force and n % STATE_FLUSH_EVERY == 0:
+                    save_rebuild_state(thumbs_dir, spec, done)
+                bar.update(1)
+        except KeyboardInterrupt:
+            # Stand sichern, damit der nächste --force-Lauf hier fortsetzt
+            if force:
+                save_rebuild_state(thumbs_dir, spec, done)
+            ex.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    if counts["error"] and force:
+        save_rebuild_state(thumbs_dir, spec, done)
+    else:
+        clear_rebuild_state(thumbs_dir)
+    click.echo(
+        f"Fertig: {counts['built']} erzeugt, {counts['skipped']} aktuell, "
+        f"{counts['missing']} ohne Datei, {counts['error']} Fehler."
+    )
+
+
+@slidepi_cli.command("gc-assets")
+@click.option("--dry-run", is_flag=True, help="Nur zählen, nichts löschen.")
+def gc_assets(dry_run: bool) -> None:
+    """Verwaiste Thumbnails/Derivate (gelöschte oder geänderte Medien) entfernen."""
+    media_dir = os.path.abspath(os.path.join(current_app.root_path, "media"))
+    dirs = [os.path.join(media_dir, "_thumbs"), os.path.join(media_dir, "_derivatives")]
+    db = get_session()
+    try:
+        stats = collect_asset_garbage(db, dirs, dry_run=dry_run)
+    finally:
+        db.close()
+    pack = get_thumb_pack()
+    if pack is not None and not dry_run and pack.stats()["dead_bytes"]:
+        click.echo(f"Thumbnail-Pack: {pack.compact() // 1024} KiB freigegeben.")
+    prefix = "Würde entfernen" if dry_run else "Entfernt"
+    click.echo(
+        f"{prefix}: {stats['stale_rows']} veraltete Einträge, "
+        f"{stats['orphan_files']} unregistrierte Dateien; "
+        f"{stats['missing_files']} Einträge ohne Datei."
+    )
+
+
+@slidepi_cli.command("compact-thumbs")
+def compact_thumbs() -> None:
+    """Thumbnail-Pack kompaktieren (Platz gelöschter Thumbnails freigeben)."""
+    pack = get_thumb_pack()
+    if pack is None:
+        raise click.ClickException("THUMB_PACK ist nicht aktiv.")
+    before = pack.stats()
+    freed = pack.compact()
+    click.echo(f"{before['items']} Thumbnails, {freed // 1024} KiB freigegeben.")
+
+
+@slidepi_cli.command("hash-media")
+def hash_media() -> None:
+    """
+    SHA-256 für Medien ohne content_hash nachtragen (Dubletten-Erkennung beim Upload).
+    content_hash ist immer der Hash der hochgeladenen Bytes; remuxte Videos bleiben daher ohne.
+    """
+    db = get_session()
+    try:
+        todo = db.execute(select(Media).where(Media.content_hash.is_(None))).scalars().all()
+        hashed = missing = remuxed = 0
+        with click.progressbar(todo, label="Hashes") as bar:
+            for m in bar:
+                if m.remux_saved_bytes:
+                    # abgelegte Datei != hochgeladene: ihr Hash träfe nie eine erneut hochgeladene Dublette
+                    remuxed += 1
+                    continue
+                if not os.path.isfile(m.path):
+                    missing += 1
+                    continue
+                m.content_hash = hash_file(m.path)
+                hashed += 1
+                if hashed % STATE_FLUSH_EVERY == 0:
+                    db.commit()
+        db.commit()
+    finally:
+        db.close()
+    click.echo(f"Fertig: {hashed} gehasht, {missing} ohne Datei, {remuxed} remuxt (übersprungen).")
+
+
+@slidepi_cli.command("probe-media")
+@click.option("--force", is_flag=True, help="Auch bereits geprobte Medien erneut prüfen.")
+def probe_media_cmd(force: bool) -> None:
+    """Metadaten (Maße, Codec, Bitrate, fps, Größe) für Medien ohne Probe nachtragen."""
+    db = get_session()
+    try:
+        stmt = select(Media)
+        if not force:
+            stmt = stmt.where(Media.file_size.is_(None))
+        todo = db.execute(stmt).scalars().all()
+        probed = failed = 0
+        with click.progressbar(todo, label="Probe") as bar:
+            for m in bar:
+                info = probe_media(m.path, m.mime)
+                if info is None:
+                    failed += 1  # Datei fehlt oder ffprobe nicht installiert
+                    continue
+                apply_media_info(m, info)
+                probed += 1
+                if probed % STATE_FLUSH_EVERY == 0:
+                    db.commit()
+        if probed:
+            # neue Revision: laufende Server verwerfen ihren Feed-Snapshot bei der
+            # nächsten Prüfung (feed_cache.REVALIDATE_S), Player holen width/height
+            bump_global_revision(db)
+        db.commit()
+    finally:
+        db.close()
+    click.echo(f"Fertig: {probed} geprobt, {failed} ohne Datei/ffprobe.")
+
+
+@slidepi_cli.command("migrate-storage")
+@click.option("--dry-run", is_flag=True, help="Nur zählen, nichts verschieben.")
+def migrate_storage(dry_run: bool) -> None:
+    """Originale aus dem flachen media/-Ordner in die gestreute Ablage (media/<ab>/) verschieben."""
+    media_dir = os.path.abspath(os.path.join(current_app.root_path, "media"))
+    db = get_session()
+    try:
+        stats = migrate_media_storage(db, media_dir, dry_run=dry_run)
+        if stats["moved"] and not dry_run:
+            # neue Revision: laufende Server verwerfen bei der nächsten Prüfung
+            # (feed_cache.REVALIDATE_S) Feed-Snapshot und Pfad-Cache (media_cache)
+            bump_global_revision(db)
+            db.commit()
+    finally:
+        db.close()
+    prefix = "Würde verschieben" if dry_run else "Verschoben"
+    click.echo(
+        f"{prefix}: {stats['moved']}; bereits gestreut: {stats['already']}, "
+        f"ohne Datei: {stats['missing']}, außerhalb von media/: {stats['external']}."
+    )
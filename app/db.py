@@ -114,10 +114,31 @@ def _ensure_core_tables():
                 );
             """)
 
+# Spalten aus media_service.probe_media (media.py)
+MEDIA_PROBE_COLUMNS = (
+    ("width", "INTEGER"),
+    ("height", "INTEGER"),
+    ("orientation", "VARCHAR(16)"),
+    ("codec", "VARCHAR(32)"),
+    ("pix_fmt", "VARCHAR(32)"),
+    ("bitrate_kbps", "INTEGER"),
+    ("fps", "FLOAT"),
+    ("file_size", "INTEGER"),
+    ("playable", "BOOLEAN"),
+    ("has_audio", "BOOLEAN"),
+)
+
 def _sqlite_safe_migrate():
     """
     Kleine Migration für bestehende SQLite-DB:
     - Spalte media.category_id anhängen, falls sie fehlt.
+    - Spalte playlists.revision anhängen, falls sie fehlt.
+    - Spalten media.rendition_path/rendition_status anhängen, falls sie fehlen.
+    - Spalte media.remux_saved_bytes anhängen, falls sie fehlt.
+    - Spalte media.content_hash (+ Index) anhängen, falls sie fehlt.
+    - Spalte media.ingest_status anhängen, falls sie fehlt.
+    - Metadaten-Spalten (media.width, height, orientation, …) anhängen, falls sie fehlen.
+    - Spalte media.version_token anhängen, falls sie fehlt.
     """
     with engine.begin() as conn:
         conn.exec_driver_sql("PRAGMA foreign_keys=ON")
@@ -127,6 +148,29 @@ def _sqlite_safe_migrate():
                 "ALTER TABLE media ADD COLUMN category_id INTEGER REFERENCES category(id) ON DELETE SET NULL"
             )
 
+        if _sqlite_table_exists(conn, "playlists") and not _sqlite_column_exists(conn, "playlists", "revision"):
+            conn.exec_driver_sql(
+                "ALTER TABLE playlists ADD COLUMN revision INTEGER NOT NULL DEFAULT 0"
+            )
+
+        if _sqlite_table_exists(conn, "media"):
+            if not _sqlite_column_exists(conn, "media", "rendition_path"):
+                conn.exec_driver_sql("ALTER TABLE media ADD COLUMN rendition_path TEXT")
+            if not _sqlite_column_exists(conn, "media", "rendition_status"):
+                conn.exec_driver_sql("ALTER TABLE media ADD COLUMN rendition_status VARCHAR(16)")
+            if not _sqlite_column_exists(conn, "media", "remux_saved_bytes"):
+                conn.exec_driver_sql("ALTER TABLE media ADD COLUMN remux_saved_bytes INTEGER")
+            if not _sqlite_column_exists(conn, "media", "content_hash"):
+                conn.exec_driver_sql("ALTER TABLE media ADD COLUMN content_hash VARCHAR(64)")
+            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_media_content_hash ON media (content_hash)")
+            if not _sqlite_column_exists(conn, "media", "ingest_status"):
+                conn.exec_driver_sql("ALTER TABLE media ADD COLUMN ingest_status VARCHAR(16)")
+            if not _sqlite_column_exists(conn, "media", "version_token"):
+                conn.exec_driver_sql("ALTER TABLE media ADD COLUMN version_token VARCHAR(16)")
+            for col, ddl in MEDIA_PROBE_COLUMNS:
+                if not _sqlite_column_exists(conn, "media", col):
+                    conn.exec_driver_sql(f"ALTER TABLE media ADD COLUMN {col} {ddl}")
+
 # --------------------------------------------------------------------
 # Init DB (auf App-Start)
 # --------------------------------------------------------------------
@@ -146,7 +190,7 @@ def init_db(url: str | None = None):
         SessionLocal.configure(bind=engine)
 
     # Modelle importieren, damit ihre Tabellen bei Base registriert werden
-    from app.models import user, system, playlist, category, tag, media, setting  # noqa: F401
+    from app.models import user, system, playlist, category, tag, media, setting, device, media_asset, upload_session  # noqa: F401
 
     # Tabellen erstellen (nur fehlende)
     Base.metadata.create_all(bind=engine)
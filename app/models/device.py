@@ -0,0 +1,19 @@
+# app/models/device.py
+from __future__ import annotations
+from datetime import datetime
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, DateTime, ForeignKey
+from app.models.base import Base
+
+class Device(Base):
+    """Registrierter Bildschirm/Player (Multi-Display)."""
+    __tablename__ = "devices"
+
+    id:          Mapped[str] = mapped_column(String(64), primary_key=True)   # vom Player gewählt (?device=…)
+    name:        Mapped[str | None] = mapped_column(String(128), nullable=True)
+    # None = folgt der global aktiven Playlist
+    playlist_id: Mapped[int | None] = mapped_column(ForeignKey("playlists.id", ondelete="SET NULL"), nullable=True)
+    last_seen:   Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<Device {self.id}>"
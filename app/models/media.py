@@ -1,7 +1,7 @@
 from __future__ import annotations
 from datetime import datetime
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, DateTime, Text, ForeignKey
+from sqlalchemy import Boolean, Float, Integer, String, DateTime, Text, ForeignKey
 from app.db import Base
 from app.models.tag import media_tags, Tag
 from app.models.folder import Folder
@@ -14,7 +14,39 @@ class Media(Base):
     path:        Mapped[str] = mapped_column(Text)
     mime:        Mapped[str] = mapped_column(String(128))
     duration_s:  Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # Faststart-Remux beim Ingest: eingesparte Bytes (None = nicht remuxt)
+    remux_saved_bytes: Mapped[int | None] = mapped_column(Integer, nullable=True)
     uploaded_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # SHA-256 der hochgeladenen Bytes (vor Remux) – Dubletten-Erkennung beim Upload
+    content_hash: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
+
+    # Wiedergabe-Rendition für Videos (H.264, siehe transcode_service)
+    # Status: None | pending | running | ready | skipped | failed
+    rendition_path:   Mapped[str | None] = mapped_column(Text, nullable=True)
+    rendition_status: Mapped[str | None] = mapped_column(String(16), nullable=True)
+
+    # Nachbearbeitung nach dem Upload (Probe, Thumbnails, siehe ingest_service)
+    # Status: None (Bestand) | pending | running | ready | failed
+    ingest_status:    Mapped[str | None] = mapped_column(String(16), nullable=True)
+
+    # Versions-Token der ausgelieferten Datei (Original bzw. fertige Rendition), siehe
+    # media_service.refresh_media_version – der Feed liest ihn, statt jede Datei zu stat()en
+    version_token:    Mapped[str | None] = mapped_column(String(16), nullable=True)
+
+    # Metadaten aus einer Probe beim Ingest (ffprobe bzw. Pillow, siehe media_service.probe_media)
+    # width/height wie angezeigt (EXIF-/Rotations-Tag berücksichtigt); None = noch nicht geprobt
+    width:        Mapped[int | None] = mapped_column(Integer, nullable=True)
+    height:       Mapped[int | None] = mapped_column(Integer, nullable=True)
+    orientation:  Mapped[str | None] = mapped_column(String(16), nullable=True)  # landscape | portrait | square
+    codec:        Mapped[str | None] = mapped_column(String(32), nullable=True)  # h264, hevc, jpeg, png, …
+    pix_fmt:      Mapped[str | None] = mapped_column(String(32), nullable=True)
+    bitrate_kbps: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    fps:          Mapped[float | None] = mapped_column(Float, nullable=True)
+    file_size:    Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # Kann der Player das Original direkt abspielen? None = unbekannt
+    playable:     Mapped[bool | None] = mapped_column(Boolean, nullable=True)
+    # Tonspur vorhanden (nur Videos; Remux entfernt sie)? None = unbekannt
+    has_audio:    Mapped[bool | None] = mapped_column(Boolean, nullable=True)
 
     # Ordner-Zuweisung (flat, keine Unterordner)
     folder_id:   Mapped[int | None] = mapped_column(ForeignKey("folders.id", ondelete="SET NULL"), nullable=True)
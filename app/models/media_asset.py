@@ -0,0 +1,25 @@
+# app/models/media_asset.py
+from __future__ import annotations
+from datetime import datetime
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, String, Text, DateTime, ForeignKey, UniqueConstraint
+from app.models.base import Base
+
+class MediaAsset(Base):
+    """Abgeleitete Datei eines Mediums (Thumbnail, Display-Derivat) – Registry statt Verzeichnis-Scan."""
+    __tablename__ = "media_assets"
+    __table_args__ = (
+        UniqueConstraint("media_id", "kind", "variant", "content_key", name="uq_media_assets_variant"),
+    )
+
+    id:          Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    media_id:    Mapped[int] = mapped_column(ForeignKey("media.id", ondelete="CASCADE"), index=True)
+    kind:        Mapped[str] = mapped_column(String(16))        # "thumb" | "derivative"
+    variant:     Mapped[str] = mapped_column(String(32))        # z. B. "320.webp", "1920x1080.jpeg"
+    content_key: Mapped[str] = mapped_column(String(64))        # Versions-Token der Quelle
+    path:        Mapped[str] = mapped_column(Text)
+    size:        Mapped[int | None] = mapped_column(Integer, nullable=True)
+    created_at:  Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f"<MediaAsset {self.media_id}:{self.kind}/{self.variant}>"
@@ -7,6 +7,8 @@ class Playlist(Base):
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(128), unique=True)
     is_active: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Monoton steigender Zähler, wird bei jeder Änderung der Items erhöht (Feed-ETag)
+    revision: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
     items: Mapped[list["PlaylistItem"]] = relationship(
         back_populates="playlist",
         cascade="all, delete-orphan",
@@ -0,0 +1,24 @@
+# app/models/upload_session.py
+from __future__ import annotations
+from datetime import datetime
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import BigInteger, Integer, String, Text, DateTime
+from app.models.base import Base
+
+class UploadSession(Base):
+    """Laufender, fortsetzbarer Chunk-Upload (siehe upload_service)."""
+    __tablename__ = "upload_sessions"
+
+    id:         Mapped[str] = mapped_column(String(32), primary_key=True)       # zufälliges Token
+    filename:   Mapped[str] = mapped_column(String(255))                        # endgültiger (sicherer) Name
+    path:       Mapped[str] = mapped_column(Text)                               # Zieldatei, wird direkt beschrieben
+    mime:       Mapped[str] = mapped_column(String(127))
+    size:       Mapped[int] = mapped_column(BigInteger)                         # Upload-Length
+    received:   Mapped[str] = mapped_column(Text, default="[]")                 # JSON: [[start, end), ...]
+    folder_id:  Mapped[int | None] = mapped_column(Integer, nullable=True)
+    media_id:   Mapped[int | None] = mapped_column(Integer, nullable=True)      # nach finalize
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f"<UploadSession {self.id} {self.filename}>"
@@ -0,0 +1,166 @@
+# app/services/asset_service.py
+"""
+Registry der abgeleiteten Dateien (Thumbnails, Display-Derivate).
+
+Jede erzeugte Datei bekommt eine Zeile in media_assets, geschlüsselt über
+(media_id, kind, variant, content_key). Damit:
+- löscht delete_media genau die Dateien eines Mediums (Index auf media_id)
+  statt das ganze _thumbs-Verzeichnis nach Namenspräfixen zu durchsuchen,
+- findet die Garbage Collection (`flask slidepi gc-assets`) verwaiste
+  Dateien: Zeilen zu gelöschten Medien, Zeilen mit veraltetem content_key
+  (Quelle hat sich geändert) und Dateien ohne Zeile.
+
+Erzeuger (ensure_thumbnail, ensure_image_derivatives) arbeiten ohne DB und
+geben die neu angelegten Dateien zurück; die Aufrufer registrieren sie hier.
+"""
+from __future__ import annotations
+import os
+import time
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.db import get_session
+from app.models.media import Media
+from app.models.media_asset import MediaAsset
+from app.services.media_service import media_version_for_path, playback_source
+from app.services.thumb_pack import asset_exists, get_thumb_pack, pack_locator, remove_assets
+
+PART_MAX_AGE_S = 3600  # liegengebliebene Temp-Dateien (.part) nach 1 h entfernen
+# Erzeuger schreiben zuerst die Datei und registrieren danach: jüngere Dateien ohne Zeile nicht anfassen
+ORPHAN_GRACE_S = 600
+
+# Thumbnails der Ursprungsversion (<name>_thumb.jpg) stehen in keiner Registry
+LEGACY_THUMB_SUFFIX = "_thumb.jpg"
+LEGACY_SWEEP_MARKER = ".legacy-thumbs-swept"
+
+
+def register_media_assets(media_id: int, content_key: str, kind: str, items: Iterable[Tuple[str, str]]) -> None:
+    """Trägt neu erzeugte Dateien [(variant, pfad)] ein bzw. aktualisiert sie."""
+    items = list(items)
+    if not items:
+        return
+    db = get_session()
+    try:
+        existing = {
+            a.variant: a for a in db.execute(
+                select(MediaAsset).where(
+                    MediaAsset.media_id == media_id,
+                    MediaAsset.kind == kind,
+                    MediaAsset.content_key == content_key,
+                )
+            ).scalars()
+        }
+        for variant, path in items:
+            size = os.path.getsize(path) if os.path.isfile(path) else None
+            asset = existing.get(variant)
+            if asset is None:
+                db.add(MediaAsset(media_id=media_id, kind=kind, variant=variant,
+                                  content_key=content_key, path=path, size=size))
+            else:
+                asset.path, asset.size = path, size
+        db.commit()
+    finally:
+        db.close()
+
+
+def delete_media_assets(db: Session, media_id: int) -> int:
+    """Entfernt alle registrierten Dateien eines Mediums samt Zeilen (im Aufrufer-Commit)."""
+    paths = db.execute(select(MediaAsset.path).where(MediaAsset.media_id == media_id)).scalars().all()
+    remove_assets(paths)
+    db.execute(delete(MediaAsset).where(MediaAsset.media_id == media_id))
+    return len(paths)
+
+
+def collect_asset_garbage(db: Session, asset_dirs: Sequence[str], dry_run: bool = False) -> Dict[str, int]:
+    """
+    Räumt verwaiste Assets auf:
+    - Zeilen ohne Medium oder mit veraltetem content_key -> Datei + Zeile weg
+    - Zeilen, deren Datei fehlt -> Zeile weg
+    - Dateien in `asset_dirs` ohne Zeile -> Datei weg, erst nach ORPHAN_GRACE_S
+      (Temp-Dateien erst nach PART_MAX_AGE_S)
+    - Schlüssel im Thumbnail-Pack ohne Zeile und ohne aktuelle Version des
+      Mediums -> Tombstone (kompaktieren macht der Aufrufer). Das Pack kennt
+      kein Alter pro Record; ein frisch gepackter, noch nicht registrierter
+      Satz trägt aber immer die aktuelle Version und bleibt so stehen.
+    """
+    stats = {"stale_rows": 0, "missing_files": 0, "orphan_files": 0}
+    current: Dict[int, str] = {}
+    for m in db.execute(select(Media)).scalars():
+        path, _mime = playback_source(m)
+        current[m.id] = media_version_for_path(path) or "0"
+
+    keep: set = set()
+    doomed: List[int] = []
+    stale_paths: List[str] = []
+    for asset in db.execute(select(MediaAsset)).scalars():
+        if current.get(asset.media_id) != asset.content_key:
+            stats["stale_rows"] += 1
+            doomed.append(asset.id)
+            stale_paths.append(asset.path)
+        elif not asset_exists(asset.path):
+            stats["missing_files"] += 1
+            doomed.append(asset.id)
+        else:
+            keep.add(os.path.abspath(asset.path))
+    if doomed and not dry_run:
+        remove_assets(stale_paths)
+        db.execute(delete(MediaAsset).where(MediaAsset.id.in_(doomed)))
+        db.commit()
+
+    pack = get_thumb_pack()
+    if pack is not None:
+        orphans = [
+            k for k in pack.keys()
+            if pack_locator(pack, k) not in keep and not _is_current_thumb_key(k, current)
+        ]
+        stats["orphan_files"] += len(orphans)
+        if orphans and not dry_run:
+            pack.discard(orphans)
+
+    now = time.time()
+    for directory in asset_dirs:
+        if not os.path.isdir(directory):
+            continue
+        with os.scandir(directory) as it:
+            for e in it:
+                if not e.is_file() or os.path.abspath(e.path) in keep:
+                    continue
+                if e.name.startswith("."):
+                    # Statusdateien behalten, Temp-Dateien nur wenn alt
+                    if not e.name.endswith(".part") or now - e.stat().st_mtime < PART_MAX_AGE_S:
+                        continue
+                elif now - e.stat().st_mtime < ORPHAN_GRACE_S:
+                    continue  # evtl. gerade erzeugt, Registrierung folgt
+                stats["orphan_files"] += 1
+                if not dry_run:
+                    remove_assets([e.path])
+    return stats
+
+
+def _is_current_thumb_key(key: str, current: Dict[int, str]) -> bool:
+    """Pack-Schlüssel '<id>_<version>_<breite>.<ext>' zur aktuellen Version eines Mediums?"""
+    media_id, _, rest = key.partition("_")
+    version = rest.partition("_")[0]
+    return media_id.isdigit() and current.get(int(media_id)) == version
+
+
+def sweep_legacy_thumbnails(thumbs_dir: str) -> int:
+    """
+    Entfernt einmalig die Thumbnails der Ursprungsversion (<name>_thumb.jpg):
+    sie gehören zu keinem Registry-Eintrag und würden beim Löschen des
+    Mediums sonst liegen bleiben. Merker-Datei verhindert erneutes Scannen.
+    """
+    marker = os.path.join(thumbs_dir, LEGACY_SWEEP_MARKER)
+    if not os.path.isdir(thumbs_dir) or os.path.exists(marker):
+        return 0
+    removed = []
+    with os.scandir(thumbs_dir) as it:
+        for e in it:
+            if e.is_file() and e.name.endswith(LEGACY_THUMB_SUFFIX):
+                removed.append(e.path)
+    remove_assets(removed)
+    with open(marker, "w") as f:
+        f.write(f"{len(removed)}\n")
+    return len(removed)
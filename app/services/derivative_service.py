@@ -0,0 +1,142 @@
+# app/services/derivative_service.py
+"""
+Display-Derivate für Bilder.
+
+Statt des Originals (z. B. mehrere MB große PNGs) bekommt der Player ein
+vorgerechnetes Bild in Display-Größe. Pro Bild und Display-Profil
+(DISPLAY_PROFILES, z. B. 1920x1080, 3840x2160) entstehen beim Ingest:
+- WebP (mit Alphakanal) und progressives JPEG (Transparenz auf Weiß)
+- EXIF-Orientierung angewendet, Metadaten entfernt
+- nie hochskaliert
+
+Die Dateinamen enthalten den Versions-Token des Originals
+(<id>_<version>_<w>x<h>.<ext>), sind also inhaltsadressiert und dürfen
+unter /media/display/<id>/<version> immutable ausgeliefert werden.
+"""
+from __future__ import annotations
+import math
+import os
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from PIL import Image, ImageOps
+
+from app.services.media_service import has_alpha, image_for_format, save_image_atomic
+from app.services.single_flight import thumb_flight
+
+Profile = Tuple[int, int]
+
+DEFAULT_PROFILES: List[Profile] = [(1920, 1080)]
+DERIVABLE_MIMES = ("image/jpeg", "image/png", "image/webp", "image/bmp", "image/tiff")
+FORMATS = {
+    "webp": ("WEBP", "image/webp", {"quality": 85, "method": 4}),
+    "jpeg": ("JPEG", "image/jpeg", {"quality": 85, "progressive": True, "optimize": True}),
+}
+
+
+def parse_display_profiles(raw: Optional[str]) -> List[Profile]:
+    """'1920x1080,3840x2160' -> [(1920, 1080), (3840, 2160)]; ungültige Teile werden ignoriert."""
+    profiles: List[Profile] = []
+    for part in (raw or "").split(","):
+        w, _, h = part.strip().lower().partition("x")
+        if w.isdigit() and h.isdigit() and int(w) > 0 and int(h) > 0:
+            profiles.append((int(w), int(h)))
+    return sorted(set(profiles)) or list(DEFAULT_PROFILES)
+
+
+def is_derivable(mime: Optional[str]) -> bool:
+    return (mime or "") in DERIVABLE_MIMES
+
+
+def pick_profile(profiles: Sequence[Profile], fit: Optional[Profile] = None) -> Profile:
+    """
+    Kleinstes Profil, das `fit` (Bildschirm in Gerätepixeln) abdeckt;
+    sonst das größte. Ohne `fit` das erste (Standard-)Profil.
+    """
+    if fit is None:
+        return profiles[0]
+    for p in sorted(profiles, key=lambda p: p[0] * p[1]):
+        if p[0] >= fit[0] and p[1] >= fit[1]:
+            return p
+    return max(profiles, key=lambda p: p[0] * p[1])
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    return "webp" if "image/webp" in (accept or "") else "jpeg"
+
+
+def derivative_variant(profile: Profile, fmt: str) -> str:
+    """Registry-Schlüssel, z. B. '1920x1080.webp'."""
+    return f"{profile[0]}x{profile[1]}.{fmt}"
+
+
+def derivative_path(out_dir: str, media_id: int, version: str, profile: Profile, fmt: str) -> str:
+    ext = "webp" if fmt == "webp" else "jpg"
+    return os.path.join(out_dir, f"{media_id}_{version}_{profile[0]}x{profile[1]}.{ext}")
+
+
+def ensure_image_derivatives(media, version: str, out_dir: str, profiles: Sequence[Profile]) -> List[Tuple[str, str]]:
+    """
+    Rendert alle fehlenden Derivate (Profile x Formate) mit EINEM Decode des
+    Originals. `media` braucht id, path, mime.
+    Gibt die NEU erzeugten Dateien als [(variant, pfad)] zurück – für die Registry.
+    """
+    if not is_derivable(media.mime):
+        return []
+    os.makedirs(out_dir, exist_ok=True)
+    todo = [
+        (p, fmt, derivative_path(out_dir, media.id, version, p, fmt))
+        for p in profiles for fmt in FORMATS
+    ]
+    if all(os.path.exists(t[2]) for t in todo):
+        return []
+    with thumb_flight.lock(("derivative", media.id)):
+        # evtl. hat ein paralleler Request sie inzwischen erzeugt
+        missing = [t for t in todo if not os.path.exists(t[2])]
+        if not missing:
+            return []
+        with thumb_flight.slot():
+            _render_derivatives(media.path, missing)
+    return [(derivative_variant(p, fmt), path) for p, fmt, path in missing]
+
+
+def _render_derivatives(src_path: str, missing: list) -> None:
+    with Image.open(src_path) as src:
+        if src.format == "JPEG":
+            # libjpeg skaliert beim Dekodieren (1/2..1/8), nie unter das größte Profil
+            edge = max(max(p) for p, _fmt, _path in missing)
+            scale = min(edge / src.width, edge / src.height, 1.0)
+            src.draft("RGB", (math.ceil(src.width * scale), math.ceil(src.height * scale)))
+        img = ImageOps.exif_transpose(src)
+        if has_alpha(img):
+            img = img.convert("RGBA")
+        elif img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        for profile, fmt, path in missing:
+            scaled = img.copy()
+            scaled.thumbnail(profile, Image.LANCZOS)
+            pil_format, _mime, opts = FORMATS[fmt]
+            # ohne exif=/icc_profile= schreibt Pillow keine Metadaten
+            save_image_atomic(image_for_format(scaled, pil_format), path, pil_format, **opts)
+
+
+def get_image_derivative(media, version: str, out_dir: str, profiles: Sequence[Profile],
+                         profile: Profile, fmt: str,
+                         on_created: Optional[Callable[[List[Tuple[str, str]]], None]] = None
+                         ) -> Optional[Tuple[str, str]]:
+    """
+    (Pfad, MIME) des Derivats; erzeugt fehlende Derivate bei Bedarf und meldet
+    sie an `on_created` (Registry). None = Original nehmen.
+    """
+    if not is_derivable(media.mime):
+        return None
+    path = derivative_path(out_dir, media.id, version, profile, fmt)
+    if not os.path.exists(path):
+        try:
+            created = ensure_image_derivatives(media, version, out_dir, profiles)
+        except Exception:
+            return None
+        if created and on_created is not None:
+            on_created(created)
+        if not os.path.exists(path):
+            return None
+    return path, FORMATS[fmt][1]
@@ -0,0 +1,115 @@
+# app/services/device_service.py
+"""
+Geräte-Registry für Multi-Display-Betrieb.
+
+Jeder Player meldet sich mit einer Geräte-ID (/api/feed?device=<id>).
+Angelegt werden Geräte nur über POST /api/devices/<id> (assign_device);
+unbekannte IDs bekommen die aktive Playlist, ohne dass eine Zeile
+entsteht – ein anonymer Client kann so weder DB noch Speicher füllen.
+
+Die Zuordnung Gerät -> Playlist wird im Prozess gecacht (LRU, höchstens
+MAX_DEVICE_STATES Einträge, auch für unbekannte IDs); `last_seen` wird
+höchstens alle LAST_SEEN_FLUSH_S Sekunden in die DB geschrieben, damit
+Polls keinen Schreibzugriff pro Request erzeugen.
+"""
+from __future__ import annotations
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.db import get_session
+from app.models.device import Device
+from app.models.playlist import Playlist
+
+LAST_SEEN_FLUSH_S = 60
+MAX_DEVICE_STATES = 256
+DEVICE_ID_RE = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+
+class _DeviceState:
+    __slots__ = ("playlist_id", "flushed_at")
+
+    def __init__(self, playlist_id: Optional[int], flushed_at: float):
+        self.playlist_id = playlist_id
+        self.flushed_at = flushed_at
+
+
+_lock = threading.Lock()
+_states: "OrderedDict[str, _DeviceState]" = OrderedDict()
+
+
+def is_valid_device_id(device_id: str) -> bool:
+    return bool(device_id) and DEVICE_ID_RE.match(device_id) is not None
+
+
+def touch_device(device_id: str) -> Optional[int]:
+    """
+    Liefert die Playlist-ID eines Geräts (None = aktive Playlist) und
+    aktualisiert `last_seen` registrierter Geräte. Unbekannte IDs werden
+    nicht angelegt. Im Normalfall ohne DB-Zugriff.
+    """
+    now = time.monotonic()
+    with _lock:
+        st = _states.get(device_id)
+        if st is not None and now - st.flushed_at < LAST_SEEN_FLUSH_S:
+            _states.move_to_end(device_id)
+            return st.playlist_id
+
+    db = get_session()
+    try:
+        dev = db.get(Device, device_id)
+        playlist_id = None
+        if dev is not None:
+            dev.last_seen = datetime.utcnow()
+            db.commit()
+            playlist_id = dev.playlist_id
+    finally:
+        db.close()
+
+    with _lock:
+        _states[device_id] = _DeviceState(playlist_id, now)
+        _states.move_to_end(device_id)
+        while len(_states) > MAX_DEVICE_STATES:
+            _states.popitem(last=False)
+    return playlist_id
+
+
+def forget_device_states() -> None:
+    """Verwirft die gecachten Zuordnungen (z. B. nach Löschen einer Playlist)."""
+    with _lock:
+        _states.clear()
+
+
+def list_devices(db: Session) -> List[Device]:
+    return db.execute(select(Device).order_by(Device.id.asc())).scalars().all()
+
+
+def assign_device(db: Session, device_id: str, playlist_id: Optional[int], name: Optional[str] = None) -> Optional[Device]:
+    """
+    Weist einem Gerät eine Playlist zu (None = aktive Playlist) und setzt
+    optional den Anzeigenamen. Legt das Gerät an, falls es noch unbekannt ist
+    (einziger Weg, ein Gerät zu registrieren).
+    """
+    if playlist_id is not None and not db.get(Playlist, playlist_id):
+        return None
+    dev = db.get(Device, device_id)
+    if dev is None:
+        dev = Device(id=device_id)
+        db.add(dev)
+    dev.playlist_id = playlist_id
+    if name is not None:
+        dev.name = name.strip() or None
+    db.commit()
+    with _lock:
+        _states.pop(device_id, None)
+    return dev
+
+
+def detach_playlist_from_devices(db: Session, playlist_id: int) -> None:
+    """Geräte einer gelöschten Playlist fallen auf die aktive Playlist zurück (im Aufrufer-Commit)."""
+    db.execute(update(Device).where(Device.playlist_id == playlist_id).values(playlist_id=None))
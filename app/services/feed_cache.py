@@ -0,0 +1,186 @@
+# app/services/feed_cache.py
+"""
+Materialisierter Cache für /api/feed.
+
+Hält den fertig serialisierten Feed-Body samt ETag (aus der persistierten
+Revision, siehe revision_service) im Prozessspeicher.
+Schreibende Service-Funktionen (Playlist, Medien, Settings) rufen nach dem
+Commit `invalidate_feed_cache()` auf; der nächste Poll baut den Feed einmal
+neu, alle weiteren Polls kosten nur noch einen Attribut-Zugriff.
+
+Jede Invalidierung erhöht außerdem die Generation und weckt wartende
+Push-Clients (`wait_for_feed_change`, genutzt von /api/feed/stream).
+
+Snapshots liegen pro Playlist-ID vor: mehrere Displays mit derselben
+Playlist teilen sich einen Snapshot, und eine Änderung an Playlist A
+verwirft nur deren Snapshot (`invalidate_feed_cache(playlist_id)`).
+
+Andere Prozesse (CLI-Befehle, weitere Server-Worker) erreicht eine
+Invalidierung nicht; sie erhöhen aber die persistierte Revision. Ein
+Snapshot wird deshalb höchstens alle REVALIDATE_S Sekunden einmal gegen
+die gespeicherte Revision geprüft (revalidation_due, ein kleines Statement
+im Aufrufer: /api/feed und der Heartbeat von /api/feed/stream) – alle
+anderen Requests bleiben ohne DB-Zugriff.
+
+Für Delta-Abfragen (/api/feed?since=<rev>) merkt sich der Cache zu den
+letzten HISTORY_SIZE Revisionen einen kompakten Index
+{playlist_item_id: (position, signatur)} – nicht die Items selbst.
+"""
+from __future__ import annotations
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+HISTORY_SIZE = 16
+REVALIDATE_S = 5.0
+
+FeedIndex = Dict[int, Tuple[int, int]]
+
+
+class FeedEntry:
+    __slots__ = ("playlist_id", "body", "etag", "revision", "items", "deltas", "compact", "checked_at")
+
+    def __init__(self, playlist_id: int, body: bytes, etag: str, revision: str, items: List[Dict[str, Any]],
+                 compact: Optional[List[str]] = None):
+        self.playlist_id = playlist_id
+        self.body = body
+        self.etag = etag
+        self.revision = revision
+        self.items = items
+        self.deltas: Dict[str, bytes] = {}  # since -> serialisierte Delta-Antwort
+        self.compact = compact              # Chunks des Spaltenformats (?format=compact)
+        self.checked_at = time.monotonic()  # letzte Prüfung gegen die persistierte Revision
+
+
+_lock = threading.Lock()
+_changed = threading.Condition(_lock)
+_entries: Dict[int, FeedEntry] = {}       # playlist_id -> Snapshot
+_active_playlist_id: Optional[int] = None  # zuletzt gebaute aktive Playlist
+_generation = 0
+_history: "OrderedDict[str, FeedIndex]" = OrderedDict()
+
+
+def invalidate_feed_cache(playlist_id: Optional[int] = None) -> None:
+    """
+    Verwirft gecachte Feeds (nach jedem feed-relevanten Commit aufrufen).
+    Mit `playlist_id` nur den Snapshot dieser Playlist, sonst alle
+    (Medien-/Settings-Änderungen, Wechsel der aktiven Playlist).
+    """
+    global _active_playlist_id, _generation
+    with _lock:
+        if playlist_id is None:
+            _entries.clear()
+            _active_playlist_id = None
+        else:
+            _entries.pop(playlist_id, None)
+        _generation += 1
+        _changed.notify_all()
+
+
+def current_generation() -> int:
+    return _generation
+
+
+def wait_for_feed_change(last: int, timeout: float) -> int:
+    """
+    Blockiert, bis sich die Generation gegenüber `last` ändert oder `timeout`
+    (Sekunden) abläuft. Gibt die aktuelle Generation zurück.
+    """
+    with _changed:
+        _changed.wait_for(lambda: _generation != last, timeout=timeout)
+        return _generation
+
+
+def get_cached_feed(playlist_id: Optional[int] = None) -> Optional[FeedEntry]:
+    """Snapshot der Playlist `playlist_id` (None = aktive Playlist) oder None."""
+    if playlist_id is None:
+        playlist_id = _active_playlist_id
+        if playlist_id is None:
+            return None
+    return _entries.get(playlist_id)
+
+
+def cached_feed_entries() -> List[FeedEntry]:
+    """Alle aktuell gehaltenen Snapshots (Kopie der Liste)."""
+    with _lock:
+        return list(_entries.values())
+
+
+def revalidation_due(entry: FeedEntry) -> bool:
+    """
+    True, wenn `entry` wieder gegen die persistierte Revision geprüft werden
+    soll (höchstens alle REVALIDATE_S Sekunden; der erste Aufrufer übernimmt).
+    """
+    now = time.monotonic()
+    with _lock:
+        if now - entry.checked_at < REVALIDATE_S:
+            return False
+        entry.checked_at = now
+        return True
+
+
+def get_or_build_feed(build: Callable[[], FeedEntry], playlist_id: Optional[int] = None) -> FeedEntry:
+    """
+    Liefert den gecachten Feed; baut ihn bei Bedarf über `build()` neu.
+    Wird während des Baus invalidiert, wird das (evtl. veraltete) Ergebnis
+    ausgeliefert, aber weder gespeichert noch in die Historie übernommen.
+    """
+    global _active_playlist_id
+    entry = get_cached_feed(playlist_id)
+    if entry is not None:
+        return entry
+
+    gen = _generation
+    entry = build()
+    with _lock:
+        if gen == _generation:
+            _entries[entry.playlist_id] = entry
+            if playlist_id is None:
+                _active_playlist_id = entry.playlist_id
+            _history[entry.revision] = _index(entry.items)
+            _history.move_to_end(entry.revision)
+            while len(_history) > HISTORY_SIZE:
+                _history.popitem(last=False)
+    return entry
+
+
+# ---------------------------
+# Delta-Berechnung
+# ---------------------------
+
+def _signature(item: Dict[str, Any]) -> int:
+    # Position bewusst ausgenommen: reine Verschiebungen laufen über "moved"
+    return hash(tuple(v for k, v in item.items() if k != "position"))
+
+
+def _index(items: List[Dict[str, Any]]) -> FeedIndex:
+    return {it["playlist_item_id"]: (it["position"], _signature(it)) for it in items}
+
+
+def compute_feed_delta(since: str, entry: FeedEntry) -> Optional[Dict[str, list]]:
+    """
+    Unterschied zwischen Revision `since` und `entry`:
+    inserted/modified (komplette Items), moved (id + neue position), removed (ids).
+    None, wenn `since` nicht (mehr) in der Historie liegt -> Vollabzug nötig.
+    """
+    old = _history.get(since)
+    cur = _history.get(entry.revision)
+    if old is None or cur is None:
+        return None
+
+    inserted: List[Dict[str, Any]] = []
+    modified: List[Dict[str, Any]] = []
+    moved: List[Dict[str, int]] = []
+    for it in entry.items:
+        pid = it["playlist_item_id"]
+        prev = old.get(pid)
+        if prev is None:
+            inserted.append(it)
+        elif prev[1] != cur[pid][1]:
+            modified.append(it)
+        elif prev[0] != it["position"]:
+            moved.append({"playlist_item_id": pid, "position": it["position"]})
+    removed = [pid for pid in old if pid not in cur]
+
+    return {"inserted": inserted, "modified": modified, "moved": moved, "removed": removed}
@@ -0,0 +1,211 @@
+# app/services/ingest_service.py
+"""
+Nachbearbeitung neuer Uploads im Hintergrund.
+
+Der Upload-Request legt nur Datei + Media-Datensatz an (Status 'pending')
+und antwortet sofort mit der ID. Metadaten-Probe (Maße, Codec, Bitrate,
+fps, Dauer, Tonspur – media_service.probe_media), Faststart-Remux, Thumbnails,
+Bild-Derivate und das Einreihen ins Transcoding erledigen hier ein paar
+Worker-Threads (INGEST_WORKERS); die CPU-lastigen Schritte begrenzt
+zusätzlich thumb_flight.
+
+Status pro Media (media.ingest_status):
+    pending -> running -> ready | failed      (None = Bestand vor dieser Spalte)
+
+Clients fragen den Fortschritt über /media/ingest?ids=... ab (ingest_progress).
+"""
+from __future__ import annotations
+import os
+import queue
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.db import get_session
+from app.models.media import Media
+from app.models.playlist import PlaylistItem
+from app.services.asset_service import register_media_assets
+from app.services.derivative_service import Profile, ensure_image_derivatives
+from app.services.feed_cache import invalidate_feed_cache
+from app.services.media_cache import evict_media_entry, put_media_entry
+from app.services.media_service import (
+    apply_media_info, ensure_thumbnail, probe_media, refresh_media_version, remux_faststart,
+)
+from app.services.revision_service import bump_global_revision
+from app.services.transcode_service import enqueue_transcode, transcoding_available
+
+DEFAULT_WORKERS = 2
+DONE_STATES = ("ready", "failed")
+
+
+class IngestTarget(NamedTuple):
+    """Zielverzeichnisse/Profile aus der App-Config (Worker haben keinen App-Kontext)."""
+    thumbs_dir: str
+    derivatives_dir: str
+    renditions_dir: str
+    display_profiles: List[Profile]
+
+
+_settings = {"workers": DEFAULT_WORKERS}
+_queue: "queue.Queue[Tuple[int, IngestTarget]]" = queue.Queue()
+_workers: List[threading.Thread] = []
+_workers_lock = threading.Lock()
+
+
+def configure_ingest(workers: int = DEFAULT_WORKERS) -> None:
+    _settings["workers"] = max(1, workers)
+
+
+def ingest_target(app) -> IngestTarget:
+    """Verzeichnisse unter <root>/media wie in den Routen (get_thumbs_dir & Co.)."""
+    media_dir = os.path.abspath(os.path.join(app.root_path, "media"))
+    return IngestTarget(
+        thumbs_dir=os.path.join(media_dir, "_thumbs"),
+        derivatives_dir=os.path.join(media_dir, "_derivatives"),
+        renditions_dir=os.path.join(media_dir, "_renditions"),
+        display_profiles=app.config["DISPLAY_PROFILES"],
+    )
+
+
+# ---------------------------
+# Warteschlange / Worker
+# ---------------------------
+
+def enqueue_ingest(media_id: int, target: IngestTarget) -> None:
+    """Stellt ein (bereits als 'pending' angelegtes) Medium in die Warteschlange."""
+    _queue.put((media_id, target))
+    with _workers_lock:
+        _workers[:] = [w for w in _workers if w.is_alive()]
+        while len(_workers) < _settings["workers"]:
+            w = threading.Thread(target=_worker_loop, name=f"slidepi-ingest-{len(_workers)}", daemon=True)
+            w.start()
+            _workers.append(w)
+
+
+def resume_ingests(target: IngestTarget) -> int:
+    """Nach einem Neustart: liegengebliebene Jobs (pending/running) erneut einreihen."""
+    db = get_session()
+    try:
+        ids = db.execute(
+            select(Media.id).where(Media.ingest_status.in_(("pending", "running")))
+        ).scalars().all()
+    finally:
+        db.close()
+    for media_id in ids:
+        enqueue_ingest(media_id, target)
+    return len(ids)
+
+
+def _worker_loop() -> None:
+    while True:
+        media_id, target = _queue.get()
+        try:
+            process_ingest(media_id, target)
+        except Exception as e:
+            print(f"[Ingest] Media {media_id} fehlgeschlagen:", e)
+            _set_status(media_id, "failed")
+        finally:
+            _queue.task_done()
+
+
+def _set_status(media_id: int, status: str) -> None:
+    db = get_session()
+    try:
+        m = db.get(Media, media_id)
+        if m:
+            m.ingest_status = status
+            db.commit()
+    finally:
+        db.close()
+
+
+def _in_any_playlist(db, media_id: int) -> bool:
+    return db.execute(
+        select(PlaylistItem.id).where(PlaylistItem.media_id == media_id).limit(1)
+    ).first() is not None
+
+
+def process_ingest(media_id: int, target: IngestTarget) -> str:
+    """Führt die Nachbearbeitung synchron aus und gibt den End-Status zurück."""
+    db = get_session()
+    try:
+        m = db.get(Media, media_id)
+        if not m:
+            return "failed"
+        m.ingest_status = "running"
+        db.commit()
+
+        if not os.path.isfile(m.path):
+            m.ingest_status = "failed"
+            db.commit()
+            return "failed"
+        # eine Probe für alles: Remux (Tonspur), Poster (Dauer), Transcode (Codec)
+        info = probe_media(m.path, m.mime)
+        if m.mime.startswith("video/"):
+            m.remux_saved_bytes = remux_faststart(m.path, m.mime, info.get("has_audio") if info else None)
+            if m.remux_saved_bytes is not None and info is not None:
+                # Stream-Copy: Codec/Maße/Dauer bleiben, Größe und Tonspur nicht
+                info["file_size"] = os.path.getsize(m.path)
+                info["has_audio"] = False
+        if info is not None:
+            apply_media_info(m, info)
+        if m.mime.startswith("video/") and transcoding_available():
+            # schon jetzt vormerken: nicht abspielbare Videos bleiben so aus dem Feed,
+            # bis der Transcode-Job fertig ist (playlist_service._feed_rows_stmt)
+            m.rendition_status = "pending"
+        refresh_media_version(m)  # Remux hat Größe/mtime geändert
+        in_feed = _in_any_playlist(db, m.id)
+        if in_feed:
+            # schon einsortiert (Quick-Assign während der Verarbeitung): Player brauchen die Maße
+            bump_global_revision(db)
+        db.commit()
+        if in_feed:
+            invalidate_feed_cache()
+
+        # Remux ändert die Datei (und damit das Versions-Token): Cache-Eintrag neu
+        evict_media_entry(m.id)
+        entry = put_media_entry(m, target.thumbs_dir)
+        if entry is not None:
+            os.makedirs(target.thumbs_dir, exist_ok=True)
+            register_media_assets(m.id, entry.version, "thumb",
+                                  ensure_thumbnail(entry, target.thumbs_dir, entry.version))
+            entry.thumb_ready = True
+            if entry.mime.startswith("image/"):
+                try:
+                    register_media_assets(m.id, entry.version, "derivative", ensure_image_derivatives(
+                        entry, entry.version, target.derivatives_dir, target.display_profiles))
+                except Exception as e:
+                    # kein Abbruch: /media/display rendert fehlende Derivate nach
+                    print(f"[Ingest] Derivate für Media {m.id} fehlgeschlagen:", e)
+
+        m.ingest_status = "ready"
+        db.commit()
+        is_video = m.mime.startswith("video/")
+    finally:
+        db.close()
+
+    # Videos danach auf ein Pi-taugliches H.264-Profil bringen
+    if is_video:
+        enqueue_transcode(media_id, target.renditions_dir)
+    return "ready"
+
+
+# ---------------------------
+# Fortschritt
+# ---------------------------
+
+def ingest_progress(ids: Iterable[int]) -> Dict[int, Optional[dict]]:
+    """Status je ID: {status, filename, duration_s} bzw. None für unbekannte IDs."""
+    ids = list(ids)
+    db = get_session()
+    try:
+        rows = db.execute(
+            select(Media.id, Media.filename, Media.ingest_status, Media.duration_s).where(Media.id.in_(ids))
+        ).all()
+    finally:
+        db.close()
+    out: Dict[int, Optional[dict]] = {i: None for i in ids}
+    for media_id, filename, status, duration in rows:
+        out[media_id] = {"status": status or "ready", "filename": filename, "duration_s": duration}
+    return out
@@ -0,0 +1,124 @@
+# app/services/media_cache.py
+"""
+Prozessweiter LRU-Cache für die Auslieferung von /media/raw und /media/thumb.
+
+Bildet media_id auf (path, mime, size, mtime, version, thumb_path, duration_s) ab. Nur ein
+Cache-Miss öffnet eine DB-Session; Treffer kosten einen Dict-Zugriff.
+Upload, Umbenennen und Löschen halten den Cache über put/evict aktuell;
+Änderungen aus anderen Prozessen (CLI, z. B. migrate-storage) erhöhen die
+globale Revision, worauf die Feed-Revalidierung den Cache leert.
+"""
+from __future__ import annotations
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from app.db import get_session
+from app.models.media import Media
+
+MAX_ENTRIES = 4096
+
+
+class MediaEntry:
+    """Schlanke Sicht auf ein Medium (duck-typed kompatibel zu ensure_thumbnail)."""
+    __slots__ = ("id", "filename", "path", "mime", "size", "mtime", "version", "thumb_path", "thumb_ready",
+                 "duration_s")
+
+    def __init__(self, id: int, filename: str, path: str, mime: str, size: int, mtime: float,
+                 version: str, thumb_path: str, duration_s: Optional[int] = None):
+        self.id = id
+        self.filename = filename
+        self.path = path
+        self.mime = mime
+        self.size = size
+        self.mtime = mtime
+        self.version = version
+        self.thumb_path = thumb_path
+        self.thumb_ready = False
+        self.duration_s = duration_s  # aus der Ingest-Probe, spart ffprobe beim Poster
+
+
+_lock = threading.Lock()
+_entries: "OrderedDict[int, MediaEntry]" = OrderedDict()
+
+
+def _make_entry(m: Media, thumbs_dir: str) -> Optional[MediaEntry]:
+    from app.services.media_service import media_version_token, playback_source, thumb_filename_for
+    path, mime = playback_source(m)
+    try:
+        st = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    version = media_version_token(st.st_size, st.st_mtime_ns)
+    return MediaEntry(
+        id=m.id,
+        filename=m.filename,
+        path=path,
+        mime=mime,
+        size=st.st_size,
+        mtime=st.st_mtime,
+        version=version,
+        thumb_path=os.path.join(thumbs_dir, thumb_filename_for(m.id, version)),
+        duration_s=m.duration_s,
+    )
+
+
+def _store(entry: MediaEntry) -> None:
+    with _lock:
+        _entries[entry.id] = entry
+        _entries.move_to_end(entry.id)
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+
+def get_media_entry(media_id: int, thumbs_dir: str) -> Optional[MediaEntry]:
+    """Eintrag aus dem Cache; bei Miss einmal aus der DB laden. None = unbekannt/Datei fehlt."""
+    with _lock:
+        entry = _entries.get(media_id)
+        if entry is not None:
+            _entries.move_to_end(media_id)
+            return entry
+
+    db = get_session()
+    try:
+        m = db.get(Media, media_id)
+        entry = _make_entry(m, thumbs_dir) if m else None
+    finally:
+        db.close()
+    if entry is not None:
+        _store(entry)
+    return entry
+
+
+def entry_for_media(m: Media, thumbs_dir: str) -> Optional[MediaEntry]:
+    """Wie get_media_entry, aber für ein bereits geladenes Media-Objekt (kein DB-Zugriff)."""
+    with _lock:
+        entry = _entries.get(m.id)
+        if entry is not None:
+            _entries.move_to_end(m.id)
+            return entry
+    entry = _make_entry(m, thumbs_dir)
+    if entry is not None:
+        _store(entry)
+    return entry
+
+
+def put_media_entry(m: Media, thumbs_dir: str) -> Optional[MediaEntry]:
+    """Nach Upload/Änderung: Eintrag (neu) anlegen."""
+    entry = _make_entry(m, thumbs_dir)
+    if entry is None:
+        evict_media_entry(m.id)
+    else:
+        _store(entry)
+    return entry
+
+
+def evict_media_entry(media_id: int) -> None:
+    with _lock:
+        _entries.pop(media_id, None)
+
+
+def clear_media_cache() -> None:
+    with _lock:
+        _entries.clear()
@@ -1,15 +1,19 @@
 import os
-import itertools
+import hashlib
+import io
+import json
 import math
+import struct
 import subprocess
 import shutil
 from typing import List, Optional
 from sqlalchemy import select
 from sqlalchemy.orm import Session
-from werkzeug.utils import secure_filename
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw, ImageFont, ImageStat
 from sqlalchemy.orm import selectinload
 from app.models.media import Media
+from app.services.single_flight import atomic_tmp_path, thumb_flight
+from app.services.thumb_pack import get_thumb_pack, pack_locator
 
 # ===== Datenbank-Operationen =====
 
@@ -22,8 +26,12 @@ def list_media(db: Session) -> List[Media]:
     # unique() ist mit selectin nicht nötig, schadet aber nicht -> weglassen ok
     return db.execute(stmt).scalars().all()
 
-def add_media_record(db: Session, filename: str, path: str, mime: str, duration_s: Optional[int] = None) -> Media:
-    m = Media(filename=filename, path=path, mime=mime, duration_s=duration_s)
+def add_media_record(db: Session, filename: str, path: str, mime: str, duration_s: Optional[int] = None,
+                     remux_saved_bytes: Optional[int] = None, content_hash: Optional[str] = None,
+                     ingest_status: Optional[str] = None) -> Media:
+    m = Media(filename=filename, path=path, mime=mime, duration_s=duration_s,
+              remux_saved_bytes=remux_saved_bytes, content_hash=content_hash, ingest_status=ingest_status)
+    refresh_media_version(m)
     db.add(m)
     db.commit()
     db.refresh(m)
@@ -50,34 +58,13 @@ def is_allowed_mime(mime: str, allowed_prefixes: tuple[str, ...]) -> bool:
         return False
     return any(mime.startswith(pref) for pref in allowed_prefixes)
 
-def secure_unique_path(directory: str, raw_filename: str) -> tuple[str, str]:
-    """
-    Erzeugt einen sicheren, eindeutigen Dateinamen in 'directory'.
-    Rückgabe: (finaler_name, finaler_absoluter_pfad)
-    """
-    os.makedirs(directory, exist_ok=True)
-    base = secure_filename(raw_filename)
-    if not base:
-        base = "upload"
-
-    name, ext = os.path.splitext(base)
-    candidate = base
-    target = os.path.join(directory, candidate)
-
-    # Falls Datei existiert → _1, _2, ...
-    for i in itertools.count(1):
-        if not os.path.exists(target):
-            return candidate, target
-        candidate = f"{name}_{i}{ext}"
-        target = os.path.join(directory, candidate)
-
 # ===== ffprobe / Dauer-Erkennung =====
 
 def ffprobe_available() -> bool:
     return shutil.which("ffprobe") is not None
 
-def probe_video_duration_seconds(path: str) -> Optional[int]:
-    """Liest Videodauer via ffprobe; gibt Sekunden als int zurück oder None."""
+def probe_video_duration(path: str) -> Optional[float]:
+    """Liest Videodauer via ffprobe; gibt Sekunden (mit Bruchteil) zurück oder None."""
     if not ffprobe_available() or not os.path.exists(path):
         return None
     try:
@@ -87,81 +74,590 @@ def probe_video_duration_seconds(path: str) -> Optional[int]:
              "-of", "default=noprint_wrappers=1:nokey=1", path],
             stderr=subprocess.STDOUT
         ).decode("utf-8", errors="ignore").strip()
-        if not out:
+        return float(out) if out else None
+    except Exception:
+        return None
+
+# ===== Metadaten-Probe (einmal pro Medium, beim Ingest) =====
+
+# Codecs, die Chromium auf dem Pi direkt dekodiert; alles andere braucht eine Rendition
+PLAYABLE_VIDEO_CODECS = ("h264", "vp8", "vp9", "av1")
+PLAYABLE_PIX_FMTS = ("yuv420p", "yuvj420p")
+
+# EXIF-Orientation 5..8 = um 90° gedreht gespeichert
+_EXIF_ORIENTATION = 0x0112
+
+def _orientation(width: int, height: int) -> Optional[str]:
+    if not width or not height:
+        return None
+    return "landscape" if width > height else ("portrait" if height > width else "square")
+
+def _ratio(raw: Optional[str]) -> Optional[float]:
+    """ffprobe-Bruch ("30000/1001") -> float; None bei 0/0 oder Unsinn."""
+    try:
+        num, _, den = str(raw).partition("/")
+        value = float(num) / float(den or 1)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return round(value, 3) if value > 0 else None
+
+def _int_or_none(raw) -> Optional[int]:
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return None
+
+def _probe_video(path: str) -> Optional[dict]:
+    """
+    Ein ffprobe-Aufruf: erster Videostream, Tonspur ja/nein und Container
+    (Dauer, Gesamt-Bitrate).
+    """
+    if not ffprobe_available():
+        return None
+    try:
+        out = subprocess.check_output(
+            ["ffprobe", "-v", "error",
+             "-show_entries",
+             "stream=codec_type,codec_name,width,height,pix_fmt,bit_rate,avg_frame_rate,r_frame_rate"
+             ":stream_tags=rotate:stream_side_data=rotation:format=duration,bit_rate",
+             "-of", "json", path],
+            stderr=subprocess.DEVNULL
+        )
+        data = json.loads(out.decode("utf-8", errors="ignore") or "{}")
+    except Exception:
+        return None
+    streams = data.get("streams") or []
+    video = [s for s in streams if s.get("codec_type") == "video"]
+    if not video:
+        return None
+    st, fmt = video[0], data.get("format") or {}
+    width, height = _int_or_none(st.get("width")) or 0, _int_or_none(st.get("height")) or 0
+    rotation = _int_or_none((st.get("tags") or {}).get("rotate"))
+    for side in st.get("side_data_list") or []:
+        if "rotation" in side:
+            rotation = _int_or_none(side["rotation"])
+    if rotation and rotation % 180:
+        width, height = height, width
+    bit_rate = _int_or_none(st.get("bit_rate")) or _int_or_none(fmt.get("bit_rate"))
+    try:
+        duration = float(fmt.get("duration"))
+    except (TypeError, ValueError):
+        duration = None
+    codec, pix_fmt = st.get("codec_name"), st.get("pix_fmt")
+    return {
+        "width": width or None,
+        "height": height or None,
+        "codec": codec,
+        "pix_fmt": pix_fmt,
+        "bitrate_kbps": bit_rate // 1000 if bit_rate else None,
+        "fps": _ratio(st.get("avg_frame_rate")) or _ratio(st.get("r_frame_rate")),
+        "duration": duration,
+        "has_audio": any(s.get("codec_type") == "audio" for s in streams),
+        "playable": codec in PLAYABLE_VIDEO_CODECS and (pix_fmt is None or pix_fmt in PLAYABLE_PIX_FMTS),
+    }
+
+def _probe_image(path: str) -> Optional[dict]:
+    """Nur den Header lesen (Image.open dekodiert lazy); Anzeige läuft über Pillow-Derivate."""
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+            codec = (img.format or "").lower() or None
+            if img.getexif().get(_EXIF_ORIENTATION) in (5, 6, 7, 8):
+                width, height = height, width
+    except Exception:
+        return {"playable": False}
+    return {"width": width, "height": height, "codec": codec, "playable": True}
+
+def probe_media(path: str, mime: str) -> Optional[dict]:
+    """
+    Liest die Metadaten eines Mediums mit EINER Probe: ffprobe für Videos,
+    Pillow für Bilder. Schlüssel wie die Media-Spalten (width, height,
+    orientation, codec, pix_fmt, bitrate_kbps, fps, file_size, playable,
+    has_audio) plus `duration` (Sekunden, float). None, wenn die Datei fehlt oder
+    ffprobe nicht verfügbar ist (dann später erneut versuchen).
+    """
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return None
+    mime = mime or ""
+    if mime.startswith("video/"):
+        info = _probe_video(path)
+        if info is None:
             return None
-        # round to nearest second
-        return int(round(float(out)))
+    elif mime.startswith("image/"):
+        info = _probe_image(path)
+    else:
+        info = {"playable": False}
+    info["file_size"] = size
+    info["orientation"] = _orientation(info.get("width") or 0, info.get("height") or 0)
+    return info
+
+def apply_media_info(m: Media, info: dict) -> None:
+    """Überträgt ein probe_media-Ergebnis auf den Datensatz (ohne Commit)."""
+    for key in ("width", "height", "orientation", "codec", "pix_fmt", "bitrate_kbps", "fps", "file_size", "playable",
+                "has_audio"):
+        setattr(m, key, info.get(key))
+    if info.get("duration") is not None:
+        m.duration_s = int(round(info["duration"]))
+
+def probe_video_stream(path: str) -> Optional[dict]:
+    """
+    Codec, Auflösung, Pixelformat und Bitrate (kbit/s) des ersten
+    Videostreams (für transcode_service). None, wenn ffprobe fehlt oder scheitert.
+    """
+    info = _probe_video(path) if os.path.exists(path) else None
+    if info is None:
+        return None
+    return {
+        "codec": info["codec"],
+        "width": info["width"] or 0,
+        "height": info["height"] or 0,
+        "pix_fmt": info["pix_fmt"],
+        "kbps": info["bitrate_kbps"],
+    }
+
+# ===== Faststart-Remux beim Ingest =====
+# Player spielt immer stumm ab; MP4s mit moov-Atom am Ende muss <video> erst
+# vom Dateiende nachladen. Stream-Copy (kein Re-Encode) behebt beides.
+
+# Nur MP4: ein MOV würde als MP4 geschrieben, Dateiname und MIME (video/quicktime)
+# passten dann nicht mehr zum Inhalt
+FASTSTART_MIMES = ("video/mp4", "video/x-m4v")
+
+def _mp4_is_faststart(path: str) -> bool:
+    """True, wenn das moov-Atom vor mdat liegt (nur Top-Level-Boxen lesen)."""
+    try:
+        with open(path, "rb") as f:
+            while True:
+                head = f.read(8)
+                if len(head) < 8:
+                    return False
+                size, kind = struct.unpack(">I4s", head)
+                if kind == b"moov":
+                    return True
+                if kind == b"mdat":
+                    return False
+                if size == 1:
+                    size = struct.unpack(">Q", f.read(8))[0] - 8
+                elif size == 0:
+                    return False
+                f.seek(size - 8, os.SEEK_CUR)
+    except (OSError, struct.error):
+        return False
+
+def _has_audio_stream(path: str) -> bool:
+    try:
+        out = subprocess.check_output(
+            ["ffprobe", "-v", "error", "-select_streams", "a",
+             "-show_entries", "stream=index", "-of", "csv=p=0", path],
+            stderr=subprocess.DEVNULL
+        )
+        return bool(out.strip())
     except Exception:
+        return True  # im Zweifel remuxen
+
+def remux_faststart(path: str, mime: str, has_audio: Optional[bool] = None) -> Optional[int]:
+    """
+    Remuxt ein MP4 ohne Audio und mit moov am Anfang (-c copy, kein
+    Re-Encode) und ersetzt die Datei atomar (tmp + os.replace).
+    `has_audio` aus probe_media spart den eigenen ffprobe-Lauf (None = selbst prüfen).
+    Gibt die eingesparten Bytes zurück (0 = war schon passend),
+    None, wenn nicht anwendbar oder ffmpeg scheitert.
+    """
+    if mime not in FASTSTART_MIMES or not shutil.which("ffmpeg"):
+        return None
+    if has_audio is None and not ffprobe_available():
+        return None
+    if not os.path.isfile(path):
+        return None
+    if _mp4_is_faststart(path) and not (_has_audio_stream(path) if has_audio is None else has_audio):
+        return 0
+
+    before = os.path.getsize(path)
+    directory, name = os.path.split(path)
+    tmp = os.path.join(directory, f".{name}.remux.part")
+    try:
+        subprocess.run(
+            ["ffmpeg", "-y", "-v", "error", "-i", path,
+             "-map", "0:v", "-c", "copy", "-an", "-sn", "-dn",
+             "-movflags", "+faststart", "-f", "mp4", tmp],
+            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=600,
+        )
+        after = os.path.getsize(tmp)
+        os.replace(tmp, path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return None
+    return before - after
+
+# Rendition-Status, solange der Transcode-Job noch läuft (transcode_service)
+RENDITION_IN_PROGRESS = ("pending", "running")
+
+def playback_note(media: Media) -> Optional[str]:
+    """Hinweis für die Verwaltungsansichten, wenn der Player das Medium (noch) nicht abspielen kann."""
+    if media.playable is not False or media.rendition_status == "ready":
+        return None
+    if media.rendition_status in RENDITION_IN_PROGRESS:
+        return "nicht abspielbar, Rendition läuft"
+    return "nicht abspielbar, keine Rendition"
+
+def playback_source(media: Media) -> tuple[str, str]:
+    """(Pfad, MIME) der auszuliefernden Datei: fertige Rendition, sonst Original."""
+    if media.rendition_status == "ready" and media.rendition_path and os.path.isfile(media.rendition_path):
+        return media.rendition_path, "video/mp4"
+    return media.path, media.mime or "application/octet-stream"
+
+# ===== Versionierte URLs =====
+# /media/raw/<id>/<version> und /media/thumb/<id>/<version> werden mit
+# "immutable" ausgeliefert; ändert sich die Datei, ändert sich der Token
+# und damit die URL.
+
+def media_version_token(size: int, mtime_ns: int) -> str:
+    """Kurzer, stabiler Token aus Dateigröße und mtime (ns)."""
+    return hashlib.blake2b(f"{size}:{mtime_ns}".encode(), digest_size=8).hexdigest()
+
+def media_version_for_path(path: Optional[str]) -> Optional[str]:
+    """Token für eine Datei auf der Platte; None, wenn sie fehlt."""
+    try:
+        st = os.stat(path)
+    except (OSError, TypeError):
         return None
+    return media_version_token(st.st_size, st.st_mtime_ns)
+
+def refresh_media_version(m: Media) -> None:
+    """
+    Setzt media.version_token auf die aktuell ausgelieferte Datei (ohne Commit).
+    Aufrufen, wenn sich Original oder Rendition ändern (Ingest, Transcoding).
+    """
+    m.version_token = media_version_for_path(playback_source(m)[0])
+
+def backfill_media_versions(db: Session) -> int:
+    """Token für Bestandsmedien ohne version_token nachtragen (einmalig, beim Start)."""
+    todo = db.execute(select(Media).where(Media.version_token.is_(None))).scalars().all()
+    filled = 0
+    for m in todo:
+        refresh_media_version(m)
+        filled += m.version_token is not None
+    db.commit()
+    return filled
+
+def media_url(kind: str, media_id: int, version: Optional[str] = None) -> str:
+    """'/media/<kind>/<id>/<version>' bzw. unversioniert, wenn kein Token vorliegt."""
+    if version:
+        return f"/media/{kind}/{media_id}/{version}"
+    return f"/media/{kind}/{media_id}"
 
 # ===== Thumbnails =====
+# Pro Medium ein Satz Thumbnails: THUMB_WIDTHS x (JPEG, WebP). Die Grid-Ansicht
+# wählt per srcset, /media/thumb/<id>?w=<px> liefert die passende Größe.
+# Dateinamen hängen an media_id + Versions-Token der Quelle
+# (<id>_<version>_<w>.<ext>), nicht am Dateinamen: Umbenennen verwaist
+# nichts, eine geänderte Quelle bekommt neue Dateien. Welche Dateien es
+# gibt, hält die Registry fest (asset_service, Tabelle media_assets).
+
+THUMB_WIDTHS = (160, 320, 640)
+DEFAULT_THUMB_WIDTH = 320
+THUMB_FORMATS = {
+    "jpeg": ("JPEG", "jpg", "image/jpeg", {"quality": 85, "optimize": True}),
+    "webp": ("WEBP", "webp", "image/webp", {"quality": 80, "method": 4}),
+}
+
+# ===== Video-Poster und Scrub-Sprites =====
+# Statt eines festen Frames bei 00:00:01 (oft Schwarzblende, bei Clips < 1 s
+# gar keiner) werden SPRITE_FRAMES Zeitpunkte gleichmäßig über die per
+# ffprobe ermittelte Dauer gezogen. Poster = erster nicht zu dunkler Frame;
+# alle Frames zusammen ergeben das Sprite-Sheet (<id>_<version>_sprite.jpg)
+# für Hover-Scrubbing im Grid. Beides entsteht im selben Durchlauf mit dem
+# Thumbnail-Satz, jedes Video wird also nur einmal abgetastet.
+
+SPRITE = "sprite"               # "Breite" des Sprite-Eintrags im Thumbnail-Satz
+SPRITE_FRAMES = 10
+SPRITE_TILE = (160, 90)         # 16:9-Kacheln, Frames mit anderem Format letterboxed
+DARK_LEVEL = 40                 # Luma 0..255: darunter gilt ein Pixel als dunkel
+MIN_BRIGHT_SHARE = 0.08         # Frame ist brauchbar ab 8 % hellen Pixeln
+FRAME_TIMEOUT_S = 30
+
+# ===== Schneller Decoder für Thumbnails =====
+# Große JPEGs nicht voll dekodieren: Image.draft() lässt libjpeg direkt in
+# 1/2, 1/4 oder 1/8 Auflösung dekodieren; reicht ein eingebettetes
+# EXIF-Thumbnail, wird nur dieses gelesen. Der Rest (PNG, WebP, ...) läuft
+# über thumbnail(reducing_gap=...), das vor dem Resampling per reduce() verkleinert.
+
+THUMB_REDUCING_GAP = 2.0
+
+_EXIF_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+def _fit_size(size: tuple[int, int], max_edge: int) -> tuple[int, int]:
+    scale = min(max_edge / size[0], max_edge / size[1], 1.0)
+    return max(1, math.ceil(size[0] * scale)), max(1, math.ceil(size[1] * scale))
+
+def _exif_embedded_thumbnail(img: Image.Image, max_edge: int) -> Optional[Image.Image]:
+    """EXIF-Thumbnail (IFD1), wenn es groß genug ist und dasselbe Seitenverhältnis hat."""
+    raw = img.info.get("exif")
+    if not raw:
+        return None
+    try:
+        ifd1 = img.getexif().get_ifd(0x1)  # ExifTags.IFD.IFD1 (Pillow >= 9)
+        offset, length = ifd1.get(0x0201), ifd1.get(0x0202)
+        if not offset or not length:
+            return None
+        start = 6 + offset  # Offsets zählen ab TIFF-Header (nach b"Exif\0\0")
+        small = Image.open(io.BytesIO(raw[start:start + length]))
+        small.load()
+    except Exception:
+        return None
+    tw, th = _fit_size(img.size, max_edge)
+    if small.width < tw or small.height < th:
+        return None
+    if abs(small.width / small.height - img.width / img.height) > 0.02:
+        return None  # Letterbox o. ä.
+    return small
+
+def load_thumbnail_source(path: str, max_edge: int) -> Image.Image:
+    """
+    Öffnet ein Bild als Quelle für Thumbnails bis `max_edge` Pixel Kantenlänge
+    so billig wie möglich und wendet die EXIF-Orientierung an.
+    """
+    with Image.open(path) as img:
+        orientation = img.getexif().get(0x0112) if img.format in ("JPEG", "MPO", "TIFF", "WEBP") else None
+        source = None
+        if img.format in ("JPEG", "MPO"):
+            source = _exif_embedded_thumbnail(img, max_edge)
+            if source is None:
+                tw, th = _fit_size(img.size, max_edge)
+                img.draft("RGB", (int(tw * THUMB_REDUCING_GAP), int(th * THUMB_REDUCING_GAP)))
+        if source is None:
+            img.load()
+            source = img.copy()
+    method = _EXIF_TRANSPOSE.get(orientation or 1)
+    return source.transpose(method) if method is not None else source
+
+def thumb_filename_for(media_id: int, version: str, width: int = DEFAULT_THUMB_WIDTH, fmt: str = "jpeg") -> str:
+    return f"{media_id}_{version}_{width}.{THUMB_FORMATS[fmt][1]}"
 
-def thumb_filename_for(media: Media) -> str:
-    base_name = os.path.splitext(os.path.basename(media.filename))[0]
-    return f"{base_name}_thumb.jpg"
+def thumb_variant(width: int, fmt: str) -> str:
+    """Registry-Schlüssel einer Thumbnail-Größe, z. B. '320.webp'."""
+    return f"{width}.{fmt}"
 
-def ensure_thumbnail(media: Media, thumbs_dir: str, max_size: int = 320) -> str:
+def thumb_width_for(requested: Optional[int]) -> int:
+    """Kleinste Thumbnail-Breite >= requested (sonst die größte)."""
+    if not requested:
+        return DEFAULT_THUMB_WIDTH
+    for w in THUMB_WIDTHS:
+        if w >= requested:
+            return w
+    return THUMB_WIDTHS[-1]
+
+def thumb_mime(fmt: str) -> str:
+    return THUMB_FORMATS[fmt][2]
+
+def thumb_set_for(mime: Optional[str]) -> list:
+    """(Breite, Format) aller Dateien im Thumbnail-Satz; Videos zusätzlich mit Sprite."""
+    items = [(w, fmt) for w in THUMB_WIDTHS for fmt in THUMB_FORMATS]
+    if guess_kind(mime or "") == "video":
+        items.append((SPRITE, "jpeg"))
+    return items
+
+def video_sample_times(duration: Optional[float]) -> List[float]:
+    """Mitte jedes der SPRITE_FRAMES Abschnitte – funktioniert auch für Clips < 1 s."""
+    if not duration or duration <= 0:
+        return [0.0]
+    return [duration * (i + 0.5) / SPRITE_FRAMES for i in range(SPRITE_FRAMES)]
+
+def grab_video_frame(path: str, t: float, max_width: int) -> Optional[Image.Image]:
+    """Ein Frame bei `t` Sekunden (schneller Seek vor -i), per Pipe als BMP – keine Temp-Datei."""
+    try:
+        out = subprocess.run(
+            ["ffmpeg", "-v", "error", "-ss", f"{t:.3f}", "-i", path,
+             "-frames:v", "1", "-vf", f"scale='min({max_width},iw)':-2",
+             "-f", "image2pipe", "-c:v", "bmp", "-"],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=FRAME_TIMEOUT_S, check=True,
+        ).stdout
+        if not out:
+            return None
+        with Image.open(io.BytesIO(out)) as img:
+            return img.convert("RGB")
+    except Exception:
+        return None
+
+def sample_video_frames(path: str, max_width: int, duration: Optional[float] = None) -> List[Image.Image]:
+    """
+    Frames an video_sample_times(); leer, wenn ffmpeg fehlt oder nichts liefert.
+    `duration` aus der Ingest-Probe (media.duration_s); nur ohne sie läuft ffprobe.
+    """
+    if not shutil.which("ffmpeg"):
+        return []
+    if duration is None:
+        duration = probe_video_duration(path)
+    frames = (grab_video_frame(path, t, max_width) for t in video_sample_times(duration))
+    return [f for f in frames if f is not None]
+
+def pick_poster_index(frames: List[Image.Image]) -> int:
+    """
+    Index des ersten nicht zu dunklen Frames, sonst des hellsten.
+    Anteil heller Pixel aus dem Luma-Histogramm (in C gezählt, 64x36 je Frame).
     """
-    Stellt sicher, dass ein Thumbnail existiert. Gibt den Pfad zum Thumbnail zurück.
-    - Bilder: mit Pillow skaliert
-    - Videos: wenn möglich ffmpeg Snapshot, sonst Placeholder mit "VIDEO"
+    size = (64, 36)  # für die Helligkeit reicht eine Miniatur
+    small = [f.convert("L").resize(size) for f in frames]
+    bright = [sum(s.histogram()[DARK_LEVEL + 1:]) / (size[0] * size[1]) for s in small]
+    mean = [ImageStat.Stat(s).mean[0] for s in small]
+    for i, share in enumerate(bright):
+        if share >= MIN_BRIGHT_SHARE:
+            return i
+    return max(range(len(mean)), key=mean.__getitem__)
+
+def build_sprite(frames: List[Image.Image]) -> Image.Image:
+    """SPRITE_FRAMES Kacheln nebeneinander; ohne Frames Placeholder-Kacheln."""
+    tw, th = SPRITE_TILE
+    tiles = frames or [_placeholder_image("VIDEO", th)]
+    sheet = Image.new("RGB", (tw * SPRITE_FRAMES, th), (0, 0, 0))
+    for i in range(SPRITE_FRAMES):
+        tile = tiles[i * len(tiles) // SPRITE_FRAMES].copy()
+        tile.thumbnail(SPRITE_TILE, reducing_gap=THUMB_REDUCING_GAP)
+        sheet.paste(tile, (i * tw + (tw - tile.width) // 2, (th - tile.height) // 2))
+    return sheet
+
+def ensure_thumbnail(media: Media, thumbs_dir: str, version: Optional[str] = None) -> List[tuple[str, str]]:
+    """
+    Stellt sicher, dass der komplette Thumbnail-Satz existiert (alle Breiten
+    aus THUMB_WIDTHS, je JPEG + WebP) für `version` (Standard: aus der Datei).
+    Gibt die NEU erzeugten Dateien als [(variant, pfad)] zurück – für die Registry.
+    Mit aktivem Thumbnail-Pack (thumb_pack) landen sie dort statt als lose Dateien.
+    - Bilder: einmal (verkleinert) dekodiert, siehe load_thumbnail_source;
+      die Größen entstehen kaskadiert (640 -> 320 -> 160)
+    - Videos: Poster = erster nicht dunkle von mehreren Frames (ffmpeg),
+      dazu ein Sprite-Sheet; ohne ffmpeg Placeholder mit "VIDEO"
     - Andere: Placeholder mit "FILE"
     """
     os.makedirs(thumbs_dir, exist_ok=True)
-    thumb_path = os.path.join(thumbs_dir, thumb_filename_for(media))
-    if os.path.exists(thumb_path):
-        return thumb_path
+    version = version or media_version_for_path(media.path) or "0"
+    targets = [
+        (w, fmt, os.path.join(thumbs_dir, thumb_filename_for(media.id, version, w, fmt)))
+        for w, fmt in thumb_set_for(media.mime)
+    ]
+    pack = get_thumb_pack()
+
+    def present(path: str) -> bool:
+        return os.path.basename(path) in pack if pack is not None else os.path.exists(path)
+
+    if all(present(t[2]) for t in targets):
+        return []
+
+    # Single-Flight: parallele Requests für dasselbe Medium warten auf den ersten
+    with thumb_flight.lock(("thumb", media.id)):
+        missing = [t for t in targets if not present(t[2])]
+        if not missing:
+            return []
+        if not all(os.path.exists(t[2]) for t in missing):
+            with thumb_flight.slot():
+                _render_thumbnail_set(media, thumbs_dir, missing)
+        if pack is not None:
+            # gerenderte (oder noch lose liegende) Dateien ins Pack übernehmen
+            packed = set(pack.put_files([(os.path.basename(p), p) for _w, _fmt, p in missing]))
+            return [(thumb_variant(w, fmt), pack_locator(pack, os.path.basename(p)))
+                    for w, fmt, p in missing if os.path.basename(p) in packed]
+    return [(thumb_variant(w, fmt), path) for w, fmt, path in missing if os.path.exists(path)]
 
+def _render_thumbnail_set(media: Media, thumbs_dir: str, targets: list) -> None:
     kind = guess_kind(media.mime)
+    source = None
 
     if kind == "image":
         try:
-            with Image.open(media.path) as img:
-                img.thumbnail((max_size, max_size))
-                # nach RGB konvertieren (falls PNG mit Alpha)
-                if img.mode in ("RGBA", "P"):
-                    img = img.convert("RGB")
-                img.save(thumb_path, format="JPEG", quality=85)
-                return thumb_path
+            source = load_thumbnail_source(media.path, THUMB_WIDTHS[-1])
         except Exception:
-            # fallback placeholder
-            return _make_placeholder(thumb_path, text="IMAGE", max_size=max_size)
-
-    if kind == "video":
-        # Versuchen wir einen Frame (1s) zu rendern
-        if shutil.which("ffmpeg"):
-            try:
-                # ffmpeg -ss 00:00:01 -i input -frames:v 1 -vf scale='min(320,iw)':-1 output.jpg
-                subprocess.check_call([
-                    "ffmpeg", "-y",
-                    "-ss", "00:00:01", "-i", media.path,
-                    "-frames:v", "1",
-                    "-vf", f"scale='min({max_size},iw)':-1",
-                    thumb_path
-                ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                if os.path.exists(thumb_path):
-                    return thumb_path
-            except Exception:
-                pass
-        # Fallback: Placeholder
-        return _make_placeholder(thumb_path, text="VIDEO", max_size=max_size)
-
-    # Sonstige Dateien → Placeholder
-    return _make_placeholder(thumb_path, text="FILE", max_size=max_size)
-
-def _make_placeholder(path: str, text: str, max_size: int = 320) -> str:
+            source = None
+        placeholder = "IMAGE"
+
+    elif kind == "video":
+        placeholder = "VIDEO"
+        frames = sample_video_frames(media.path, THUMB_WIDTHS[-1], media.duration_s)
+        if frames:
+            source = frames[pick_poster_index(frames)]
+        for _w, _fmt, path in (t for t in targets if t[0] == SPRITE):
+            save_image_atomic(build_sprite(frames), path, "JPEG", quality=75, optimize=True)
+    else:
+        # Sonstige Dateien → Placeholder
+        placeholder = "FILE"
+
+    if source is not None and has_alpha(source) and source.mode != "RGBA":
+        source = source.convert("RGBA")  # Palette/LA: sonst skaliert Pillow ohne saubere Kanten
+    prev = source
+    for w in sorted(THUMB_WIDTHS, reverse=True):
+        paths = [(fmt, path) for tw, fmt, path in targets if tw == w and not os.path.exists(path)]
+        if prev is None:
+            img = _placeholder_image(placeholder, w)
+        else:
+            # jede Stufe aus der nächstgrößeren -> wenig Pixel pro Resample
+            img = prev.copy()
+            img.thumbnail((w, w), reducing_gap=THUMB_REDUCING_GAP)
+            prev = img
+        if not paths:
+            continue
+        for fmt, path in paths:
+            pil_format, _ext, _mime, opts = THUMB_FORMATS[fmt]
+            save_image_atomic(image_for_format(img, pil_format), path, pil_format, **opts)
+
+# JPEG kennt keine Transparenz: freigestellte Bereiche auf Weiß statt Schwarz
+ALPHA_BACKGROUND = (255, 255, 255)
+
+def has_alpha(img: Image.Image) -> bool:
+    return img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info)
+
+def image_for_format(img: Image.Image, pil_format: str) -> Image.Image:
+    """
+    Bild im passenden Modus für `pil_format`: WebP behält den Alphakanal,
+    JPEG bekommt Transparenz auf ALPHA_BACKGROUND gelegt; sonst RGB/L.
+    """
+    if has_alpha(img):
+        rgba = img if img.mode == "RGBA" else img.convert("RGBA")
+        if pil_format == "WEBP":
+            return rgba
+        flat = Image.new("RGB", rgba.size, ALPHA_BACKGROUND)
+        flat.paste(rgba, mask=rgba.getchannel("A"))
+        return flat
+    if img.mode not in ("RGB", "L"):
+        return img.convert("RGB")
+    return img
+
+def save_image_atomic(img: Image.Image, path: str, pil_format: str, **opts) -> None:
+    """Schreibt in eine Temp-Datei und ersetzt atomar – Leser sehen nie halbe Dateien."""
+    tmp = atomic_tmp_path(path)
+    try:
+        img.save(tmp, format=pil_format, **opts)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+def _placeholder_image(text: str, max_size: int = DEFAULT_THUMB_WIDTH) -> Image.Image:
     bg = (16, 22, 33)       # dunkles Blau
     fg = (124, 193, 255)    # helles Blau
     img = Image.new("RGB", (max_size, max_size), bg)
     draw = ImageDraw.Draw(img)
     # Schriftgröße dynamisch
-    size = 32
+    size = max(12, max_size // 10)
     try:
         # Wenn keine TrueType-Font verfügbar, nimmt Pillow Default
         font = ImageFont.truetype("arial.ttf", size)
     except Exception:
         font = ImageFont.load_default()
-    w, h = draw.textsize(text, font=font)
+    left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+    w, h = right - left, bottom - top
     draw.text(((max_size - w) / 2, (max_size - h) / 2), text, fill=fg, font=font)
-    img.save(path, format="JPEG", quality=85)
+    return img
+
+def _make_placeholder(path: str, text: str, max_size: int = DEFAULT_THUMB_WIDTH) -> str:
+    save_image_atomic(_placeholder_image(text, max_size), path, "JPEG", quality=85)
     return path
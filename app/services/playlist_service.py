@@ -1,9 +1,13 @@
 from typing import List, Optional, Iterable, Dict, Any
-from sqlalchemy import select, delete, func
+from sqlalchemy import select, delete, func, case, literal, or_
 from sqlalchemy.orm import Session
 
 from app.models.playlist import Playlist, PlaylistItem
 from app.models.media import Media
+from app.services.media_service import RENDITION_IN_PROGRESS, media_url
+from app.services.feed_cache import invalidate_feed_cache
+from app.services.revision_service import bump_playlist_revision
+from app.services.device_service import detach_playlist_from_devices, forget_device_states
 
 
 def get_or_create_default_playlist(db: Session) -> Playlist:
@@ -29,8 +33,10 @@ def get_or_create_default_playlist(db: Session) -> Playlist:
         db.refresh(pl)
     else:
         pl.is_active = True
+        bump_playlist_revision(db, pl.id)
         db.commit()
 
+    invalidate_feed_cache()
     return pl
 
 
@@ -44,7 +50,9 @@ def set_active_playlist(db: Session, playlist_id: int) -> Optional[Playlist]:
         return None
     for p in db.execute(select(Playlist)).scalars():
         p.is_active = (p.id == playlist_id)
+    bump_playlist_revision(db, playlist_id)
     db.commit()
+    invalidate_feed_cache()
     return target
 
 
@@ -60,8 +68,11 @@ def delete_playlist(db: Session, playlist_id: int) -> bool:
     pl = db.get(Playlist, playlist_id)
     if not pl:
         return False
+    detach_playlist_from_devices(db, playlist_id)
     db.delete(pl)
     db.commit()
+    forget_device_states()
+    invalidate_feed_cache()
     return True
 
 
@@ -91,7 +102,6 @@ def replace_playlist_items(
         raise ValueError("Playlist existiert nicht")
 
     db.execute(delete(PlaylistItem).where(PlaylistItem.playlist_id == playlist_id))
-    db.commit()
 
     items: List[PlaylistItem] = []
     for idx, mid in enumerate(media_order, start=1):
@@ -111,7 +121,9 @@ def replace_playlist_items(
         db.add(item)
         items.append(item)
 
+    bump_playlist_revision(db, playlist_id)
     db.commit()
+    invalidate_feed_cache(playlist_id)
     return items
 
 
@@ -147,8 +159,10 @@ def add_item_to_playlist_end(
         duration_override_s=duration
     )
     db.add(item)
+    bump_playlist_revision(db, playlist_id)
     db.commit()
     db.refresh(item)
+    invalidate_feed_cache(playlist_id)
     return item
 
 
@@ -159,8 +173,11 @@ def remove_item(db: Session, item_id: int) -> bool:
     it = db.get(PlaylistItem, item_id)
     if not it:
         return False
+    playlist_id = it.playlist_id
+    bump_playlist_revision(db, playlist_id)
     db.delete(it)
     db.commit()
+    invalidate_feed_cache(playlist_id)
     return True
 
 
@@ -179,7 +196,9 @@ def sort_playlist(db: Session, playlist_id: int, ordered_item_ids: Iterable[int]
             it.position = pos
             pos += 1
 
+    bump_playlist_revision(db, playlist_id)
     db.commit()
+    invalidate_feed_cache(playlist_id)
 
 
 def set_item_duration(db: Session, item_id: int, duration_s: Optional[int]) -> bool:
@@ -190,7 +209,10 @@ def set_item_duration(db: Session, item_id: int, duration_s: Optional[int]) -> b
     if not it:
         return False
     it.duration_override_s = int(duration_s) if duration_s not in (None, "", "None") else None
+    playlist_id = it.playlist_id
+    bump_playlist_revision(db, playlist_id)
     db.commit()
+    invalidate_feed_cache(playlist_id)
     return True
 
 
@@ -198,44 +220,117 @@ def set_item_duration(db: Session, item_id: int, duration_s: Optional[int]) -> b
 # Feed-Erzeugung für Player
 # ---------------------------
 
-def list_active_feed(db: Session, default_duration: int) -> List[Dict[str, Any]]:
+class FeedRow:
+    """Schlanker Datensatz (PlaylistItem + Media) für den Feed – kein ORM-Objekt."""
+    __slots__ = ("playlist_item_id", "position", "duration_override_s", "media_id", "filename", "mime", "version",
+                 "width", "height", "playable")
+
+    def __init__(self, playlist_item_id, position, duration_override_s, media_id, filename, mime, version,
+                 width=None, height=None, playable=None):
+        self.playlist_item_id = playlist_item_id
+        self.position = position
+        self.duration_override_s = duration_override_s
+        self.media_id = media_id
+        self.filename = filename
+        self.mime = mime
+        self.version = version  # media.version_token – kein os.stat im Feed-Pfad
+        self.width = width
+        self.height = height
+        self.playable = playable  # False = Original nicht dekodierbar und keine Rendition
+
+
+def _feed_rows_stmt(playlist_id: Optional[int] = None):
+    pl = Playlist.__table__
+    pi = PlaylistItem.__table__
+    m = Media.__table__
+    # fertige Rendition (transcode_service) statt Original ausliefern
+    ready = m.c.rendition_status == "ready"
+    mime = case((ready, literal("video/mp4")), else_=m.c.mime)
+    playable = case((ready, literal(True)), else_=m.c.playable)
+    # Maße aus der Ingest-Probe: die Rendition ist ggf. kleiner, hat aber dasselbe Seitenverhältnis
+    stmt = (
+        select(pi.c.id, pi.c.position, pi.c.duration_override_s, m.c.id, m.c.filename, mime, m.c.version_token,
+               m.c.width, m.c.height, playable)
+        .select_from(pi.join(pl, pl.c.id == pi.c.playlist_id).join(m, m.c.id == pi.c.media_id))
+        # nicht dekodierbare Originale (z. B. HEVC) nur zurückhalten, solange ihre
+        # Rendition noch entsteht; kommt keine (failed, Transcoding aus), bleiben sie
+        # mit playable = False im Feed und die Oberfläche zeigt den Zustand
+        .where(or_(m.c.playable.is_not(False), m.c.rendition_status.is_(None),
+                   m.c.rendition_status.not_in(RENDITION_IN_PROGRESS)))
+        .order_by(pi.c.position.asc())
+    )
+    if playlist_id is None:
+        return stmt.where(pl.c.is_active == True)  # noqa: E712
+    return stmt.where(pl.c.id == playlist_id)
+
+
+def list_active_feed_rows(db: Session, playlist_id: Optional[int] = None) -> List[FeedRow]:
+    """
+    Liest die Items der aktiven Playlist (bzw. `playlist_id`) inkl. Media-Spalten
+    mit EINEM Core-Statement (JOIN), ohne Identity-Map und ohne Tag-Selectin.
+    """
+    rows = db.connection().execute(_feed_rows_stmt(playlist_id)).all()
+    if not rows and playlist_id is None:
+        # evtl. gibt es noch gar keine aktive Playlist -> anlegen/aktivieren
+        get_or_create_default_playlist(db)
+    return [FeedRow(*r) for r in rows]
+
+
+def feed_item_type(mime: Optional[str]) -> str:
+    mime = mime or ""
+    return "video" if mime.startswith("video/") else ("image" if mime.startswith("image/") else "unknown")
+
+
+def effective_duration(duration_override_s: Optional[int], default_duration: int) -> int:
+    return duration_override_s if (duration_override_s and duration_override_s > 0) else default_duration
+
+
+def list_active_feed(db: Session, default_duration: int, playlist_id: Optional[int] = None) -> List[Dict[str, Any]]:
     """
     Erzeugt den abgespeckten Feed für den Player:
-    - Nur aktive Playlist
+    - Nur aktive Playlist (bzw. `playlist_id`, z. B. für ein zugewiesenes Display)
     - Nach `position` geordnet
     - Dauer = duration_override_s (falls vorhanden) sonst `default_duration`
     - type = 'image' | 'video'
-    - url   -> /media/raw/<media_id>
-    - thumb -> /media/thumb/<media_id>
+    - url   -> /media/raw/<media_id>/<version> (Videos)
+               /media/display/<media_id>/<version> (Bilder: Derivat in Display-Größe)
+    - thumb -> /media/thumb/<media_id>/<version>
+      (version = media.version_token, Token aus Größe/mtime der ausgelieferten
+      Datei; die URLs sind damit unveränderlich und dürfen vom Player
+      dauerhaft gecacht werden. Ohne Token: unversionierte URLs)
+    - width/height aus der Ingest-Probe (None = noch nicht geprobt)
+    - Medien, die der Player nicht dekodieren kann (media.playable = False),
+      fehlen, solange ihre Rendition entsteht; ohne Rendition bleiben sie
+      mit playable = False drin (Anzeige in den Verwaltungsansichten)
     """
-    active = get_or_create_default_playlist(db)
-    items = get_playlist_items(db, active.id)
+    return feed_items(list_active_feed_rows(db, playlist_id), default_duration)
 
-    feed: List[Dict[str, Any]] = []
-    for pit in items:
-        media: Media = db.get(Media, pit.media_id)
-        if not media:
-            continue
 
-        mime = (media.mime or "")
-        typ = "video" if mime.startswith("video/") else ("image" if mime.startswith("image/") else "unknown")
+def feed_items(rows: List[FeedRow], default_duration: int) -> List[Dict[str, Any]]:
+    """Feed-Items (siehe list_active_feed) aus bereits gelesenen FeedRows."""
+    feed: List[Dict[str, Any]] = []
+    for row in rows:
+        typ = feed_item_type(row.mime)
         if typ == "unknown":
             continue
 
-        duration = pit.duration_override_s if (pit.duration_override_s and pit.duration_override_s > 0) else default_duration
+        duration = effective_duration(row.duration_override_s, default_duration)
+        version = row.version
 
         feed.append({
-            "playlist_item_id": pit.id,
-            "media_id": media.id,
-            "filename": media.filename,
+            "playlist_item_id": row.playlist_item_id,
+            "position": row.position,
+            "media_id": row.media_id,
+            "filename": row.filename,
             "type": typ,
             "duration": duration,
-            "url": f"/media/raw/{media.id}",
-            "thumb": f"/media/thumb/{media.id}",
+            "url": media_url("display" if typ == "image" else "raw", row.media_id, version),
+            "thumb": media_url("thumb", row.media_id, version),
             # optional:
-            "mime": media.mime,
-            "width": getattr(media, "width", None),
-            "height": getattr(media, "height", None),
+            "mime": row.mime,
+            "width": row.width,
+            "height": row.height,
+            "playable": row.playable,
         })
 
     return feed
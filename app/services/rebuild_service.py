@@ -0,0 +1,148 @@
+# app/services/rebuild_service.py
+"""
+Massen-Neuaufbau von Thumbnails und Bild-Derivaten (flask slidepi rebuild-thumbs).
+
+Die Arbeit pro Medium (`rebuild_media_job`) ist eine Top-Level-Funktion
+ohne DB-Zugriff und läuft so in einem ProcessPoolExecutor. Aktuelle
+Medien werden übersprungen: alle erwarteten Dateien zum aktuellen
+Versions-Token vorhanden. Neu erzeugte Dateien gibt der Job zurück, der
+Elternprozess trägt sie in die Asset-Registry ein.
+Mit THUMB_PACK landen die Thumbnails im Pack (thumb_pack); die Worker
+öffnen es über den Initializer des Pools selbst.
+
+Ein Lauf mit --force merkt sich erledigte IDs in einer Statusdatei im
+Thumbnail-Verzeichnis; nach einem Abbruch setzt der nächste Lauf dort
+fort (solange sich die Thumbnail-/Profil-Spezifikation nicht geändert hat).
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.media import Media
+from app.services.derivative_service import (
+    Profile,
+    derivative_path,
+    derivative_variant,
+    ensure_image_derivatives,
+    is_derivable,
+)
+from app.services.media_service import (
+    SPRITE_FRAMES,
+    SPRITE_TILE,
+    THUMB_FORMATS,
+    THUMB_WIDTHS,
+    ensure_thumbnail,
+    media_version_for_path,
+    playback_source,
+    thumb_filename_for,
+    thumb_set_for,
+    thumb_variant,
+)
+from app.services.thumb_pack import ThumbPack, asset_exists, get_thumb_pack, pack_locator, remove_assets
+
+STATE_FILENAME = ".rebuild_state.json"
+
+AssetList = List[Tuple[str, str, str]]  # (kind, variant, pfad)
+
+
+class MediaJob(NamedTuple):
+    id: int
+    filename: str
+    path: str
+    mime: str
+    duration_s: Optional[int] = None  # aus der Ingest-Probe (Poster ohne ffprobe)
+
+
+def list_media_jobs(db: Session) -> List[MediaJob]:
+    """Alle Medien als picklebare Jobs (Pfad/MIME der ausgelieferten Datei)."""
+    jobs = []
+    for m in db.execute(select(Media).order_by(Media.id.asc())).scalars():
+        path, mime = playback_source(m)
+        jobs.append(MediaJob(m.id, m.filename, path, mime, m.duration_s))
+    return jobs
+
+
+def rebuild_spec(profiles: Sequence[Profile]) -> str:
+    """Fingerabdruck der Ausgabe-Spezifikation (Breiten, Formate, Profile)."""
+    raw = json.dumps([list(THUMB_WIDTHS), sorted(THUMB_FORMATS), SPRITE_FRAMES, list(SPRITE_TILE),
+                      [list(p) for p in profiles]])
+    return hashlib.sha1(raw.encode()).hexdigest()[:12]
+
+
+def _thumb_location(pack: Optional[ThumbPack], thumbs_dir: str, name: str) -> str:
+    return pack_locator(pack, name) if pack is not None else os.path.join(thumbs_dir, name)
+
+
+def expected_outputs(job: MediaJob, version: str, thumbs_dir: str,
+                     derivatives_dir: str, profiles: Sequence[Profile]) -> AssetList:
+    pack = get_thumb_pack()
+    outputs = [("thumb", thumb_variant(w, fmt), _thumb_location(pack, thumbs_dir, thumb_filename_for(job.id, version, w, fmt)))
+               for w, fmt in thumb_set_for(job.mime)]
+    if is_derivable(job.mime):
+        outputs += [("derivative", derivative_variant(p, fmt), derivative_path(derivatives_dir, job.id, version, p, fmt))
+                    for p in profiles for fmt in ("webp", "jpeg")]
+    return outputs
+
+
+def rebuild_media_job(job: MediaJob, thumbs_dir: str, derivatives_dir: str,
+                      profiles: Sequence[Profile], force: bool = False) -> Tuple[int, str, Optional[str], AssetList]:
+    """
+    Baut Thumbnails (+ Derivate) für ein Medium neu.
+    Rückgabe: (media_id, "built" | "skipped" | "missing" | "error: ...",
+    Versions-Token, vorhandene Dateien [(kind, variant, pfad)]).
+    Auch übersprungene Medien melden ihre Dateien, so trägt ein Lauf
+    ältere, noch nicht registrierte Thumbnails nach.
+    """
+    try:
+        version = media_version_for_path(job.path)
+        if version is None:
+            return job.id, "missing", None, []
+        outputs = expected_outputs(job, version, thumbs_dir, derivatives_dir, profiles)
+        status = "skipped"
+        if force or not all(asset_exists(o[2]) for o in outputs):
+            if force:
+                remove_assets([path for _kind, _variant, path in outputs])
+            ensure_thumbnail(job, thumbs_dir, version)
+            if is_derivable(job.mime):
+                ensure_image_derivatives(job, version, derivatives_dir, profiles)
+            status = "built"
+        return job.id, status, version, [o for o in outputs if asset_exists(o[2])]
+    except Exception as e:
+        return job.id, f"error: {e}", None, []
+
+
+# ---------------------------
+# Fortsetzen nach Abbruch
+# ---------------------------
+
+def load_rebuild_state(thumbs_dir: str, spec: str) -> Set[int]:
+    """Erledigte IDs eines abgebrochenen Laufs mit gleicher Spezifikation."""
+    try:
+        with open(os.path.join(thumbs_dir, STATE_FILENAME), "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return set()
+    if state.get("spec") != spec:
+        return set()
+    return set(state.get("done") or [])
+
+
+def save_rebuild_state(thumbs_dir: str, spec: str, done: Iterable[int]) -> None:
+    os.makedirs(thumbs_dir, exist_ok=True)
+    path = os.path.join(thumbs_dir, STATE_FILENAME)
+    tmp = path + ".part"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"spec": spec, "done": sorted(done)}, f)
+    os.replace(tmp, path)
+
+
+def clear_rebuild_state(thumbs_dir: str) -> None:
+    try:
+        os.remove(os.path.join(thumbs_dir, STATE_FILENAME))
+    except OSError:
+        pass
@@ -0,0 +1,76 @@
+# app/services/revision_service.py
+"""
+Persistierte Revisionszähler als Feed-Validator.
+
+- Playlist.revision: pro Playlist, steigt bei jeder Änderung ihrer Items
+- RuntimeState[content_revision]: global, steigt bei Medien-/Settings-Änderungen
+
+Die bump_*-Funktionen laufen in der Transaktion des Aufrufers (vor dessen
+commit). Der Feed-ETag ergibt sich allein aus (Playlist-ID, Playlist-Revision,
+globale Revision) – eine Frische-Prüfung braucht also keinen Feed-Aufbau.
+"""
+from __future__ import annotations
+from typing import Optional, Tuple
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.models.playlist import Playlist
+from app.models.system import RuntimeState
+
+GLOBAL_REVISION_KEY = "content_revision"
+
+FeedRevision = Tuple[int, int, int]  # (playlist_id, playlist_revision, global_revision)
+
+
+def bump_playlist_revision(db: Session, playlist_id: int) -> None:
+    db.execute(
+        update(Playlist)
+        .where(Playlist.id == playlist_id)
+        .values(revision=Playlist.revision + 1)
+    )
+
+
+def bump_global_revision(db: Session) -> None:
+    row = db.get(RuntimeState, GLOBAL_REVISION_KEY)
+    if row:
+        try:
+            row.value = str(int(row.value or 0) + 1)
+        except ValueError:
+            row.value = "1"
+    else:
+        db.add(RuntimeState(key=GLOBAL_REVISION_KEY, value="1"))
+
+
+def get_feed_revision(db: Session, playlist_id: Optional[int] = None) -> Optional[FeedRevision]:
+    """
+    Revision der Playlist `playlist_id` (None = aktive Playlist) + globale
+    Revision in EINEM Statement. None, wenn die Playlist nicht existiert
+    bzw. (noch) keine Playlist aktiv ist.
+    """
+    global_rev = (
+        select(RuntimeState.value)
+        .where(RuntimeState.key == GLOBAL_REVISION_KEY)
+        .scalar_subquery()
+    )
+    stmt = select(Playlist.id, Playlist.revision, global_rev)
+    if playlist_id is None:
+        stmt = stmt.where(Playlist.is_active == True)  # noqa: E712
+    else:
+        stmt = stmt.where(Playlist.id == playlist_id)
+    row = db.execute(stmt.limit(1)).first()
+    if row is None:
+        return None
+    pid, prev, grev = row
+    try:
+        grev = int(grev or 0)
+    except ValueError:
+        grev = 0
+    return int(pid), int(prev or 0), grev
+
+
+def revision_token(rev: FeedRevision) -> str:
+    return "{}.{}.{}".format(*rev)
+
+
+def revision_etag(rev: FeedRevision) -> str:
+    return f'"{revision_token(rev)}"'
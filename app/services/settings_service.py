@@ -4,6 +4,11 @@ from typing import Optional, Dict
 from sqlalchemy import select
 from app.db import get_session
 from app.models.system import Setting  # Annahme: Setting liegt in app.models.system
+from app.services.feed_cache import invalidate_feed_cache
+from app.services.revision_service import bump_global_revision
+
+# Settings, die in den Feed-Payload eingehen; nur sie erhöhen die Revision
+FEED_SETTING_KEYS = ("default_duration",)
 
 # -------------------------------------------------
 # Low-level Helpers
@@ -27,19 +32,25 @@ def get_setting(key: str) -> Optional[str]:
 
 def set_setting(key: str, value: str) -> None:
     """
-    Upsert eines Settings.
+    Upsert eines Settings. Nur geänderte Feed-Keys (FEED_SETTING_KEYS)
+    erhöhen die Revision und verwerfen den Feed-Cache.
     """
     db = get_session()
     try:
         row = _get_by_key(db, key)
+        feed_key = key in FEED_SETTING_KEYS and (row is None or row.value != value)
         if row:
             row.value = value
         else:
             row = Setting(key=key, value=value)
             db.add(row)
+        if feed_key:
+            bump_global_revision(db)
         db.commit()
     finally:
         db.close()
+    if feed_key:
+        invalidate_feed_cache()
 
 def get_settings_dict() -> Dict[str, str]:
     """
@@ -66,12 +77,15 @@ def ensure_default_settings() -> None:
     db = get_session()
     try:
         existing = {s.key: s.value for s in db.execute(select(Setting)).scalars().all()}
-        changed = False
-        for k, v in defaults.items():
-            if k not in existing:
-                db.add(Setting(key=k, value=v))
-                changed = True
-        if changed:
+        added = [k for k in defaults if k not in existing]
+        for k in added:
+            db.add(Setting(key=k, value=defaults[k]))
+        if added:
+            feed_key = any(k in FEED_SETTING_KEYS for k in added)
+            if feed_key:
+                bump_global_revision(db)
             db.commit()
+            if feed_key:
+                invalidate_feed_cache()
     finally:
         db.close()
@@ -0,0 +1,67 @@
+# app/services/single_flight.py
+"""
+Single-Flight für teure Erzeugungsarbeit (Thumbnails, Derivate).
+
+Lädt das Grid, kommen viele /media/thumb-Requests gleichzeitig. Pro
+Schlüssel (z. B. ("thumb", media_id)) arbeitet nur ein Thread, alle
+anderen warten auf dessen Ergebnis. Zusätzlich begrenzt ein Semaphor,
+wie viele Erzeugungen prozessweit parallel laufen, damit Pillow/ffmpeg
+der Wiedergabe nicht die CPU wegnehmen.
+
+    with thumb_flight.lock(("thumb", media_id)):
+        if not fertig():          # nach dem Warten erneut prüfen
+            with thumb_flight.slot():
+                erzeugen()
+"""
+from __future__ import annotations
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Hashable, Iterator, List
+
+DEFAULT_MAX_CONCURRENT = 2
+
+
+class SingleFlight:
+    def __init__(self, max_concurrent: int = DEFAULT_MAX_CONCURRENT):
+        self._guard = threading.Lock()
+        self._locks: Dict[Hashable, List] = {}  # key -> [Lock, Anzahl Nutzer]
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrent))
+
+    def set_max_concurrent(self, n: int) -> None:
+        """Nur beim Start aufrufen (laufende Slots werden nicht übernommen)."""
+        self._slots = threading.BoundedSemaphore(max(1, n))
+
+    @contextmanager
+    def lock(self, key: Hashable) -> Iterator[None]:
+        """Exklusiv pro Schlüssel; der Eintrag verschwindet mit dem letzten Nutzer."""
+        with self._guard:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self._locks.pop(key, None)
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Einer von max_concurrent Plätzen für die eigentliche Arbeit."""
+        slots = self._slots
+        with slots:
+            yield
+
+
+def atomic_tmp_path(path: str) -> str:
+    """Eindeutiger Temp-Name neben `path` (für Schreiben + os.replace)."""
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.{os.getpid()}.{threading.get_ident()}.part")
+
+
+# Prozessweite Instanz für Thumbnails und Bild-Derivate (Limit: THUMB_WORKERS, siehe create_app)
+thumb_flight = SingleFlight()
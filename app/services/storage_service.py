@@ -0,0 +1,121 @@
+# app/services/storage_service.py
+"""
+Ablage der Original-Dateien: gestreut auf Unterordner statt flach in media/.
+
+    media/<ab>/<token>_<name>.<ext>
+
+- <token> ist zufällig (TOKEN_BYTES, hex), <ab> sind seine ersten Zeichen:
+  256 gleichmäßig gefüllte Ordner, auch bei 100 000+ Dateien bleiben die
+  Verzeichnisse klein (Lookups, Backups, ls auf der SD-Karte).
+- Kein Durchprobieren von name_1, name_2, …: der Token macht den Pfad
+  eindeutig, reserviert wird mit O_EXCL. Kollidiert er doch (praktisch nie),
+  wird einfach ein neuer gezogen.
+- Der Anzeigename bleibt in Media.filename; der Dateiname auf der Platte
+  enthält ihn nur zur Orientierung.
+
+Bestandsdateien (flach in media/) verschiebt `flask slidepi migrate-storage`
+(migrate_media_storage). Verschoben wird per Hardlink -> Commit -> Unlink mit
+einem aus der Media-ID abgeleiteten Token: ein abgebrochener Lauf setzt beim
+nächsten Aufruf ohne Waisen fort. Größe und mtime bleiben erhalten – die
+Versions-Tokens und damit alle Thumbnails/Derivate bleiben gültig.
+"""
+from __future__ import annotations
+import hashlib
+import os
+import secrets
+from typing import Dict, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from werkzeug.utils import secure_filename
+
+from app.models.media import Media
+
+TOKEN_BYTES = 8
+SHARD_CHARS = 2
+MAX_NAME_CHARS = 120  # Anzeigename-Anteil im Dateinamen (Rest: Token, Endung)
+
+
+def _display_name(raw_filename: str) -> str:
+    base = secure_filename(raw_filename) or "upload"
+    stem, ext = os.path.splitext(base)
+    return stem[:MAX_NAME_CHARS] + ext[:16]
+
+
+def sharded_path(media_dir: str, token: str, name: str) -> str:
+    return os.path.join(media_dir, token[:SHARD_CHARS], f"{token}_{name}")
+
+
+def allocate_media_path(media_dir: str, raw_filename: str) -> Tuple[str, str]:
+    """
+    Reserviert einen neuen Ablageort (leere Datei, O_EXCL) für `raw_filename`.
+    Rückgabe: (anzeigename, absoluter_pfad).
+    """
+    name = _display_name(raw_filename)
+    while True:
+        path = sharded_path(media_dir, secrets.token_hex(TOKEN_BYTES), name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+            return name, path
+        except FileExistsError:
+            continue  # Token-Kollision: neu ziehen
+
+
+def is_sharded(media_dir: str, path: str) -> bool:
+    rel = os.path.relpath(os.path.abspath(path), os.path.abspath(media_dir))
+    parts = rel.split(os.sep)
+    return len(parts) == 2 and len(parts[0]) == SHARD_CHARS and not rel.startswith("..")
+
+
+def migration_token(media_id: int, old_path: str) -> str:
+    """Fester Token pro Medium: ein erneuter Lauf trifft denselben Zielpfad."""
+    return hashlib.sha256(f"{media_id}:{old_path}".encode("utf-8")).hexdigest()[:TOKEN_BYTES * 2]
+
+
+def migrate_media_storage(db: Session, media_dir: str, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Verschiebt Originale, die direkt in `media_dir` liegen, in die gestreute
+    Ablage und passt Media.path an. Andere Pfade (schon gestreut, außerhalb
+    von media/) bleiben unberührt.
+    """
+    stats = {"moved": 0, "already": 0, "missing": 0, "external": 0}
+    media_dir = os.path.abspath(media_dir)
+    for m in db.execute(select(Media).order_by(Media.id)).scalars():
+        old = os.path.abspath(m.path)
+        if is_sharded(media_dir, old):
+            stats["already"] += 1
+            continue
+        if os.path.dirname(old) != media_dir:
+            stats["external"] += 1
+            continue
+        new = sharded_path(media_dir, migration_token(m.id, old), os.path.basename(old))
+        if not os.path.isfile(old):
+            if os.path.isfile(new):
+                # abgebrochen nach rename (ohne Hardlinks), vor dem Commit
+                stats["moved"] += 1
+                if not dry_run:
+                    m.path = new
+                    db.commit()
+            else:
+                stats["missing"] += 1
+            continue
+        stats["moved"] += 1
+        if dry_run:
+            continue
+
+        os.makedirs(os.path.dirname(new), exist_ok=True)
+        try:
+            os.link(old, new)
+        except FileExistsError:
+            # Rest eines abgebrochenen Laufs: nur übernehmen, wenn es dieselbe Datei ist
+            if not os.path.samefile(old, new):
+                raise
+        except OSError:
+            # Dateisystem ohne Hardlinks (z. B. exFAT-Stick): umbenennen, dann Commit
+            os.rename(old, new)
+        m.path = new
+        db.commit()
+        if os.path.exists(old):
+            os.remove(old)
+    return stats
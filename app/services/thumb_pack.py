@@ -0,0 +1,340 @@
+# app/services/thumb_pack.py
+"""
+Gepackter Thumbnail-Speicher (experimentell, THUMB_PACK=1; Standard aus).
+
+Statt tausender kleiner Dateien in _thumbs liegen alle Thumbnails in EINER
+Append-only-Datei (_thumbs/.thumbs.pack). Sie wird per mmap eingeblendet;
+/media/thumb liefert eine Kopie des Slices daraus (WSGI verlangt bytes) –
+kein open()/stat() pro Request, keine angebrochenen SD-Karten-Blöcke und
+Inodes pro Thumbnail. Sicher ist nur der Platzgewinn; ob Grid-Seiten
+schneller laden, hängt von Page-Cache und Speicher ab
+(scripts/bench_thumb_pack.py auf der Zielhardware messen).
+
+Aufbau:
+    MAGIC | Record | Record | ...
+    Record = Header(<2sBHI: "TP", Typ, Schlüssellänge, Datenlänge) | Schlüssel | Daten
+
+- Typ DATA legt einen Schlüssel (Thumbnail-Dateiname) an bzw. überschreibt ihn,
+  TOMBSTONE entfernt ihn (delete_media).
+- Der Offset-Index (Schlüssel -> (Offset, Länge)) entsteht beim Öffnen aus den
+  Record-Headern; eine separate Indexdatei kann also nicht auseinanderlaufen.
+  Ein abgeschnittener letzter Record (Stromausfall) wird ignoriert und beim
+  nächsten Schreiben überschrieben.
+- Lesen ohne Lock: Map und Index bilden einen unveränderlichen Snapshot,
+  Schreiber veröffentlichen einen neuen. Nur Fehlgriffe nehmen den Lock und
+  lesen nach.
+- Mehrere Prozesse: Schreiben/Kompaktieren unter flock auf .thumbs.pack.lock;
+  andere Prozesse bemerken neue Records bzw. eine kompaktierte Datei beim
+  nächsten Fehlgriff (Größe/Inode geändert) und lesen nach.
+- Kompaktierung kopiert die lebenden Records ohne Lock in eine neue Datei,
+  zieht unter flock nur die inzwischen angehängten Records nach und ersetzt
+  die alte atomar; sie startet nach Löschungen im Hintergrund, sobald genug
+  Platz zu gewinnen ist (oder per `flask slidepi compact-thumbs`).
+
+In der Asset-Registry stehen gepackte Thumbnails als "<pack>#<schlüssel>".
+Hinweis: auf 32-Bit-Systemen begrenzt der Adressraum die mmap-Größe (~1-2 GB).
+"""
+from __future__ import annotations
+import fcntl
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from app.services.single_flight import atomic_tmp_path
+
+PACK_FILENAME = ".thumbs.pack"
+MAGIC = b"SPTPACK1"
+_REC = struct.Struct("<2sBHI")
+_MARKER = b"TP"
+DATA, TOMBSTONE = 0, 1
+
+# Hintergrund-Kompaktierung ab so viel totem Platz (absolut und anteilig)
+COMPACT_MIN_DEAD_BYTES = 4 * 1024 * 1024
+COMPACT_MIN_DEAD_RATIO = 0.3
+
+
+class _Snapshot:
+    """
+    Unveränderlicher Stand des Packs: Map + Offset-Index + Scan-Position.
+    Wird nie verändert, nur durch einen neuen ersetzt; Leser greifen ohne
+    Lock darauf zu (eine Attribut-Zuweisung ist atomar).
+    """
+    __slots__ = ("mm", "ident", "size", "scanned", "index", "live_bytes")
+
+    def __init__(self, mm: Optional[mmap.mmap], ident: Optional[Tuple[int, int]], size: int, scanned: int,
+                 index: Dict[str, Tuple[int, int]], live_bytes: int):
+        self.mm = mm
+        self.ident = ident            # (st_dev, st_ino) der eingeblendeten Datei
+        self.size = size              # eingeblendete Länge
+        self.scanned = scanned        # Ende des letzten gültigen Records
+        self.index = index            # Schlüssel -> (Offset, Länge)
+        self.live_bytes = live_bytes  # Bytes lebender Records inkl. Header
+
+
+class ThumbPack:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()  # nur Schreiber und Fehlgriffe; Treffer lesen lock-frei
+        self._snap = _Snapshot(None, None, 0, len(MAGIC), {}, 0)
+        self._compacting = False
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._file_lock():
+            if not os.path.exists(path) or os.path.getsize(path) < len(MAGIC):
+                with open(path, "wb") as f:
+                    f.write(MAGIC)
+        with self._lock:
+            self._refresh()
+
+    # ---------- Lesen ----------
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Inhalt eines Thumbnails oder None. Treffer: Dict-Zugriff auf den
+        aktuellen Snapshot plus eine Kopie des Slices (WSGI verlangt bytes),
+        kein Lock, kein Syscall. Fehlgriffe lesen neue Records anderer Prozesse nach.
+        """
+        snap = self._snap
+        loc = snap.index.get(key)
+        if loc is None:
+            snap = self._refreshed()
+            loc = snap.index.get(key)
+            if loc is None:
+                return None
+        offset, length = loc
+        return snap.mm[offset:offset + length]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._snap.index or key in self._refreshed().index
+
+    def keys(self) -> List[str]:
+        return list(self._refreshed().index)
+
+    def stats(self) -> Dict[str, int]:
+        snap = self._refreshed()
+        return {
+            "items": len(snap.index),
+            "size": snap.scanned,
+            "dead_bytes": snap.scanned - len(MAGIC) - snap.live_bytes,
+        }
+
+    # ---------- Schreiben ----------
+
+    def put_files(self, items: Sequence[Tuple[str, str]]) -> List[str]:
+        """
+        Übernimmt lose Dateien [(schlüssel, pfad)] in das Pack (ein Append,
+        ein Lock) und löscht sie danach. Gibt die übernommenen Schlüssel zurück.
+        """
+        records, taken = [], []
+        for key, path in items:
+            try:
+                with open(path, "rb") as f:
+                    records.append((DATA, key, f.read()))
+            except OSError:
+                continue
+            taken.append((key, path))
+        self._append(records)
+        for _key, path in taken:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return [k for k, _p in taken]
+
+    def discard(self, keys: Iterable[str]) -> int:
+        """Entfernt Schlüssel (Tombstones); stößt ggf. die Kompaktierung an."""
+        index = self._refreshed().index
+        records = [(TOMBSTONE, k, b"") for k in set(keys) if k in index]
+        if records:
+            self._append(records)
+            self.maybe_compact()
+        return len(records)
+
+    def maybe_compact(self) -> bool:
+        """Startet die Kompaktierung im Hintergrund, wenn sich das lohnt."""
+        with self._lock:
+            st = self.stats()
+            if self._compacting or st["dead_bytes"] < COMPACT_MIN_DEAD_BYTES \
+                    or st["dead_bytes"] < COMPACT_MIN_DEAD_RATIO * st["size"]:
+                return False
+            self._compacting = True
+        threading.Thread(target=self._compact_in_background, name="thumb-pack-compact", daemon=True).start()
+        return True
+
+    def _compact_in_background(self) -> None:
+        try:
+            self.compact()
+        finally:
+            self._compacting = False
+
+    def compact(self) -> int:
+        """
+        Schreibt nur lebende Records in eine neue Datei und tauscht sie atomar
+        ein; gibt die gewonnenen Bytes zurück. Kopiert wird ohne Lock aus einem
+        Snapshot; nur das Nachziehen der inzwischen angehängten Records und das
+        Umbenennen laufen unter Lock + flock. Leser bedienen sich währenddessen
+        weiter aus der alten Map.
+        """
+        base = self._refreshed()
+        tmp = atomic_tmp_path(self.path)
+        try:
+            with open(tmp, "wb") as f:
+                f.write(MAGIC)
+                for key, (offset, length) in sorted(base.index.items(), key=lambda kv: kv[1][0]):
+                    kb = key.encode("utf-8")
+                    f.write(_REC.pack(_MARKER, DATA, len(kb), length))
+                    f.write(kb)
+                    f.write(base.mm[offset:offset + length])
+                with self._lock, self._file_lock():
+                    self._refresh()
+                    cur = self._snap
+                    if cur.ident != base.ident or cur.scanned < base.scanned:
+                        return 0  # inzwischen anderweitig kompaktiert
+                    # seit dem Snapshot angehängte Records (Daten + Tombstones) unverändert übernehmen
+                    f.write(cur.mm[base.scanned:cur.scanned])
+                    f.flush()
+                    os.fsync(f.fileno())
+                    os.replace(tmp, self.path)
+                    self._reload()
+                    return cur.scanned - self._snap.scanned
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _append(self, records: Sequence[Tuple[int, str, bytes]]) -> None:
+        if not records:
+            return
+        chunks = []
+        for kind, key, data in records:
+            kb = key.encode("utf-8")
+            chunks += [_REC.pack(_MARKER, kind, len(kb), len(data)), kb, data]
+        with self._lock, self._file_lock():
+            self._refresh()
+            with open(self.path, "r+b") as f:
+                f.truncate(self._snap.scanned)  # evtl. abgeschnittenen Rest verwerfen
+                f.seek(self._snap.scanned)
+                f.write(b"".join(chunks))
+            self._refresh()
+
+    # ---------- Index ----------
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        with open(self.path + ".lock", "a+b") as lf:
+            fcntl.flock(lf, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lf, fcntl.LOCK_UN)
+
+    def _refreshed(self) -> _Snapshot:
+        with self._lock:
+            self._refresh()
+            return self._snap
+
+    def _refresh(self) -> None:
+        """Snapshot an die Datei angleichen (Aufrufer hält self._lock)."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        snap = self._snap
+        if (st.st_dev, st.st_ino) != snap.ident or st.st_size < snap.scanned:
+            self._reload()
+        elif st.st_size != snap.size:
+            self._snap = self._scan(snap, self._map(st.st_size), st.st_size)
+
+    def _reload(self) -> None:
+        st = os.stat(self.path)
+        mm = self._map(st.st_size)
+        if mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path}: kein Thumbnail-Pack")
+        empty = _Snapshot(None, (st.st_dev, st.st_ino), 0, len(MAGIC), {}, 0)
+        self._snap = self._scan(empty, mm, st.st_size)
+
+    def _map(self, size: int) -> mmap.mmap:
+        with open(self.path, "rb") as f:
+            # alte Maps nicht schließen: Leser älterer Snapshots können sie noch benutzen
+            return mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+
+    @staticmethod
+    def _scan(base: _Snapshot, mm: mmap.mmap, end: int) -> _Snapshot:
+        """Neuer Snapshot: `base` plus die Records ab base.scanned (base bleibt unverändert)."""
+        index = dict(base.index)
+        live, pos = base.live_bytes, base.scanned
+        while pos + _REC.size <= end:
+            marker, kind, klen, dlen = _REC.unpack_from(mm, pos)
+            nxt = pos + _REC.size + klen + dlen
+            if marker != _MARKER or nxt > end:
+                break
+            key = mm[pos + _REC.size:pos + _REC.size + klen].decode("utf-8")
+            old = index.pop(key, None)
+            if old is not None:
+                live -= _REC.size + len(key.encode("utf-8")) + old[1]
+            if kind == DATA:
+                index[key] = (pos + _REC.size + klen, dlen)
+                live += nxt - pos
+            pos = nxt
+        return _Snapshot(mm, base.ident, end, pos, index, live)
+
+
+# ---------------------------
+# Prozessweite Instanz
+# ---------------------------
+
+_pack: Optional[ThumbPack] = None
+_pack_guard = threading.Lock()
+
+
+def configure_thumb_pack(thumbs_dir: Optional[str]) -> Optional[ThumbPack]:
+    """Aktiviert das Pack in `thumbs_dir` (None = lose Dateien wie bisher)."""
+    global _pack
+    with _pack_guard:
+        if thumbs_dir is None:
+            _pack = None
+        elif _pack is None or _pack.path != os.path.join(thumbs_dir, PACK_FILENAME):
+            _pack = ThumbPack(os.path.join(thumbs_dir, PACK_FILENAME))
+        return _pack
+
+
+def get_thumb_pack() -> Optional[ThumbPack]:
+    return _pack
+
+
+def pack_locator(pack: ThumbPack, key: str) -> str:
+    """Registry-Pfad eines gepackten Thumbnails."""
+    return f"{pack.path}#{key}"
+
+
+def _split_locator(path: str) -> Optional[Tuple[str, str]]:
+    pack_path, sep, key = path.partition("#")
+    if sep and pack_path.endswith(PACK_FILENAME):
+        return pack_path, key
+    return None
+
+
+def asset_exists(path: str) -> bool:
+    """Existenz für Registry-Pfade: lose Datei oder Schlüssel im aktiven Pack."""
+    loc = _split_locator(path)
+    if loc is None:
+        return os.path.exists(path)
+    return _pack is not None and _pack.path == loc[0] and loc[1] in _pack
+
+
+def remove_assets(paths: Iterable[str]) -> None:
+    """Löscht lose Dateien bzw. gepackte Thumbnails (gesammelt, ein Append)."""
+    packed = []
+    for path in paths:
+        loc = _split_locator(path)
+        if loc is not None:
+            if _pack is not None and _pack.path == loc[0]:
+                packed.append(loc[1])
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    if packed:
+        _pack.discard(packed)
@@ -0,0 +1,219 @@
+# app/services/transcode_service.py
+"""
+Hintergrund-Transcoding: abspielfreundliche H.264-Rendition für Videos.
+
+4K-HEVC oder Dateien mit hoher Bitrate ruckeln im Chromium des Pi oder
+lassen sich gar nicht dekodieren. Nach dem Upload wird ein Video daher in
+eine Warteschlange gestellt; ein einzelner Worker-Thread prüft es per
+ffprobe und erzeugt bei Bedarf eine H.264-Fassung (yuv420p, faststart,
+ohne Audio), begrenzt auf Display-Auflösung und -Bitrate.
+
+Status pro Media (media.rendition_status):
+    pending -> running -> ready | skipped (Original passt bereits) | failed
+
+Ist die Rendition fertig, liefern Feed und /media/raw sie statt des
+Originals aus (media_service.playback_source); die globale Revision wird
+erhöht, damit Player den neuen Feed sofort abholen.
+"""
+from __future__ import annotations
+import os
+import queue
+import shutil
+import subprocess
+import threading
+from typing import Optional, Tuple
+
+from sqlalchemy import select
+
+from app.db import get_session
+from app.models.media import Media
+from app.services.feed_cache import invalidate_feed_cache
+from app.services.media_cache import evict_media_entry
+from app.services.media_service import RENDITION_IN_PROGRESS, probe_video_stream, refresh_media_version
+from app.services.revision_service import bump_global_revision
+
+DEFAULT_MAX_WIDTH = 1920
+DEFAULT_MAX_HEIGHT = 1080
+DEFAULT_MAX_KBPS = 8000
+TRANSCODE_TIMEOUT_S = 3600
+
+_settings = {
+    "enabled": True,
+    "max_width": DEFAULT_MAX_WIDTH,
+    "max_height": DEFAULT_MAX_HEIGHT,
+    "max_kbps": DEFAULT_MAX_KBPS,
+}
+
+_queue: "queue.Queue[Tuple[int, str]]" = queue.Queue()
+_worker: Optional[threading.Thread] = None
+_worker_lock = threading.Lock()
+
+
+def configure_transcoding(enabled: bool = True, max_width: int = DEFAULT_MAX_WIDTH,
+                          max_height: int = DEFAULT_MAX_HEIGHT, max_kbps: int = DEFAULT_MAX_KBPS) -> None:
+    """Übernimmt die Zielwerte (Display-Auflösung/Bitrate) aus der App-Config."""
+    _settings.update(enabled=enabled, max_width=max_width, max_height=max_height, max_kbps=max_kbps)
+
+
+def transcoding_available() -> bool:
+    return _settings["enabled"] and shutil.which("ffmpeg") is not None and shutil.which("ffprobe") is not None
+
+
+def rendition_needed(info: dict) -> bool:
+    """True, wenn das Original für den Pi-Player neu kodiert werden sollte."""
+    if info.get("codec") != "h264" or info.get("pix_fmt") not in ("yuv420p", "yuvj420p"):
+        return True
+    if info.get("width", 0) > _settings["max_width"] or info.get("height", 0) > _settings["max_height"]:
+        return True
+    kbps = info.get("kbps")
+    return kbps is not None and kbps > _settings["max_kbps"]
+
+
+def stored_stream_info(m: Media) -> Optional[dict]:
+    """Stream-Infos aus der Ingest-Probe (media.codec & Co.) – spart einen ffprobe-Lauf."""
+    if not m.codec:
+        return None
+    return {"codec": m.codec, "width": m.width or 0, "height": m.height or 0,
+            "pix_fmt": m.pix_fmt, "kbps": m.bitrate_kbps}
+
+
+def transcode_command(src: str, dst: str) -> list:
+    w, h, kbps = _settings["max_width"], _settings["max_height"], _settings["max_kbps"]
+    return [
+        "ffmpeg", "-y", "-v", "error", "-i", src,
+        "-map", "0:v:0", "-an", "-sn", "-dn",
+        "-vf", f"scale='min({w},iw)':'min({h},ih)':force_original_aspect_ratio=decrease:force_divisible_by=2",
+        "-c:v", "libx264", "-preset", "veryfast", "-profile:v", "high", "-pix_fmt", "yuv420p",
+        "-crf", "23", "-maxrate", f"{kbps}k", "-bufsize", f"{kbps * 2}k",
+        "-movflags", "+faststart", "-f", "mp4", dst,
+    ]
+
+
+def rendition_path_for(media_id: int, out_dir: str) -> str:
+    return os.path.join(out_dir, f"{media_id}_h264.mp4")
+
+
+# ---------------------------
+# Warteschlange / Worker
+# ---------------------------
+
+def enqueue_transcode(media_id: int, out_dir: str) -> bool:
+    """
+    Markiert das Medium als 'pending' und stellt es in die Warteschlange.
+    False, wenn Transcoding abgeschaltet ist oder ffmpeg fehlt.
+    """
+    if not transcoding_available():
+        return False
+    db = get_session()
+    try:
+        m = db.get(Media, media_id)
+        if not m:
+            return False
+        m.rendition_status = "pending"
+        refresh_media_version(m)  # bis zur neuen Rendition wird das Original ausgeliefert
+        db.commit()
+    finally:
+        db.close()
+    _submit(media_id, out_dir)
+    return True
+
+
+def resume_transcodes(out_dir: str) -> int:
+    """Nach einem Neustart: liegengebliebene Jobs (pending/running) erneut einreihen."""
+    if not transcoding_available():
+        return 0
+    db = get_session()
+    try:
+        ids = db.execute(
+            select(Media.id).where(Media.rendition_status.in_(RENDITION_IN_PROGRESS))
+        ).scalars().all()
+    finally:
+        db.close()
+    for media_id in ids:
+        _submit(media_id, out_dir)
+    return len(ids)
+
+
+def _submit(media_id: int, out_dir: str) -> None:
+    global _worker
+    _queue.put((media_id, out_dir))
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_worker_loop, name="slidepi-transcode", daemon=True)
+            _worker.start()
+
+
+def _worker_loop() -> None:
+    while True:
+        media_id, out_dir = _queue.get()
+        try:
+            process_transcode(media_id, out_dir)
+        except Exception as e:
+            print(f"[Transcode] Media {media_id} fehlgeschlagen:", e)
+            _set_status(media_id, "failed")
+        finally:
+            _queue.task_done()
+
+
+def _set_status(media_id: int, status: str, rendition_path: Optional[str] = None) -> None:
+    db = get_session()
+    try:
+        m = db.get(Media, media_id)
+        if not m:
+            return
+        m.rendition_status = status
+        m.rendition_path = rendition_path
+        refresh_media_version(m)
+        # ready: Rendition statt Original; bei nicht abspielbaren Originalen
+        # ändert jeder Endstatus den Feed (sie fehlen nur, solange der Job läuft)
+        feed_changed = status == "ready" or (m.playable is False and status != "running")
+        if feed_changed:
+            bump_global_revision(db)
+        db.commit()
+    finally:
+        db.close()
+    if status == "ready":
+        evict_media_entry(media_id)
+    if feed_changed:
+        invalidate_feed_cache()
+
+
+def process_transcode(media_id: int, out_dir: str) -> str:
+    """Führt einen Job synchron aus und gibt den End-Status zurück."""
+    db = get_session()
+    try:
+        m = db.get(Media, media_id)
+        if not m or not (m.mime or "").startswith("video/"):
+            return "skipped"
+        src = m.path
+        info = stored_stream_info(m)
+        m.rendition_status = "running"
+        refresh_media_version(m)
+        db.commit()
+    finally:
+        db.close()
+
+    if info is None:
+        info = probe_video_stream(src)
+    if info is None:
+        _set_status(media_id, "failed")
+        return "failed"
+    if not rendition_needed(info):
+        _set_status(media_id, "skipped")
+        return "skipped"
+
+    os.makedirs(out_dir, exist_ok=True)
+    dst = rendition_path_for(media_id, out_dir)
+    tmp = dst + ".part"
+    try:
+        subprocess.run(transcode_command(src, tmp), check=True, timeout=TRANSCODE_TIMEOUT_S,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        os.replace(tmp, dst)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        _set_status(media_id, "failed")
+        return "failed"
+
+    _set_status(media_id, "ready", dst)
+    return "ready"
@@ -0,0 +1,260 @@
+# app/services/upload_service.py
+"""
+Fortsetzbare Chunk-Uploads (angelehnt an tus: create, PATCH mit Offset, finalize).
+
+- create: reserviert den endgültigen Ablageort (storage_service) und legt die
+  Zieldatei in voller Länge (sparse) an. Chunks landen per Offset direkt
+  dort – kein Spooling durch Werkzeug, kein zweites Kopieren.
+- PATCH: schreibt einen Chunk an `Upload-Offset`. Chunks dürfen in beliebiger
+  Reihenfolge, parallel und mehrfach (Retry) kommen; die Sitzung merkt sich
+  die empfangenen Bereiche als Intervall-Liste.
+- finalize: erst wenn [0, size) vollständig vorliegt; danach übernimmt der
+  normale Ingest (Media-Datensatz, Thumbnails, Transcode).
+
+Die Gesamtgröße ist nicht an MAX_CONTENT_LENGTH gebunden (das gilt pro
+Request, also pro Chunk); geprüft wird stattdessen der freie Platz.
+
+Inhalts-Hash (Media.content_hash, SHA-256) und Dubletten:
+- Formular-Upload: UploadRequest lässt Werkzeug die Datei direkt in eine
+  HashingSpool-Datei im Medienordner schreiben, die beim Schreiben hasht.
+  save_upload() benennt sie nur noch um – ein Schreibvorgang statt
+  Spool in /tmp + Kopie durch f.save, kein zweiter Lesedurchgang.
+- Chunk-Upload: Chunks kommen in beliebiger Reihenfolge, daher ein
+  sequentielles hash_file() beim finalize.
+- find_duplicate(): gleicher Hash + Datei vorhanden -> der Ingest verknüpft
+  mit dem bestehenden Medium statt die Datei ein zweites Mal abzulegen.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import secrets
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from typing import BinaryIO, ContextManager, List, Optional, Tuple
+
+from flask import Request, current_app, has_app_context
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from werkzeug.datastructures import FileStorage
+
+from app.models.media import Media
+from app.models.upload_session import UploadSession
+from app.services.storage_service import allocate_media_path
+from app.services.single_flight import SingleFlight
+
+Range = Tuple[int, int]
+
+MAX_CHUNK_BYTES = 64 * 1024 * 1024
+COPY_BLOCK = 1024 * 1024
+FREE_SPACE_RESERVE = 256 * 1024 * 1024  # so viel bleibt auf der SD-Karte mindestens frei
+SESSION_TTL = timedelta(hours=24)
+
+# pro Sitzung ein Schreiber für die Bereichsliste (Chunks selbst laufen parallel);
+# pro Inhalts-Hash ein Ingest (gleichzeitige identische Uploads -> eine Datei)
+_session_locks = SingleFlight()
+
+
+class UploadError(Exception):
+    """Fehler mit HTTP-Status für die Route."""
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def merge_ranges(ranges: List[Range], new: Range) -> List[Range]:
+    """Fügt [start, end) ein und verschmilzt überlappende/angrenzende Bereiche."""
+    out: List[Range] = []
+    start, end = new
+    for a, b in sorted(ranges):
+        if b < start or a > end:
+            out.append((a, b))
+        else:
+            start, end = min(a, start), max(b, end)
+    out.append((start, end))
+    return sorted(out)
+
+
+def contiguous_offset(ranges: List[Range]) -> int:
+    """Länge des lückenlosen Anfangs (tus: Upload-Offset)."""
+    return ranges[0][1] if ranges and ranges[0][0] == 0 else 0
+
+
+def session_ranges(s: UploadSession) -> List[Range]:
+    return [tuple(r) for r in json.loads(s.received or "[]")]
+
+
+def is_complete(s: UploadSession) -> bool:
+    return session_ranges(s) == [(0, s.size)] or s.size == 0
+
+
+def create_upload_session(db: Session, media_dir: str, filename: str, size: int, mime: str,
+                          folder_id: Optional[int] = None) -> UploadSession:
+    if size < 0:
+        raise UploadError("ungültige Größe")
+    os.makedirs(media_dir, exist_ok=True)
+    if shutil.disk_usage(media_dir).free < size + FREE_SPACE_RESERVE:
+        raise UploadError("Nicht genug Speicherplatz.", 507)
+    purge_stale_sessions(db)
+
+    safe_name, path = allocate_media_path(media_dir, filename)  # reserviert den Pfad (O_EXCL)
+    with open(path, "r+b") as f:  # sparse auf volle Länge
+        f.truncate(size)
+    s = UploadSession(id=secrets.token_hex(16), filename=safe_name, path=path, mime=mime,
+                      size=size, received="[]", folder_id=folder_id)
+    db.add(s)
+    db.commit()
+    return s
+
+
+def write_chunk(db: Session, session_id: str, offset: int, length: int, stream: BinaryIO) -> UploadSession:
+    """Schreibt `length` Bytes aus `stream` an `offset`; gibt die aktualisierte Sitzung zurück."""
+    s = db.get(UploadSession, session_id)
+    if s is None or s.media_id is not None:
+        raise UploadError("Upload unbekannt oder abgeschlossen.", 404)
+    if offset < 0 or length <= 0 or length > MAX_CHUNK_BYTES or offset + length > s.size:
+        raise UploadError("Chunk außerhalb der Datei.", 416)
+
+    written = 0
+    with open(s.path, "r+b") as f:
+        f.seek(offset)
+        while written < length:
+            block = stream.read(min(COPY_BLOCK, length - written))
+            if not block:
+                break
+            f.write(block)
+            written += len(block)
+    if written == 0:
+        raise UploadError("Leerer Chunk.", 400)
+
+    # abgebrochene Chunks zählen nur mit dem, was wirklich angekommen ist
+    with _session_locks.lock(("upload", session_id)):
+        db.refresh(s)
+        s.received = json.dumps(merge_ranges(session_ranges(s), (offset, offset + written)))
+        s.updated_at = datetime.utcnow()
+        db.commit()
+    if written < length:
+        raise UploadError("Chunk unvollständig.", 400)
+    return s
+
+
+def get_upload_session(db: Session, session_id: str) -> Optional[UploadSession]:
+    return db.get(UploadSession, session_id)
+
+
+def session_status(s: UploadSession) -> dict:
+    ranges = session_ranges(s)
+    return {
+        "id": s.id,
+        "filename": s.filename,
+        "size": s.size,
+        "offset": contiguous_offset(ranges),
+        "received": [list(r) for r in ranges],
+        "complete": is_complete(s),
+        "media_id": s.media_id,
+    }
+
+
+def discard_upload_session(db: Session, s: UploadSession) -> None:
+    """Bricht ab: Teildatei und Sitzung entfernen (nicht nach finalize)."""
+    if s.media_id is None and os.path.isfile(s.path):
+        os.remove(s.path)
+    db.delete(s)
+    db.commit()
+
+
+def purge_stale_sessions(db: Session) -> int:
+    """Verwirft unvollendete Sitzungen älter als SESSION_TTL (samt Teildatei)."""
+    cutoff = datetime.utcnow() - SESSION_TTL
+    stale = db.execute(select(UploadSession).where(UploadSession.updated_at < cutoff)).scalars().all()
+    for s in stale:
+        if s.media_id is None and os.path.isfile(s.path):
+            os.remove(s.path)
+        db.delete(s)
+    if stale:
+        db.commit()
+    return len(stale)
+
+
+# ---------------------------
+# Inhalts-Hash / Dubletten
+# ---------------------------
+
+class HashingSpool:
+    """
+    Upload-Puffer für Werkzeug: Temp-Datei direkt im Medienordner, die jeden
+    geschriebenen Block in SHA-256 einrechnet. Nicht übernommene Spools
+    löscht close() (Flask schließt die Dateien am Request-Ende).
+    """
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(prefix=".upload-", suffix=".part", dir=directory)
+        self._f = os.fdopen(fd, "w+b")
+        self._hash = hashlib.sha256()
+
+    def write(self, data: bytes) -> int:
+        self._hash.update(data)
+        return self._f.write(data)
+
+    def __getattr__(self, name):  # read/readline/seek/tell/flush/... an die Datei
+        return getattr(self._f, name)
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+    def commit(self, path: str) -> str:
+        """Übernimmt den Spool als `path` (Umbenennen, kein Kopieren); gibt den Hash zurück."""
+        self._f.flush()
+        os.replace(self.path, path)
+        self.path = None
+        return self.hexdigest()
+
+    def close(self) -> None:
+        self._f.close()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class UploadRequest(Request):
+    """Request-Klasse der App: Datei-Uploads landen hashend im Medienordner (HashingSpool)."""
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if filename is None or not has_app_context():
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        return HashingSpool(os.path.join(current_app.root_path, "media"))
+
+
+def hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(COPY_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def save_upload(f: FileStorage, path: str) -> str:
+    """Speichert einen Formular-Upload unter `path` und gibt seinen SHA-256 zurück."""
+    if isinstance(f.stream, HashingSpool):
+        return f.stream.commit(path)
+    # Fallback (anderer Stream): kopieren und dabei hashen
+    h = hashlib.sha256()
+    with open(path, "wb") as out:
+        for block in iter(lambda: f.stream.read(COPY_BLOCK), b""):
+            h.update(block)
+            out.write(block)
+    return h.hexdigest()
+
+
+def ingest_lock(content_hash: str) -> ContextManager:
+    """Serialisiert Dubletten-Prüfung + Anlegen für denselben Inhalt."""
+    return _session_locks.lock(("ingest", content_hash))
+
+
+def find_duplicate(db: Session, content_hash: Optional[str]) -> Optional[Media]:
+    """Bestehendes Medium mit gleichem Inhalt (und vorhandener Datei) oder None."""
+    if not content_hash:
+        return None
+    for m in db.execute(select(Media).where(Media.content_hash == content_hash).order_by(Media.id)).scalars():
+        if os.path.isfile(m.path):
+            return m
+    return None
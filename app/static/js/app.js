@@ -3,18 +3,232 @@ console.log("SlidePi app.js loaded");
 
 /**
  * Upload mit Drag & Drop oder Dateiauswahl
- * Backend: /media/upload (erwartet 'file')
- * Ergebnis: Logzeilen + Reload der Medienliste
+ * Backend: /media/uploads (fortsetzbare Chunk-Uploads, siehe upload_service)
+ * Ergebnis: Logzeilen mit Fortschritt (/media/ingest); fertige Kacheln werden
+ * in eine vorhandene Medienliste ([data-media-tiles]) eingefügt – kein Reload
  */
 
 // Helper
 function $(sel){ return document.querySelector(sel); }
 
+/**
+ * Chunk-Upload: Sitzung anlegen, Chunks per PATCH (mehrere parallel, mit
+ * Retry), dann finalize. Bricht die Verbindung ab, setzt ein erneuter Aufruf
+ * mit derselben Datei dort fort, wo der Server Bereiche als empfangen meldet
+ * (Sitzungs-ID in localStorage).
+ *
+ *   SlidePi.uploadFile(file, { folderId, onProgress(sent, total) }) -> {id, filename, folder_id, duplicate}
+ */
+window.SlidePi = window.SlidePi || {};
+(function(ns){
+  const BASE = "/media/uploads";
+  const CHUNK_SIZE = 8 * 1024 * 1024;
+  const PARALLEL = 3;
+  const RETRIES = 5;
+
+  const sleep = ms => new Promise(r => setTimeout(r, ms));
+  const resumeKey = f => "slidepi-upload:" + [f.name, f.size, f.lastModified].join(":");
+
+  async function jsonOrThrow(res){
+    const data = await res.json().catch(()=> ({}));
+    if(!res.ok) throw Object.assign(new Error(data.error || ("HTTP " + res.status)), { status: res.status });
+    return data;
+  }
+
+  async function openSession(file, folderId){
+    const saved = localStorage.getItem(resumeKey(file));
+    if(saved){
+      const res = await fetch(BASE + "/" + saved, { cache: "no-store" });
+      if(res.ok){
+        const st = await res.json();
+        if(st.media_id == null) return st;
+      }
+      localStorage.removeItem(resumeKey(file));
+    }
+    const st = await jsonOrThrow(await fetch(BASE, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ filename: file.name, size: file.size, mime: file.type, folder_id: folderId || null }),
+    }));
+    localStorage.setItem(resumeKey(file), st.id);
+    return st;
+  }
+
+  function missingChunks(size, received, chunkSize){
+    const out = [];
+    let pos = 0;
+    for(const [a, b] of [...received, [size, size]]){
+      for(let o = pos; o < a; o += chunkSize) out.push([o, Math.min(o + chunkSize, a)]);
+      pos = Math.max(pos, b);
+    }
+    return out;
+  }
+
+  async function sendChunk(id, file, start, end){
+    for(let attempt = 0; ; attempt++){
+      try{
+        const res = await fetch(BASE + "/" + id, {
+          method: "PATCH",
+          headers: { "Upload-Offset": String(start), "Content-Type": "application/offset+octet-stream" },
+          body: file.slice(start, end),
+        });
+        if(res.ok) return;
+        if(res.status < 500 && res.status !== 408 && res.status !== 429) await jsonOrThrow(res);
+      }catch(err){
+        if(err.status) throw err;  // Client-Fehler: kein Retry
+      }
+      if(attempt >= RETRIES) throw new Error("Chunk " + start + " fehlgeschlagen");
+      await sleep(Math.min(500 * 2 ** attempt, 8000));
+    }
+  }
+
+  ns.uploadFile = async function(file, opts = {}){
+    const st = await openSession(file, opts.folderId);
+    const chunkSize = Math.min(CHUNK_SIZE, st.max_chunk || CHUNK_SIZE);
+    const queue = missingChunks(file.size, st.received || [], chunkSize);
+    let sent = file.size - queue.reduce((n, [a, b]) => n + (b - a), 0);
+    const progress = () => opts.onProgress && opts.onProgress(sent, file.size);
+    progress();
+
+    async function worker(){
+      while(queue.length){
+        const [a, b] = queue.shift();
+        await sendChunk(st.id, file, a, b);
+        sent += b - a;
+        progress();
+      }
+    }
+    await Promise.all(Array.from({ length: Math.min(PARALLEL, queue.length) }, worker));
+
+    const done = await jsonOrThrow(await fetch(BASE + "/" + st.id + "/finalize", { method: "POST" }));
+    localStorage.removeItem(resumeKey(file));
+    return done;
+  };
+
+  // ---------- Viele Dateien: Batches parallel, große Dateien per Chunk-Upload ----------
+  const BATCH_URL = "/media/upload/batch";
+  const BATCH_MAX_FILES = 10;
+  const BATCH_MAX_BYTES = 16 * 1024 * 1024;
+  const BATCH_PARALLEL = 3;
+
+  function planGroups(files){
+    const groups = [];
+    let cur = [], bytes = 0;
+    for(const f of files){
+      if(f.size > BATCH_MAX_BYTES){ groups.push({ chunked: f }); continue; }
+      if(cur.length && (cur.length >= BATCH_MAX_FILES || bytes + f.size > BATCH_MAX_BYTES)){
+        groups.push({ files: cur }); cur = []; bytes = 0;
+      }
+      cur.push(f); bytes += f.size;
+    }
+    if(cur.length) groups.push({ files: cur });
+    return groups;
+  }
+
+  async function sendChunked(file, folderId, onItem){
+    try{
+      const res = await ns.uploadFile(file, {
+        folderId,
+        onProgress: (sent, total)=> onItem(file, { state: "uploading", progress: sent / (total || 1) }),
+      });
+      return { file, ...res, state: "uploaded" };
+    }catch(err){
+      return { file, state: "error", error: err.message };
+    }
+  }
+
+  async function sendBatch(files, folderId, onItem){
+    const fd = new FormData();
+    files.forEach(f => fd.append("files", f, f.name));
+    if(folderId) fd.append("target_folder_id", folderId);
+    files.forEach(f => onItem(f, { state: "uploading" }));
+    let res;
+    try{
+      res = await fetch(BATCH_URL, { method: "POST", headers: { "Accept": "application/json" }, body: fd });
+    }catch(err){
+      res = null;
+    }
+    if(!res || res.status === 413 || res.status >= 500){
+      // Netzwerk/Server-Limit: einzeln über den fortsetzbaren Chunk-Upload
+      const out = [];
+      for(const f of files) out.push(await sendChunked(f, folderId, onItem));
+      return out;
+    }
+    try{
+      const data = await jsonOrThrow(res);
+      return files.map((f, i)=>{
+        const it = data.items[i] || { error: "keine Antwort" };
+        return it.error ? { file: f, state: "error", error: it.error } : { file: f, ...it, state: "uploaded" };
+      });
+    }catch(err){
+      return files.map(f => ({ file: f, state: "error", error: err.message }));
+    }
+  }
+
+  /**
+   * SlidePi.uploadMany(files, { folderId, parallel, onItem(file, {state, ...}) })
+   *   -> [{file, id, filename, duplicate, status} | {file, error}] in Eingabereihenfolge
+   * Antwortet, sobald alle Dateien angenommen sind; Thumbnails/Probe laufen
+   * serverseitig weiter (siehe SlidePi.watchIngest).
+   */
+  ns.uploadMany = async function(files, opts = {}){
+    const onItem = opts.onItem || (()=>{});
+    const groups = planGroups([...files]);
+    const results = new Map();
+    async function worker(){
+      while(groups.length){
+        const g = groups.shift();
+        const out = g.chunked ? [await sendChunked(g.chunked, opts.folderId, onItem)]
+                              : await sendBatch(g.files, opts.folderId, onItem);
+        out.forEach(r => { results.set(r.file, r); onItem(r.file, r); });
+      }
+    }
+    const n = Math.min(opts.parallel || BATCH_PARALLEL, groups.length);
+    await Promise.all(Array.from({ length: n }, worker));
+    return [...files].map(f => results.get(f));
+  };
+
+  /**
+   * SlidePi.fetchTiles(ids) -> [Element] – gerenderte Kacheln (/media/tiles)
+   */
+  ns.fetchTiles = async function(ids){
+    if(!ids.length) return [];
+    const res = await fetch("/media/tiles?ids=" + ids.join(","), { cache: "no-store" });
+    if(!res.ok) return [];
+    const tpl = document.createElement("template");
+    tpl.innerHTML = (await res.text()).trim();
+    return Array.from(tpl.content.querySelectorAll(".media-tile"));
+  };
+
+  /**
+   * SlidePi.watchIngest(ids, onUpdate(items)) -> items
+   * Fragt /media/ingest ab, bis alle IDs fertig (ready/failed) sind.
+   */
+  ns.watchIngest = async function(ids, onUpdate, intervalMs = 1000){
+    ids = [...new Set(ids)];
+    while(ids.length){
+      let data = null;
+      try{
+        const res = await fetch("/media/ingest?ids=" + ids.join(","), { cache: "no-store" });
+        if(res.ok) data = await res.json();
+      }catch(_e){}
+      if(data){
+        onUpdate && onUpdate(data.items);
+        if(data.done) return data.items;
+      }
+      await sleep(intervalMs);
+    }
+    return [];
+  };
+})(window.SlidePi);
+
 document.addEventListener("DOMContentLoaded", ()=>{
+  // Seiten mit eigener Upload-Logik (z. B. media_grid) binden selbst
+  if($("#upload-form")?.dataset.uploadManaged !== undefined) return;
   const input = $("#file-input");
   const dropzone = $("#dropzone");
   const logEl = $("#upload-log");
-  const uploadUrl = "/media/upload";
+  const listEl = $("[data-media-tiles]");
 
   function ensureLogVisible(){ if(logEl) logEl.hidden = false; }
   function addLogLine(name, status){
@@ -25,34 +239,43 @@ document.addEventListener("DOMContentLoaded", ()=>{
     return li.querySelector(".st");
   }
 
-  async function uploadOne(file){
-    const statusEl = addLogLine(file.name, "Lade hoch …");
-    const fd = new FormData();
-    fd.append("file", file, file.name);
-    try{
-      const res = await fetch(uploadUrl, { method: "POST", body: fd });
-      if(res.redirected || res.ok){
-        statusEl.textContent = "fertig";
-      }else{
-        statusEl.textContent = "Fehler (" + res.status + ")";
-      }
-    }catch(err){
-      console.error(err);
-      statusEl.textContent = "Netzwerkfehler";
-    }
-  }
-
   async function uploadMany(files){
     if(!files || !files.length) return;
+    const ok = [];
     for(const f of files){
       if(!/^image\//.test(f.type) && !/^video\//.test(f.type)){
         addLogLine(f.name, "übersprungen (nicht erlaubt)");
         continue;
       }
-      await uploadOne(f);
+      ok.push(f);
     }
-    // nach Abschluss neu laden
-    try{ location.reload(); }catch(_e){}
+    const lines = new Map(ok.map(f => [f, addLogLine(f.name, "wartet …")]));
+    const results = await SlidePi.uploadMany(ok, {
+      onItem: (f, st)=>{
+        const el = lines.get(f);
+        if(st.state === "uploading") el.textContent = "Lade hoch …";
+        else if(st.state === "error") el.textContent = "Fehler: " + st.error;
+        else el.textContent = st.duplicate ? "bereits vorhanden (" + st.filename + ")" : "verarbeite …";
+      },
+    });
+    const fresh = results.filter(r => r && r.id && !r.duplicate);
+    const shown = new Set();
+    await SlidePi.watchIngest(fresh.map(r => r.id), async items=>{
+      const ready = [];
+      items.forEach(it=>{
+        const r = fresh.find(x => x.id === it.id);
+        if(!r || shown.has(it.id) || (it.status !== "ready" && it.status !== "failed")) return;
+        shown.add(it.id);
+        lines.get(r.file).textContent = it.status === "ready" ? "fertig" : "Fehler bei der Verarbeitung";
+        if(it.status === "ready") ready.push(it.id);
+      });
+      // fertige Medien direkt in die Liste übernehmen (statt Seite neu zu laden)
+      if(listEl && ready.length){
+        const tiles = await SlidePi.fetchTiles(ready);
+        tiles.forEach(t => listEl.querySelector(`.media-tile[data-id="${t.dataset.id}"]`)?.remove());
+        listEl.prepend(...tiles);
+      }
+    });
   }
 
   if(input){
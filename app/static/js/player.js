@@ -9,6 +9,15 @@ const WRAP = qs(".player-wrap");
 const MODE = WRAP?.dataset.mode || "normal";
 const IS_KIOSK = MODE === "kiosk";
 
+// Geräte-ID für Multi-Display (/present/kiosk?device=lobby-1), lokal gemerkt
+const DEVICE_ID = (() => {
+  try{
+    const fromUrl = new URLSearchParams(location.search).get("device");
+    if (fromUrl) localStorage.setItem("slidepi_device", fromUrl);
+    return fromUrl || localStorage.getItem("slidepi_device");
+  }catch{ return null; }
+})();
+
 // --- Player State -----------------------------------------------------------
 let feed = [];
 let sig = "";
@@ -25,12 +34,17 @@ const POLL_MS_BASE = 5000;
 const POLL_MS_MAX  = 30000;
 let pollMs = POLL_MS_BASE;
 let lastETag = null;
+let lastRevision = null;  // für Delta-Abfragen (/api/feed?since=…)
+
+// Push (SSE): solange verbunden, läuft das Polling nur noch als seltener Fallback
+const POLL_MS_SSE = 60000;
+let sseConnected = false;
 
 function computeSignature(items){
   const s = items.map(i => {
     const key = i.playlist_item_id ?? i.media_id ?? i.id ?? i.url ?? "?";
     const dur = i.duration ?? i.duration_s ?? "";
-    return `${key}:${dur}`;
+    return `${key}:${dur}:${i.url ?? ""}`;
   }).join("|");
   let h = 0;
   for (let i=0;i<s.length;i++){ h = (h*31 + s.charCodeAt(i)) >>> 0; }
@@ -51,17 +65,80 @@ function showStatus(msg){
   setTimeout(()=> { hint.hidden = true; }, 2500);
 }
 
+// Delta auf den aktuellen Feed anwenden: Aufwand ~ Anzahl Änderungen
+// (sortiert wird nur bei Einfügungen/Verschiebungen)
+function applyDelta(base, d){
+  const byId = new Map(base.map(i => [i.playlist_item_id, i]));
+  for (const id of (d.removed || [])) byId.delete(id);
+  for (const it of (d.inserted || [])) byId.set(it.playlist_item_id, it);
+  for (const it of (d.modified || [])) byId.set(it.playlist_item_id, it);
+  for (const mv of (d.moved || [])){
+    const it = byId.get(mv.playlist_item_id);
+    if (it) byId.set(mv.playlist_item_id, { ...it, position: mv.position });
+  }
+  const out = Array.from(byId.values());
+  if ((d.inserted || []).length || (d.moved || []).length){
+    out.sort((a, b) => (a.position ?? 0) - (b.position ?? 0));
+  }
+  return out;
+}
+
+function deltaSize(d){
+  return (d.inserted || []).length + (d.modified || []).length
+       + (d.moved || []).length + (d.removed || []).length;
+}
+
+// Spaltenformat (/api/feed?format=compact) in Item-Objekte umwandeln
+function expandColumnar(j){
+  const c = j.columns || {};
+  const mimes = j.mimes || [];
+  const n = j.count ?? (c.media_id || []).length;
+  const out = new Array(n);
+  for (let i = 0; i < n; i++){
+    const mid = c.media_id[i];
+    const mime = mimes[c.mime[i]] || "";
+    // versionierte URLs sind immutable -> Browser-Cache ohne Revalidierung
+    const v = c.version && c.version[i] ? `/${c.version[i]}` : "";
+    const type = mime.startsWith("video/") ? "video" : "image";
+    out[i] = {
+      playlist_item_id: c.playlist_item_id[i],
+      position: c.position[i],
+      media_id: mid,
+      filename: c.filename[i],
+      type,
+      duration: c.duration[i],
+      url: type === "image" ? `/media/display/${mid}${v}` : `/media/raw/${mid}${v}`,
+      thumb: `/media/thumb/${mid}${v}`,
+      mime,
+      width: c.width ? c.width[i] : null,
+      height: c.height ? c.height[i] : null,
+    };
+  }
+  return out;
+}
+
 async function fetchFeed(){
   const headers = { "cache-control":"no-store" };
   if (lastETag) headers["If-None-Match"] = lastETag;
 
-  const res = await fetch("/api/feed", { headers });
+  const params = new URLSearchParams({ format: "compact" });
+  if (lastRevision) params.set("since", lastRevision);
+  if (DEVICE_ID) params.set("device", DEVICE_ID);
+  const url = `/api/feed?${params}`;
+  const res = await fetch(url, { headers });
   if (res.status === 304){
     return { items: null, etag: lastETag };
   }
   if (!res.ok) throw new Error(`feed request failed: ${res.status}`);
   const et = res.headers.get("ETag");
   const j = await res.json();
+  if (j && j.revision) lastRevision = j.revision;
+  if (j && j.ok && j.delta){
+    return { items: applyDelta(feed, j), etag: et, delta: true, changed: deltaSize(j) > 0 };
+  }
+  if (j && j.ok && j.format === "columnar"){
+    return { items: expandColumnar(j), etag: et };
+  }
   const items = (j && j.ok && Array.isArray(j.feed)) ? j.feed
               : (j && Array.isArray(j.items)) ? j.items
               : [];
@@ -70,7 +147,7 @@ async function fetchFeed(){
 
 async function loadFeed(initial=false){
   try{
-    const { items, etag } = await fetchFeed();
+    const { items, etag, delta, changed } = await fetchFeed();
 
     if (etag) lastETag = etag;
 
@@ -79,7 +156,17 @@ async function loadFeed(initial=false){
       return false;
     }
 
+    // Delta: keine Signatur über den kompletten Feed nötig
+    if (delta && !initial){
+      if (!changed) return false;
+      pendingUpdate = true;
+      feed = items; sig = null;
+      showStatus("Playlist aktualisiert");
+      return true;
+    }
+
     const newSig = computeSignature(items);
+    if (sig === null) sig = computeSignature(feed);
 
     if (initial){
       feed = items; sig = newSig; idx = 0;
@@ -104,19 +191,33 @@ async function loadFeed(initial=false){
   }
 }
 
+async function refreshFeed(){
+  const changed = await loadFeed(false);
+  if (changed && pendingUpdate && playing && feed.length === 0){ nextItem(true); }
+  return changed;
+}
+
 async function startPolling(){
   while (true){
-    await sleep(pollMs);
-    const changed = await loadFeed(false);
+    await sleep(sseConnected ? POLL_MS_SSE : pollMs);
+    const changed = await refreshFeed();
     if (changed){
       pollMs = POLL_MS_BASE;
-      if (pendingUpdate && playing && feed.length === 0){ nextItem(true); }
     } else {
       pollMs = Math.min(Math.round(pollMs * 1.25), POLL_MS_MAX);
     }
   }
 }
 
+function startStream(){
+  if (!("EventSource" in window)) return;
+  const es = new EventSource("/api/feed/stream");
+  es.addEventListener("open", ()=> { sseConnected = true; });
+  // EventSource verbindet sich bei Fehlern selbst neu; bis dahin greift das Polling
+  es.addEventListener("error", ()=> { sseConnected = false; });
+  es.addEventListener("revision", ()=> { refreshFeed(); });
+}
+
 function scheduleNext(ms){
   if (!playing) return;
   if (timer) { clearTimeout(timer); timer = null; }
@@ -135,6 +236,15 @@ function kindOf(item){
   return "file";
 }
 
+// Bild-Derivate: Server wählt das kleinste Display-Profil, das den Bildschirm abdeckt
+const SCREEN_FIT = `${Math.round(screen.width * (window.devicePixelRatio || 1))}x${Math.round(screen.height * (window.devicePixelRatio || 1))}`;
+
+function mediaSrc(item){
+  const src = item.url || item.path;
+  if (src && src.startsWith("/media/display/")) return `${src}?fit=${SCREEN_FIT}`;
+  return src;
+}
+
 function preloadNext(){
   nextPreload = null;
   if (!feed.length) return;
@@ -142,7 +252,7 @@ function preloadNext(){
   const nextIdx = (idx + 1) % feed.length;
   const item = feed[nextIdx];
   const k = kindOf(item);
-  const src = item.url || item.path;
+  const src = mediaSrc(item);
   if (!src) return;
 
   if (k === "image"){
@@ -168,7 +278,7 @@ function onLoadErrorSkip(label){
 function renderImage(item){
   const stage = qs("#stage");
   const img = document.createElement("img");
-  img.src = item.url || item.path;
+  img.src = mediaSrc(item);
   img.alt = item.filename || "Bild";
   img.className = "stage-media";
   img.onload = () => {
@@ -348,6 +458,7 @@ async function start(){
   await loadFeed(true);
   preloadNext();
   showCurrent();
+  startStream();
   startPolling();
 }
 
@@ -0,0 +1,107 @@
+# scripts/bench_feed.py
+"""
+Benchmark: Feed-Lesepfad (ORM N+1 vs. ein Core-JOIN).
+
+Legt pro Größe eine temporäre SQLite-DB mit N Medien + Playlist-Items an und
+misst Latenz (Median über mehrere Läufe) und Allokationen (tracemalloc-Peak).
+
+    python scripts/bench_feed.py            # 10, 1000, 10000 Items
+    python scripts/bench_feed.py 10 500     # eigene Größen
+"""
+from __future__ import annotations
+import os
+import sys
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import insert  # noqa: E402
+
+import app.db as app_db  # noqa: E402
+from app.models.media import Media  # noqa: E402
+from app.models.playlist import Playlist, PlaylistItem  # noqa: E402
+from app.services.playlist_service import (  # noqa: E402
+    get_or_create_default_playlist,
+    get_playlist_items,
+    list_active_feed,
+)
+
+RUNS = 5
+
+
+def legacy_feed(db, default_duration: int):
+    """Alter Lesepfad: aktive Playlist -> Items -> db.get(Media) pro Item."""
+    active = get_or_create_default_playlist(db)
+    feed = []
+    for pit in get_playlist_items(db, active.id):
+        media = db.get(Media, pit.media_id)
+        if not media:
+            continue
+        mime = media.mime or ""
+        typ = "video" if mime.startswith("video/") else ("image" if mime.startswith("image/") else "unknown")
+        if typ == "unknown":
+            continue
+        duration = pit.duration_override_s if (pit.duration_override_s and pit.duration_override_s > 0) else default_duration
+        feed.append({
+            "playlist_item_id": pit.id, "media_id": media.id, "filename": media.filename,
+            "type": typ, "duration": duration,
+            "url": f"/media/raw/{media.id}", "thumb": f"/media/thumb/{media.id}",
+            "mime": media.mime, "width": None, "height": None,
+        })
+    return feed
+
+
+def seed(n: int) -> None:
+    with app_db.engine.begin() as conn:
+        conn.execute(insert(Playlist.__table__), [{"id": 1, "name": "Default", "is_active": True}])
+        conn.execute(insert(Media.__table__), [
+            {"id": i, "filename": f"img_{i}.jpg", "path": f"/tmp/img_{i}.jpg", "mime": "image/jpeg"}
+            for i in range(1, n + 1)
+        ])
+        conn.execute(insert(PlaylistItem.__table__), [
+            {"playlist_id": 1, "media_id": i, "position": i, "duration_override_s": (i % 7) or None}
+            for i in range(1, n + 1)
+        ])
+
+
+def measure(fn) -> tuple[float, int]:
+    times = []
+    for _ in range(RUNS):
+        db = app_db.get_session()
+        try:
+            t0 = time.perf_counter()
+            fn(db, 10)
+            times.append(time.perf_counter() - t0)
+        finally:
+            db.close()
+
+    db = app_db.get_session()
+    try:
+        tracemalloc.start()
+        fn(db, 10)
+        _cur, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        db.close()
+    return statistics.median(times), peak
+
+
+def main(sizes: list[int]) -> None:
+    print(f"{'items':>7} | {'pfad':<6} | {'median ms':>10} | {'peak KiB':>9}")
+    print("-" * 43)
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            app_db.init_db(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+            seed(n)
+            for label, fn in (("orm", legacy_feed), ("core", list_active_feed)):
+                med, peak = measure(fn)
+                print(f"{n:>7} | {label:<6} | {med * 1000:>10.2f} | {peak / 1024:>9.1f}")
+            app_db.engine.dispose()
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]] or [10, 1000, 10000]
+    main(args)
@@ -0,0 +1,152 @@
+# scripts/bench_ingest.py
+"""
+Benchmark: Upload-Ingest über /media/upload – Durchsatz und Schreiblast.
+
+Drei Varianten, jeweils mit einem echten Multipart-Body durch den
+Werkzeug-Formparser:
+
+    vorher       Werkzeug spoolt in eine Temp-Datei, f.save() kopiert sie
+                 in den Medienordner (Stand vor content_hash)
+    vorher+hash  wie vorher, danach ein zusätzlicher Lesedurchgang für
+                 SHA-256 (naive Dubletten-Erkennung)
+    nachher      UploadRequest: Werkzeug schreibt hashend direkt in den
+                 Medienordner, save_upload() benennt nur um
+
+Gemessen werden Wandzeit/Durchsatz sowie die vom Prozess geschriebenen und
+gelesenen Bytes (write_chars/read_chars = Syscall-Ebene, write_bytes =
+an das Blockgerät übergeben, abzüglich vor dem Rückschreiben gelöschter
+Daten). Zum Schluss ein kompletter Upload derselben Bilddatei zweimal über
+die App (zweiter = Dublette: keine neue Datei, keine Thumbnails) – Antwortzeit
+und Zeit bis die Hintergrund-Nachbearbeitung (ingest_service) fertig ist.
+
+    python scripts/bench_ingest.py                    # 5 Läufe à 64 MiB
+    python scripts/bench_ingest.py --size-mb 256 --runs 3
+"""
+from __future__ import annotations
+import argparse
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import psutil
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from flask import Request  # noqa: E402
+from werkzeug.test import EnvironBuilder  # noqa: E402
+
+MODES = ("vorher", "vorher+hash", "nachher")
+
+
+def _io() -> dict:
+    c = psutil.Process().io_counters()
+    return {
+        "read": c.read_chars,
+        "written": c.write_chars,
+        "disk": c.write_bytes - getattr(c, "cancelled_write_bytes", 0),
+    }
+
+
+def _environ(payload: bytes, filename: str = "event.mp4", mime: str = "video/mp4") -> tuple:
+    """Multipart-Body wie vom Browser; gibt (environ, body) zurück."""
+    builder = EnvironBuilder(method="POST", path="/media/upload",
+                             data={"file": (io.BytesIO(payload), filename, mime)})
+    env = builder.get_environ()
+    body = env["wsgi.input"].read()
+    builder.close()
+    return env, body
+
+
+def ingest_once(app, mode: str, env: dict, body: bytes, media_dir: str) -> None:
+    from app.services.storage_service import allocate_media_path
+    from app.services.upload_service import UploadRequest, hash_file, save_upload
+
+    env = dict(env, **{"wsgi.input": io.BytesIO(body)})
+    with app.app_context():
+        req = (UploadRequest if mode == "nachher" else Request)(env)
+        try:
+            f = req.files["file"]
+            _name, path = allocate_media_path(media_dir, f.filename)
+            if mode == "nachher":
+                save_upload(f, path)
+            else:
+                f.save(path)
+                if mode == "vorher+hash":
+                    hash_file(path)
+        finally:
+            req.close()
+    os.remove(path)
+
+
+def bench_modes(app, size_mb: int, runs: int, media_dir: str) -> None:
+    payload = os.urandom(size_mb * 1024 * 1024)
+    env, body = _environ(payload)
+    print(f"{'Variante':<12} | {'ms':>8} | {'MiB/s':>7} | {'geschr. MiB':>11} | {'gelesen MiB':>11} | {'Platte MiB':>10}")
+    print("-" * 76)
+    for mode in MODES:
+        times, deltas = [], []
+        for _ in range(runs):
+            before = _io()
+            t0 = time.perf_counter()
+            ingest_once(app, mode, env, body, media_dir)
+            times.append(time.perf_counter() - t0)
+            after = _io()
+            deltas.append({k: after[k] - before[k] for k in before})
+        t = statistics.median(times)
+        d = {k: statistics.median(x[k] for x in deltas) / 2**20 for k in deltas[0]}
+        print(f"{mode:<12} | {t * 1000:>8.1f} | {size_mb / t:>7.1f} | {d['written']:>11.1f} | "
+              f"{d['read']:>11.1f} | {d['disk']:>10.1f}")
+    print("(Werte pro Upload, Median; 'gelesen' ohne den Request-Body selbst)")
+
+
+def bench_duplicate(app) -> None:
+    from PIL import Image
+    from app.services import ingest_service
+
+    buf = io.BytesIO()
+    Image.effect_noise((4000, 3000), 60).convert("RGB").save(buf, format="JPEG", quality=92)
+    # Body vorab kodieren: sonst spoolt der Test-Client ihn selbst in eine Temp-Datei
+    env, body = _environ(buf.getvalue(), "foto.jpg", "image/jpeg")
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s["user"] = {"username": "admin", "role": "admin"}
+    print(f"\nKompletter Upload, Foto {len(body) / 2**20:.1f} MiB (Antwort / inkl. Thumbnails+Derivate):")
+    for label in ("neu", "Dublette"):
+        before = _io()
+        t0 = time.perf_counter()
+        r = client.post("/media/upload", headers={"Accept": "application/json"},
+                        data=body, content_type=env["CONTENT_TYPE"])
+        ms = (time.perf_counter() - t0) * 1000
+        ingest_service._queue.join()  # Hintergrund-Nachbearbeitung abwarten
+        total_ms = (time.perf_counter() - t0) * 1000
+        after = _io()
+        print(f"  {label:<9} {ms:>8.1f} / {total_ms:>8.1f} ms  geschrieben "
+              f"{(after['written'] - before['written']) / 2**20:>6.1f} MiB"
+              f"  -> id {r.json['id']}, duplicate={r.json['duplicate']}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--size-mb", type=int, default=64)
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        os.environ["THUMB_PACK"] = "0"
+        from app import create_app
+        app = create_app()
+        app.root_path = workdir  # Medienordner = <workdir>/media
+        app.config["MAX_CONTENT_LENGTH"] = None
+        media_dir = os.path.join(workdir, "media")
+        os.makedirs(media_dir)
+        print(f"Temp-Verzeichnis (Werkzeug-Spool): {tempfile.gettempdir()}, Medienordner: {media_dir}\n")
+        bench_modes(app, args.size_mb, args.runs, media_dir)
+        bench_duplicate(app)
+
+
+if __name__ == "__main__":
+    main()
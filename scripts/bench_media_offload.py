@@ -0,0 +1,135 @@
+# scripts/bench_media_offload.py
+"""
+Benchmark: parallele Video-Streams über /media/raw mit und ohne Offload.
+
+Startet die App (threaded Werkzeug-Server) in einem eigenen Prozess, legt ein
+großes Testvideo an und lässt N Clients die Datei in Range-Blöcken laden –
+so wie ein <video>-Element es tut. Gemessen werden Wandzeit, die vom
+Python-Prozess übertragenen Bytes und dessen CPU-Zeit.
+
+Im Offload-Modus (x-accel / x-sendfile) antwortet Flask nur mit dem Header;
+die eigentliche Übertragung übernimmt im Betrieb nginx/Apache. Die Zahlen
+zeigen also, wie lange ein Worker-Thread pro Stream belegt ist.
+
+    python scripts/bench_media_offload.py                 # 8 Streams, 64 MiB
+    python scripts/bench_media_offload.py --streams 16 --size-mb 256
+"""
+from __future__ import annotations
+import argparse
+import http.client
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import psutil
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+CHUNK = 8 * 1024 * 1024  # Range-Blockgröße pro Request
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve(workdir: str, port: int, mode: str, ready) -> None:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["MEDIA_OFFLOAD"] = mode
+    from werkzeug.serving import make_server
+    from app import create_app
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    app = create_app()
+    app.root_path = workdir  # Medienverzeichnis = <workdir>/media
+    srv = make_server("127.0.0.1", port, app, threaded=True)
+    ready.set()
+    srv.serve_forever()
+
+
+def _seed(workdir: str, size_mb: int) -> int:
+    media_dir = os.path.join(workdir, "media")
+    os.makedirs(media_dir, exist_ok=True)
+    path = os.path.join(media_dir, "bench.mp4")
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(block)
+
+    from app.db import get_session
+    from app.services.media_service import add_media_record
+    db = get_session()
+    try:
+        return add_media_record(db, filename="bench.mp4", path=path, mime="video/mp4").id
+    finally:
+        db.close()
+
+
+def _stream(port: int, media_id: int, size: int) -> int:
+    """Lädt die Datei blockweise per Range; gibt die empfangenen Body-Bytes zurück."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    got = 0
+    try:
+        for start in range(0, size, CHUNK):
+            end = min(start + CHUNK, size) - 1
+            conn.request("GET", f"/media/raw/{media_id}", headers={"Range": f"bytes={start}-{end}"})
+            resp = conn.getresponse()
+            while True:
+                data = resp.read(256 * 1024)
+                if not data:
+                    break
+                got += len(data)
+    finally:
+        conn.close()
+    return got
+
+
+def run(mode: str, workdir: str, media_id: int, size: int, streams: int) -> None:
+    port = _free_port()
+    ready = multiprocessing.Event()
+    proc = multiprocessing.Process(target=_serve, args=(workdir, port, mode, ready), daemon=True)
+    proc.start()
+    ready.wait(30)
+    server = psutil.Process(proc.pid)
+    cpu0 = server.cpu_times()
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=streams) as ex:
+        total = sum(ex.map(lambda _i: _stream(port, media_id, size), range(streams)))
+    wall = time.perf_counter() - t0
+
+    cpu1 = server.cpu_times()
+    cpu = (cpu1.user - cpu0.user) + (cpu1.system - cpu0.system)
+    proc.terminate()
+    proc.join()
+    print(f"{mode:<11} | {streams:>7} | {wall:>7.2f} | {total / 2**20:>12.1f} | {cpu:>7.2f}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--streams", type=int, default=8)
+    ap.add_argument("--size-mb", type=int, default=64)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        from app.db import init_db
+        init_db(os.environ["DATABASE_URL"])
+        media_id = _seed(workdir, args.size_mb)
+        size = args.size_mb * 1024 * 1024
+
+        print(f"{'modus':<11} | {'streams':>7} | {'wall s':>7} | {'MiB (Python)':>12} | {'CPU s':>7}")
+        print("-" * 58)
+        for mode in ("none", "x-accel", "x-sendfile"):
+            run(mode, workdir, media_id, size, args.streams)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+# scripts/bench_thumb_pack.py
+"""
+Benchmark: Grid-Ladezeit über /media/thumb – lose Dateien in _thumbs vs.
+gepacktes Thumbnail-Archiv (THUMB_PACK, app/services/thumb_pack.py).
+
+Legt N Medien (Standard 10 000) mit je vollständigem Thumbnail-Satz an –
+einmal als Einzeldateien, einmal im Pack –, startet die App (threaded
+Werkzeug-Server) je Layout in einem eigenen Prozess und lädt zufällige
+Grid-Seiten so, wie der Browser es tut: 60 Thumbnails (?w=320, WebP) pro
+Seite über 6 parallele Verbindungen. Erster Durchlauf = kalter App-Cache,
+zweiter = warm. Dazu Platzbedarf auf der Platte (belegte Blöcke, Inodes).
+Die Zeiten schwanken stark mit Page-Cache, Dateisystem und CPU; THUMB_PACK
+bleibt experimentell, bis es auf der Zielhardware (Pi + SD-Karte) vorn liegt.
+
+    python scripts/bench_thumb_pack.py                  # 10 000 Medien, 40 Seiten
+    python scripts/bench_thumb_pack.py --items 2000 --pages 20
+"""
+from __future__ import annotations
+import argparse
+import http.client
+import io
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from PIL import Image  # noqa: E402
+
+PAGE_SIZE = 60
+CONNECTIONS = 6  # parallele Verbindungen pro Host wie im Browser
+PACK_BATCH = 600
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _thumb_bytes() -> dict:
+    """Ein Thumbnail-Satz aus einem synthetischen Foto (realistische Dateigrößen)."""
+    from app.services.media_service import THUMB_FORMATS, THUMB_WIDTHS
+    # grobes Rauschen hochskaliert: Struktur in allen Thumbnail-Größen (160er ~7 KB, 640er ~50 KB)
+    noise = Image.effect_noise((128, 85), 80).resize((640, 427), Image.BICUBIC).convert("RGB")
+    base = Image.blend(noise, Image.linear_gradient("L").resize((640, 427)).convert("RGB"), 0.5)
+    out = {}
+    for w in THUMB_WIDTHS:
+        img = base.copy()
+        img.thumbnail((w, w))
+        for fmt, (pil_format, _ext, _mime, opts) in THUMB_FORMATS.items():
+            buf = io.BytesIO()
+            img.save(buf, format=pil_format, **opts)
+            out[(w, fmt)] = buf.getvalue()
+    return out
+
+
+def _seed(workdir: str, items: int) -> tuple:
+    """Medien in der DB + Thumbnails in beiden Layouts. Rückgabe: (ids, version)."""
+    from app.db import get_session
+    from app.models.media import Media
+    from app.services.media_service import media_version_for_path, thumb_filename_for
+    from app.services.thumb_pack import configure_thumb_pack
+
+    src = os.path.join(workdir, "source.jpg")
+    Image.new("RGB", (64, 48), "gray").save(src, format="JPEG")
+    version = media_version_for_path(src)
+
+    db = get_session()
+    try:
+        rows = [Media(filename=f"photo_{i:05d}.jpg", path=src, mime="image/jpeg") for i in range(items)]
+        db.add_all(rows)
+        db.commit()
+        ids = [m.id for m in rows]
+    finally:
+        db.close()
+
+    thumbs = _thumb_bytes()
+    files_dir = os.path.join(workdir, "files", "media", "_thumbs")
+    pack_dir = os.path.join(workdir, "pack", "media", "_thumbs")
+    os.makedirs(files_dir)
+    pack = configure_thumb_pack(pack_dir)
+    batch = []
+    for n, media_id in enumerate(ids, 1):
+        for (w, fmt), data in thumbs.items():
+            name = thumb_filename_for(media_id, version, w, fmt)
+            with open(os.path.join(files_dir, name), "wb") as f:
+                f.write(data)
+            with open(os.path.join(pack_dir, name), "wb") as f:
+                f.write(data)
+            batch.append((name, os.path.join(pack_dir, name)))
+        if n % PACK_BATCH == 0 or n == len(ids):
+            pack.put_files(batch)  # übernimmt die Dateien und löscht sie
+            batch = []
+    configure_thumb_pack(None)
+    return ids, version
+
+
+def _serve(workdir: str, layout: str, port: int, ready) -> None:
+    os.environ["THUMB_PACK"] = "0"
+    from werkzeug.serving import make_server
+    from app import create_app
+    from app.services.thumb_pack import configure_thumb_pack
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    app = create_app()
+    app.root_path = os.path.join(workdir, layout)  # Thumbnails = <root>/media/_thumbs
+    if layout == "pack":
+        configure_thumb_pack(os.path.join(app.root_path, "media", "_thumbs"))
+    srv = make_server("127.0.0.1", port, app, threaded=True)
+    ready.set()
+    srv.serve_forever()
+
+
+def _fetch(port: int, paths: list) -> int:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    got = 0
+    try:
+        for path in paths:
+            conn.request("GET", path, headers={"Accept": "image/webp,*/*"})
+            resp = conn.getresponse()
+            body = resp.read()
+            if resp.status != 200:
+                raise RuntimeError(f"{path}: HTTP {resp.status}")
+            got += len(body)
+            if resp.getheader("Connection", "").lower() == "close":
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    finally:
+        conn.close()
+    return got
+
+
+def _load_pages(port: int, pages: list, version: str) -> list:
+    """Lädt jede Seite (Liste von IDs) komplett; gibt die Seitenzeiten in ms zurück."""
+    times = []
+    with ThreadPoolExecutor(max_workers=CONNECTIONS) as ex:
+        for page in pages:
+            urls = [f"/media/thumb/{i}/{version}?w=320" for i in page]
+            parts = [urls[k::CONNECTIONS] for k in range(CONNECTIONS)]
+            t0 = time.perf_counter()
+            list(ex.map(lambda p: _fetch(port, p), parts))
+            times.append((time.perf_counter() - t0) * 1000)
+    return times
+
+
+def _disk_usage(directory: str) -> tuple:
+    files = allocated = apparent = 0
+    with os.scandir(directory) as it:
+        for e in it:
+            if e.is_file():
+                st = e.stat()
+                files += 1
+                apparent += st.st_size
+                allocated += st.st_blocks * 512
+    return files, apparent, allocated
+
+
+def _p95(values: list) -> float:
+    return sorted(values)[max(0, int(len(values) * 0.95) - 1)]
+
+
+def run(layout: str, workdir: str, pages: list, version: str) -> None:
+    port = _free_port()
+    ready = multiprocessing.Event()
+    proc = multiprocessing.Process(target=_serve, args=(workdir, layout, port, ready), daemon=True)
+    proc.start()
+    ready.wait(30)
+    try:
+        cold = _load_pages(port, pages, version)
+        warm = _load_pages(port, pages, version)
+    finally:
+        proc.terminate()
+        proc.join()
+    files, apparent, allocated = _disk_usage(os.path.join(workdir, layout, "media", "_thumbs"))
+    print(f"{layout:<6} | {statistics.median(cold):>9.1f} | {_p95(cold):>8.1f} | "
+          f"{statistics.median(warm):>9.1f} | {_p95(warm):>8.1f} | {files:>7} | "
+          f"{apparent / 2**20:>8.1f} | {allocated / 2**20:>8.1f}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=10_000)
+    ap.add_argument("--pages", type=int, default=40, help=f"Grid-Seiten à {PAGE_SIZE} Thumbnails")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        from app.db import init_db
+        init_db(os.environ["DATABASE_URL"])
+        print(f"Lege {args.items} Medien mit Thumbnail-Sätzen an …")
+        ids, version = _seed(workdir, args.items)
+
+        rnd = random.Random(42)
+        starts = [rnd.randrange(0, max(1, len(ids) - PAGE_SIZE)) for _ in range(args.pages)]
+        pages = [ids[s:s + PAGE_SIZE] for s in starts]
+
+        print(f"{'layout':<6} | {'kalt ms':>9} | {'p95':>8} | {'warm ms':>9} | {'p95':>8} | "
+              f"{'Dateien':>7} | {'MiB':>8} | {'belegt':>8}")
+        print("-" * 80)
+        for layout in ("files", "pack"):
+            run(layout, workdir, pages, version)
+        print("(Zeiten pro Grid-Seite; 'belegt' = allozierte Blöcke inkl. Verschnitt)")
+
+
+if __name__ == "__main__":
+    main()
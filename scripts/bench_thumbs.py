@@ -0,0 +1,122 @@
+# scripts/bench_thumbs.py
+"""
+Benchmark: Thumbnail-Erzeugung für große Fotos – bisheriger Pfad
+(voller Decode, jede Größe aus dem Original) vs. schneller Pfad
+(media_service.ensure_thumbnail: JPEG-draft, EXIF-Thumbnail, kaskadiert).
+
+Beide Varianten erzeugen denselben Satz (THUMB_WIDTHS x JPEG/WebP).
+Jede Variante läuft in einem frischen Prozess, damit der Peak-RSS
+(ru_maxrss) nicht von der anderen beeinflusst wird.
+
+    python scripts/bench_thumbs.py                      # 8 synthetische 24-MP-JPEGs
+    python scripts/bench_thumbs.py --corpus ~/Bilder    # eigene Fotos (*.jpg)
+    python scripts/bench_thumbs.py --count 20 --mp 48
+"""
+from __future__ import annotations
+import argparse
+import glob
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from PIL import Image  # noqa: E402
+
+from app.services.media_service import THUMB_FORMATS, THUMB_WIDTHS, ensure_thumbnail, thumb_filename_for  # noqa: E402
+
+
+class _Job:
+    def __init__(self, i: int, path: str):
+        self.id = i
+        self.filename = os.path.basename(path)
+        self.path = path
+        self.mime = "image/jpeg"
+
+
+def legacy_thumbnails(job: _Job, thumbs_dir: str) -> None:
+    """Bisheriger Pfad: Original komplett laden, jede Größe einzeln daraus skalieren."""
+    with Image.open(job.path) as img:
+        img.load()
+        source = img.copy()
+    for w in THUMB_WIDTHS:
+        for fmt in THUMB_FORMATS:
+            out = source.copy()
+            out.thumbnail((w, w))
+            if out.mode not in ("RGB", "L"):
+                out = out.convert("RGB")
+            pil_format, _ext, _mime, opts = THUMB_FORMATS[fmt]
+            out.save(os.path.join(thumbs_dir, thumb_filename_for(job.id, "bench", w, fmt)), format=pil_format, **opts)
+
+
+def fast_thumbnails(job: _Job, thumbs_dir: str) -> None:
+    ensure_thumbnail(job, thumbs_dir, "bench")
+
+
+def _maxrss_mib() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux: KiB
+
+
+def _worker(method: str, files: list, out) -> None:
+    fn = legacy_thumbnails if method == "legacy" else fast_thumbnails
+    base = _maxrss_mib()
+    times = []
+    with tempfile.TemporaryDirectory() as thumbs_dir:
+        for i, path in enumerate(files):
+            t0 = time.perf_counter()
+            fn(_Job(i, path), thumbs_dir)
+            times.append(time.perf_counter() - t0)
+    out.put((method, statistics.median(times), sum(times), _maxrss_mib() - base))
+
+
+def make_corpus(directory: str, count: int, megapixels: int) -> list:
+    """Synthetische Fotos: Rauschen + Verlauf, damit libjpeg realistisch zu tun hat."""
+    w = int((megapixels * 1_000_000 * 3 / 2) ** 0.5)
+    h = w * 2 // 3
+    noise = Image.effect_noise((w, h), 64).convert("RGB")
+    gradient = Image.linear_gradient("L").resize((w, h)).convert("RGB")
+    base = Image.blend(noise, gradient, 0.5)
+    files = []
+    for i in range(count):
+        path = os.path.join(directory, f"photo_{i}.jpg")
+        base.rotate(i * 7, expand=False).save(path, format="JPEG", quality=90)
+        files.append(path)
+    return files
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--corpus", help="Verzeichnis mit *.jpg (sonst synthetisch)")
+    ap.add_argument("--count", type=int, default=8)
+    ap.add_argument("--mp", type=int, default=24, help="Megapixel der synthetischen Fotos")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx = multiprocessing.get_context("spawn")
+        if args.corpus:
+            files = sorted(glob.glob(os.path.join(os.path.expanduser(args.corpus), "*.jp*g")))[:args.count]
+        else:
+            print(f"Erzeuge {args.count} synthetische Fotos ({args.mp} MP) …")
+            # eigener Prozess: ru_maxrss vererbt sich, der Elternprozess soll klein bleiben
+            with ctx.Pool(1) as pool:
+                files = pool.apply(make_corpus, (tmp, args.count, args.mp))
+        if not files:
+            sys.exit("Keine JPEGs gefunden.")
+
+        out = ctx.Queue()
+        print(f"{'pfad':<7} | {'bilder':>6} | {'median ms':>10} | {'gesamt s':>8} | {'peak RSS MiB':>12}")
+        print("-" * 56)
+        for method in ("legacy", "fast"):
+            proc = ctx.Process(target=_worker, args=(method, files, out))
+            proc.start()
+            name, med, total, rss = out.get()
+            proc.join()
+            print(f"{name:<7} | {len(files):>6} | {med * 1000:>10.1f} | {total:>8.2f} | {rss:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
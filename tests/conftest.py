@@ -0,0 +1,118 @@
+# tests/conftest.py
+"""
+Gemeinsame Fixtures: App mit eigener SQLite-Datei und eigenem Medienordner
+in einem Temp-Verzeichnis. DATABASE_URL muss vor dem ersten Import von
+app.db gesetzt sein (die Engine entsteht beim Import).
+"""
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+import pytest
+from sqlalchemy import event
+
+_TMP = tempfile.mkdtemp(prefix="slidepi-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP, 'test.db')}"
+os.environ["THUMB_PACK"] = "0"
+os.environ["TRANSCODE"] = "0"
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+SAMPLE_IMAGE = os.path.join(ROOT, "app", "media", "Schaltplan.png")
+
+import app.db as app_db  # noqa: E402
+from app import create_app  # noqa: E402
+from app.db import get_session  # noqa: E402
+from app.models.media import Media  # noqa: E402
+from app.services import ingest_service  # noqa: E402
+from app.services.media_service import refresh_media_version  # noqa: E402
+from app.services.playlist_service import add_item_to_playlist_end, get_or_create_default_playlist  # noqa: E402
+
+_names = itertools.count()
+
+
+@pytest.fixture(scope="session")
+def app():
+    app = create_app()
+    app.config["TESTING"] = True
+    app.jinja_loader  # Template-Loader (cached) noch mit dem Paketpfad anlegen
+    app.root_path = _TMP  # Medienordner = <tmp>/media
+    os.makedirs(os.path.join(_TMP, "media"), exist_ok=True)
+    yield app
+    ingest_service._queue.join()  # Hintergrund-Ingest nicht gegen die gelöschte DB laufen lassen
+    shutil.rmtree(_TMP, ignore_errors=True)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def db(app):
+    session = get_session()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def media_dir(app):
+    return os.path.join(app.root_path, "media")
+
+
+@pytest.fixture
+def admin_client(client):
+    with client.session_transaction() as s:
+        s["user"] = {"username": "admin", "role": "admin"}
+    return client
+
+
+@pytest.fixture
+def count_sql():
+    """
+    count_sql(fn) -> (Ergebnis von fn(), Liste der SQL-Statements dieses Threads).
+    Statements der Hintergrund-Worker (Ingest) zählen nicht mit.
+    """
+    def count(fn):
+        statements = []
+        me = threading.get_ident()
+
+        def listener(*args, **kwargs):
+            if threading.get_ident() == me:
+                statements.append(args[2])
+
+        event.listen(app_db.engine, "before_cursor_execute", listener)
+        try:
+            result = fn()
+        finally:
+            event.remove(app_db.engine, "before_cursor_execute", listener)
+        return result, statements
+    return count
+
+
+@pytest.fixture
+def make_media(db, media_dir):
+    """Legt ein Bild-Medium (Kopie von SAMPLE_IMAGE) an; gibt das Media-Objekt zurück."""
+    def make(mime: str = "image/png", source: str = SAMPLE_IMAGE, **columns) -> Media:
+        name = f"m{next(_names)}{os.path.splitext(source)[1]}"
+        path = shutil.copy(source, os.path.join(media_dir, name))
+        m = Media(filename=name, path=path, mime=mime, **columns)
+        refresh_media_version(m)
+        db.add(m)
+        db.commit()
+        return m
+    return make
+
+
+@pytest.fixture
+def active_item(db, make_media):
+    """Medium + Item am Ende der aktiven Playlist; gibt (playlist_id, item_id, media_id) zurück."""
+    def add(**columns):
+        m = make_media(**columns)
+        pl = get_or_create_default_playlist(db)
+        return pl.id, add_item_to_playlist_end(db, pl.id, m.id).id, m.id
+    return add
@@ -0,0 +1,228 @@
+# tests/test_api.py
+"""/api/feed und /api/feed/stream."""
+import threading
+
+import app.blueprints.api.routes as api_routes
+import app.services.device_service as device_service
+import app.services.feed_cache as feed_cache
+from app.models.device import Device
+from app.services.feed_cache import current_generation, invalidate_feed_cache
+from app.services.playlist_service import add_item_to_playlist_end, create_playlist, set_item_duration
+from app.services.revision_service import bump_global_revision
+from app.services.settings_service import set_setting
+
+
+def _events(resp):
+    """Iteriert die SSE-Blöcke eines ungepufferten Test-Responses."""
+    for chunk in resp.response:
+        yield chunk.decode() if isinstance(chunk, bytes) else chunk
+
+
+# ---------------------------
+# Push-Kanal
+# ---------------------------
+
+def test_stream_wakes_on_invalidation(client):
+    resp = client.get("/api/feed/stream", buffered=False)
+    try:
+        events = _events(resp)
+        assert next(events).startswith("retry:")
+        assert next(events) == f"event: revision\ndata: {current_generation()}\n\n"
+
+        threading.Timer(0.05, invalidate_feed_cache).start()
+        assert next(events) == f"event: revision\ndata: {current_generation()}\n\n"
+    finally:
+        resp.close()
+
+
+def test_stream_heartbeat_revalidates(client, db, active_item, monkeypatch):
+    monkeypatch.setattr(api_routes, "SSE_HEARTBEAT_S", 0.05)
+    monkeypatch.setattr(feed_cache, "REVALIDATE_S", 0.0)
+    active_item()
+    client.get("/api/feed")
+
+    resp = client.get("/api/feed/stream", buffered=False)
+    try:
+        events = _events(resp)
+        next(events), next(events)
+        # Änderung aus einem anderen Prozess: Revision erhöht, Cache nicht invalidiert
+        bump_global_revision(db)
+        db.commit()
+        for _ in range(5):
+            event = next(events)
+            if event.startswith("event: revision"):
+                break
+        assert event.startswith("event: revision")
+    finally:
+        resp.close()
+
+
+def test_stream_limit(client, app, monkeypatch):
+    monkeypatch.setitem(app.config, "SSE_MAX_STREAMS", 1)
+    first = client.get("/api/feed/stream", buffered=False)
+    try:
+        r = client.get("/api/feed/stream")
+        assert r.status_code == 503
+        assert r.headers["Retry-After"]
+    finally:
+        first.close()
+    second = client.get("/api/feed/stream", buffered=False)
+    assert second.status_code == 200
+    second.close()
+
+
+# ---------------------------
+# ETag / 304
+# ---------------------------
+
+def test_feed_etag_and_not_modified(client, active_item):
+    item_id = active_item()[1]
+    r = client.get("/api/feed")
+    assert r.status_code == 200
+    etag = r.headers["ETag"]
+    assert any(it["playlist_item_id"] == item_id for it in r.json["feed"])
+
+    r = client.get("/api/feed", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.headers["ETag"] == etag
+    assert r.data == b""
+
+
+def test_feed_etag_changes_after_edit(client, db, active_item):
+    item_id = active_item()[1]
+    etag = client.get("/api/feed").headers["ETag"]
+
+    set_item_duration(db, item_id, 3)
+
+    r = client.get("/api/feed", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["ETag"] != etag
+    item = next(it for it in r.json["feed"] if it["playlist_item_id"] == item_id)
+    assert item["duration"] == 3
+
+
+def test_not_modified_after_restart(client, active_item):
+    active_item()
+    etag = client.get("/api/feed").headers["ETag"]
+    invalidate_feed_cache()  # leerer Cache wie nach einem Neustart
+
+    assert client.get("/api/feed", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_only_feed_settings_change_etag(client, active_item):
+    active_item()
+    etag = client.get("/api/feed").headers["ETag"]
+
+    set_setting("theme", "light")
+    set_setting("login_timeout_minutes", "45")
+    assert client.get("/api/feed", headers={"If-None-Match": etag}).status_code == 304
+
+    set_setting("default_duration", "11")
+    r = client.get("/api/feed", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    etag = r.headers["ETag"]
+
+    set_setting("default_duration", "11")  # unveränderter Wert
+    assert client.get("/api/feed", headers={"If-None-Match": etag}).status_code == 304
+
+
+# ---------------------------
+# Delta (?since=<revision>)
+# ---------------------------
+
+def test_feed_delta_since_revision(client, db, active_item):
+    item_id = active_item()[1]
+    old = client.get("/api/feed").json["revision"]
+
+    set_item_duration(db, item_id, 4)
+
+    r = client.get(f"/api/feed?since={old}")
+    assert r.status_code == 200
+    assert r.json["delta"] is True and r.json["since"] == old
+    assert [it["playlist_item_id"] for it in r.json["modified"]] == [item_id]
+    assert r.json["inserted"] == r.json["removed"] == r.json["moved"] == []
+
+
+def test_feed_delta_unknown_revision_falls_back_to_full(client, active_item):
+    active_item()
+    r = client.get("/api/feed?since=0.0.0")
+    assert r.status_code == 200
+    assert "delta" not in r.json and r.json["feed"]
+
+
+# ---------------------------
+# Spaltenformat (?format=compact)
+# ---------------------------
+
+def test_compact_feed_matches_full_feed(client, active_item):
+    item_id = active_item()[1]
+    full = client.get("/api/feed")
+
+    r = client.get("/api/feed?format=compact")
+    assert r.status_code == 200
+    assert r.headers["ETag"] == full.headers["ETag"]
+    body = r.json
+    assert body["format"] == "columnar" and body["count"] == len(full.json["feed"])
+    cols = body["columns"]
+    assert cols["playlist_item_id"] == [it["playlist_item_id"] for it in full.json["feed"]]
+    i = cols["playlist_item_id"].index(item_id)
+    assert body["mimes"][cols["mime"][i]] == "image/png"
+
+    r = client.get("/api/feed?format=compact", headers={"If-None-Match": full.headers["ETag"]})
+    assert r.status_code == 304
+
+
+def test_compact_feed_warm_without_sql(client, active_item, count_sql):
+    active_item()
+    client.get("/api/feed")
+
+    r, statements = count_sql(lambda: client.get("/api/feed?format=compact"))
+    assert r.status_code == 200
+    assert statements == []
+
+
+# ---------------------------
+# Displays (?device=<id>, POST /api/devices/<id>)
+# ---------------------------
+
+def test_feed_rejects_invalid_device_id(client):
+    r = client.get("/api/feed?device=" + "x" * 65)
+    assert r.status_code == 400
+    assert client.get("/api/feed?device=a/b").status_code == 400
+
+
+def test_assign_device_validation(admin_client):
+    assert admin_client.post("/api/devices/a b", json={}).status_code == 400
+    assert admin_client.post("/api/devices/d1", json={"playlist_id": "1"}).status_code == 400
+    assert admin_client.post("/api/devices/d1", json={"name": 5}).status_code == 400
+
+
+def test_unknown_device_gets_active_playlist_without_row(client, db, active_item):
+    item_id = active_item()[1]
+
+    r = client.get("/api/feed?device=unbekannt-1")
+    assert r.status_code == 200
+    assert any(it["playlist_item_id"] == item_id for it in r.json["feed"])
+    assert db.get(Device, "unbekannt-1") is None
+
+
+def test_assigned_device_gets_its_playlist(admin_client, db, make_media, active_item):
+    active_item()
+    other = create_playlist(db, "Foyer")
+    foyer_item = add_item_to_playlist_end(db, other.id, make_media().id).id
+
+    r = admin_client.post("/api/devices/foyer-1", json={"playlist_id": other.id, "name": "Foyer"})
+    assert r.status_code == 200
+    assert db.get(Device, "foyer-1").playlist_id == other.id
+
+    r = admin_client.get("/api/feed?device=foyer-1")
+    assert [it["playlist_item_id"] for it in r.json["feed"]] == [foyer_item]
+    assert r.json["revision"].startswith(f"{other.id}.")
+
+
+def test_device_states_are_bounded(client, monkeypatch):
+    monkeypatch.setattr(device_service, "MAX_DEVICE_STATES", 4)
+    for i in range(10):
+        client.get(f"/api/feed?device=lru-{i}")
+    assert list(device_service._states)[-4:] == [f"lru-{i}" for i in range(6, 10)]
+    assert len(device_service._states) == 4
@@ -0,0 +1,576 @@
+# tests/test_media.py
+"""Medien-Auslieferung und Upload-/Speicherpfade."""
+import io
+import itertools
+import json
+import os
+import threading
+import time
+
+import pytest
+from PIL import Image
+from sqlalchemy import select
+
+import app.blueprints.media.routes as media_routes
+import app.services.feed_cache as feed_cache
+import app.services.media_cache as media_cache
+import app.services.media_service as media_service
+from app.services import ingest_service
+from app.models.folder import Folder
+from app.models.media import Media
+from app.models.media_asset import MediaAsset
+from app.models.upload_session import UploadSession
+from app.services.asset_service import (
+    ORPHAN_GRACE_S,
+    collect_asset_garbage,
+    register_media_assets,
+    sweep_legacy_thumbnails,
+)
+from app.services.media_cache import evict_media_entry, get_media_entry
+from app.services.media_service import ensure_thumbnail, remux_faststart, save_image_atomic
+from app.services.single_flight import SingleFlight, thumb_flight
+from app.services.storage_service import is_sharded, migrate_media_storage, migration_token, sharded_path
+from app.services.upload_service import contiguous_offset, is_complete, merge_ranges
+from conftest import SAMPLE_IMAGE
+
+
+# ---------------------------
+# Lookup-Cache für /media/raw und /media/thumb (media_cache)
+# ---------------------------
+
+def test_media_cache_hit_without_sql(make_media, media_dir, count_sql):
+    m = make_media()
+    evict_media_entry(m.id)
+    entry, statements = count_sql(lambda: get_media_entry(m.id, media_dir))
+    assert entry.path == m.path and entry.version == m.version_token
+    assert statements
+
+    again, statements = count_sql(lambda: get_media_entry(m.id, media_dir))
+    assert again is entry
+    assert statements == []
+
+
+def test_media_cache_evicts_least_recently_used(make_media, media_dir, monkeypatch):
+    monkeypatch.setattr(media_cache, "MAX_ENTRIES", 2)
+    a, b, c = make_media(), make_media(), make_media()
+    for m in (a, b):
+        get_media_entry(m.id, media_dir)
+    get_media_entry(a.id, media_dir)  # a zuletzt benutzt -> b fällt raus
+
+    get_media_entry(c.id, media_dir)
+
+    assert list(media_cache._entries) == [a.id, c.id]
+
+
+def test_raw_serves_cached_entry_until_evicted(admin_client, make_media):
+    m = make_media()
+    assert admin_client.get(f"/media/raw/{m.id}").status_code == 200
+
+    assert admin_client.post(f"/media/delete/{m.id}").status_code == 302
+    assert admin_client.get(f"/media/raw/{m.id}").status_code == 404
+
+
+# ---------------------------
+# Versionierte URLs (immutable) und veraltete Versionen
+# ---------------------------
+
+def test_versioned_raw_is_immutable(client, make_media):
+    m = make_media()
+    r = client.get(f"/media/raw/{m.id}/{m.version_token}")
+    assert r.status_code == 200
+    assert r.cache_control.immutable and r.cache_control.public
+    assert r.cache_control.max_age == 31536000
+    assert r.headers["ETag"] == f'"{m.version_token}"'
+
+    r = client.get(f"/media/raw/{m.id}")
+    assert r.status_code == 200
+    assert not r.cache_control.immutable
+
+
+def test_versioned_thumb_is_immutable(client, make_media):
+    m = make_media()
+    r = client.get(f"/media/thumb/{m.id}/{m.version_token}?w=160")
+    assert r.status_code == 200
+    assert r.cache_control.immutable
+    assert "Accept" in r.vary
+
+
+def test_stale_version_redirects_to_current(client, make_media):
+    m = make_media()
+    r = client.get(f"/media/thumb/{m.id}/veraltet?w=160")
+    assert r.status_code == 302
+    assert r.headers["Location"].endswith(f"/media/thumb/{m.id}/{m.version_token}?w=160")
+    assert r.headers["Cache-Control"] == "no-cache"
+
+    r = client.get(f"/media/raw/{m.id}/veraltet")
+    assert r.status_code == 302
+    assert r.headers["Location"].endswith(f"/media/raw/{m.id}/{m.version_token}")
+
+
+# ---------------------------
+# Faststart-Remux
+# ---------------------------
+
+def test_remux_only_touches_mp4(tmp_path):
+    mov = tmp_path / "clip.mov"
+    mov.write_bytes(b"\x00\x00\x00\x08mdat")
+    assert remux_faststart(str(mov), "video/quicktime") is None
+    assert mov.read_bytes() == b"\x00\x00\x00\x08mdat"
+
+
+# ---------------------------
+# Transparenz in Derivaten und Thumbnails
+# ---------------------------
+
+def _transparent_png(path):
+    img = Image.new("RGBA", (400, 300), (0, 0, 0, 0))
+    img.paste((0, 0, 0, 255), (0, 140, 400, 160))  # schwarzer Strich auf transparent
+    img.save(path)
+    return str(path)
+
+
+def test_display_derivatives_keep_transparency(client, make_media, tmp_path):
+    m = make_media(source=_transparent_png(tmp_path / "alpha.png"))
+
+    webp = client.get(f"/media/display/{m.id}/{m.version_token}", headers={"Accept": "image/webp"})
+    with Image.open(io.BytesIO(webp.data)) as img:
+        assert img.mode == "RGBA"
+        assert img.getpixel((5, 5))[3] == 0
+
+    jpeg = client.get(f"/media/display/{m.id}/{m.version_token}")
+    with Image.open(io.BytesIO(jpeg.data)) as img:
+        assert img.format == "JPEG"
+        assert min(img.convert("RGB").getpixel((5, 5))) > 240  # Hintergrund weiß, nicht schwarz
+        assert max(img.convert("RGB").getpixel((200, 150))) < 20
+
+
+def test_thumbnail_jpeg_flattens_onto_background(client, make_media, tmp_path):
+    m = make_media(source=_transparent_png(tmp_path / "alpha-thumb.png"))
+
+    r = client.get(f"/media/thumb/{m.id}/{m.version_token}")
+    with Image.open(io.BytesIO(r.data)) as img:
+        assert min(img.convert("RGB").getpixel((2, 2))) > 240
+
+
+# ---------------------------
+# Single-Flight und atomares Schreiben
+# ---------------------------
+
+def test_parallel_thumbnail_requests_render_once(make_media, tmp_path, monkeypatch):
+    m = make_media()
+    calls = []
+    render = media_service._render_thumbnail_set
+
+    def slow_render(*args):
+        calls.append(1)
+        time.sleep(0.05)
+        render(*args)
+
+    monkeypatch.setattr(media_service, "_render_thumbnail_set", slow_render)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(ensure_thumbnail(m, str(tmp_path), m.version_token)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert sum(1 for r in results if r) == 1  # nur der Erzeuger meldet neue Dateien
+    assert not thumb_flight._locks
+
+
+def test_single_flight_limits_concurrent_slots():
+    flight = SingleFlight(max_concurrent=2)
+    running, peak, guard = [0], [0], threading.Lock()
+
+    def work(key):
+        with flight.lock(key), flight.slot():
+            with guard:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.02)
+            with guard:
+                running[0] -= 1
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert peak[0] == 2
+    assert not flight._locks
+
+
+def test_failed_atomic_write_keeps_old_file(tmp_path):
+    target = tmp_path / "thumb.jpg"
+    target.write_bytes(b"alt")
+
+    with pytest.raises(Exception):
+        save_image_atomic(Image.new("RGB", (4, 4)), str(target), "KEIN-FORMAT")
+
+    assert target.read_bytes() == b"alt"
+    assert [p.name for p in tmp_path.iterdir()] == ["thumb.jpg"]
+
+
+# ---------------------------
+# Asset-Registry und Garbage Collection
+# ---------------------------
+
+def _assets(db, media_id):
+    return db.execute(select(MediaAsset).where(MediaAsset.media_id == media_id)).scalars().all()
+
+
+def test_thumbnails_registered_and_removed_with_media(admin_client, db, make_media):
+    m = make_media()
+    media_id = m.id
+    assert admin_client.get(f"/media/thumb/{media_id}/{m.version_token}").status_code == 200
+    paths = [a.path for a in _assets(db, media_id)]
+    assert paths and all(os.path.isfile(p) for p in paths)
+
+    admin_client.post(f"/media/delete/{media_id}")
+
+    db.expire_all()
+    assert _assets(db, media_id) == []
+    assert not any(os.path.exists(p) for p in paths)
+
+
+def test_gc_removes_stale_rows_and_old_orphans(db, make_media, tmp_path):
+    m = make_media()
+    stale = tmp_path / f"{m.id}_alt_320.jpg"
+    stale.write_bytes(b"x")
+    register_media_assets(m.id, "alt", "thumb", [("320.jpeg", str(stale))])
+    fresh, old = tmp_path / "frisch.jpg", tmp_path / "alt.jpg"
+    fresh.write_bytes(b"x")
+    old.write_bytes(b"x")
+    past = time.time() - ORPHAN_GRACE_S - 1
+    os.utime(old, (past, past))
+
+    stats = collect_asset_garbage(db, [str(tmp_path)])
+
+    assert stats["stale_rows"] >= 1 and stats["orphan_files"] == 1
+    assert not stale.exists() and not old.exists()
+    assert fresh.exists()  # Registrierung könnte noch folgen
+    assert _assets(db, m.id) == []
+
+
+def test_legacy_thumbnails_swept_once(tmp_path):
+    (tmp_path / "Schaltplan_thumb.jpg").write_bytes(b"x")
+    (tmp_path / "7_abcdef_320.jpg").write_bytes(b"x")
+
+    assert sweep_legacy_thumbnails(str(tmp_path)) == 1
+    assert not (tmp_path / "Schaltplan_thumb.jpg").exists()
+    assert (tmp_path / "7_abcdef_320.jpg").exists()
+
+    (tmp_path / "Neu_thumb.jpg").write_bytes(b"x")
+    assert sweep_legacy_thumbnails(str(tmp_path)) == 0
+
+
+# ---------------------------
+# Chunk-Upload (/media/uploads)
+# ---------------------------
+
+def test_merge_ranges_joins_overlapping_and_adjacent():
+    ranges = merge_ranges([], (10, 20))
+    ranges = merge_ranges(ranges, (30, 40))
+    assert ranges == [(10, 20), (30, 40)]
+
+    assert merge_ranges(ranges, (20, 30)) == [(10, 40)]      # angrenzend an beide Seiten
+    assert merge_ranges(ranges, (15, 35)) == [(10, 40)]      # überlappend
+    assert merge_ranges(ranges, (0, 5)) == [(0, 5), (10, 20), (30, 40)]
+
+
+def test_merge_ranges_is_idempotent_for_retried_chunks():
+    assert merge_ranges(merge_ranges([], (0, 8)), (0, 8)) == [(0, 8)]
+
+
+def test_contiguous_offset_and_completeness():
+    assert contiguous_offset([]) == 0
+    assert contiguous_offset([(0, 8), (16, 24)]) == 8
+    assert contiguous_offset([(8, 16)]) == 0
+    assert is_complete(UploadSession(size=24, received="[[0, 24]]"))
+    assert not is_complete(UploadSession(size=24, received="[[0, 8], [16, 24]]"))
+    assert is_complete(UploadSession(size=0, received="[]"))
+
+
+def test_chunked_upload_out_of_order(admin_client, db):
+    data = open(SAMPLE_IMAGE, "rb").read()
+    half = len(data) // 2
+    r = admin_client.post("/media/uploads", json={"filename": "chunks.png", "size": len(data), "mime": "image/png"})
+    assert r.status_code == 201
+    url = r.headers["Location"]
+
+    assert admin_client.patch(url, data=data[half:], headers={"Upload-Offset": str(half)}).status_code == 204
+    assert admin_client.head(url).headers["Upload-Offset"] == "0"  # Lücke am Anfang
+    assert admin_client.post(url + "/finalize").status_code == 409
+    r = admin_client.patch(url, data=data[:half], headers={"Upload-Offset": "0"})
+    assert r.headers["Upload-Offset"] == str(len(data))
+
+    r = admin_client.post(url + "/finalize")
+    assert r.status_code == 200
+    assert open(db.get(Media, r.json["id"]).path, "rb").read() == data
+
+
+@pytest.mark.parametrize("folder_id", ["abc", 1.5, True, 999999])
+def test_create_upload_rejects_bad_folder(admin_client, folder_id):
+    r = admin_client.post("/media/uploads", json={"filename": "x.png", "size": 4, "mime": "image/png",
+                                                  "folder_id": folder_id})
+    assert r.status_code == 400
+
+
+def test_create_upload_accepts_existing_folder(admin_client, db):
+    folder = Folder(name="Upload-Ziel")
+    db.add(folder)
+    db.commit()
+    r = admin_client.post("/media/uploads", json={"filename": "x.png", "size": 4, "mime": "image/png",
+                                                  "folder_id": str(folder.id)})
+    assert r.status_code == 201
+    assert admin_client.delete(r.headers["Location"]).status_code == 204
+
+
+# ---------------------------
+# Duplikaterkennung (Inhalts-Hash)
+# ---------------------------
+
+def _unique_png(seed):
+    buf = io.BytesIO()
+    Image.new("RGB", (8, 8), (seed % 256, seed // 256 % 256, 77)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _upload(client, data, name):
+    return client.post("/media/upload", data={"file": (io.BytesIO(data), name, "image/png")},
+                       headers={"Accept": "application/json"}, content_type="multipart/form-data")
+
+
+def _originals(media_dir):
+    """Alle Mediendateien (ohne _thumbs/_derivatives/...)."""
+    found = set()
+    for root, dirs, files in os.walk(media_dir):
+        dirs[:] = [d for d in dirs if not d.startswith("_")]
+        found.update(os.path.join(root, f) for f in files if not f.startswith("."))
+    return found
+
+
+def test_duplicate_upload_returns_existing_media(admin_client, media_dir):
+    data = _unique_png(1)
+    first = _upload(admin_client, data, "original.png").json
+    files_before = _originals(media_dir)
+
+    second = _upload(admin_client, data, "kopie.png").json
+
+    assert first["duplicate"] is False
+    assert second["duplicate"] is True and second["id"] == first["id"]
+    assert second["filename"] == first["filename"]
+    assert _originals(media_dir) == files_before  # gespeicherte Kopie wieder verworfen
+
+
+def test_duplicate_detected_for_chunked_upload(admin_client):
+    data = _unique_png(2)
+    first = _upload(admin_client, data, "chunk-original.png").json
+    r = admin_client.post("/media/uploads", json={"filename": "chunk-kopie.png", "size": len(data),
+                                                  "mime": "image/png"})
+    url = r.headers["Location"]
+    admin_client.patch(url, data=data, headers={"Upload-Offset": "0"})
+
+    r = admin_client.post(url + "/finalize")
+    assert r.json["duplicate"] is True and r.json["id"] == first["id"]
+
+
+def test_different_content_is_not_a_duplicate(admin_client):
+    a = _upload(admin_client, _unique_png(3), "a.png").json
+    b = _upload(admin_client, _unique_png(4), "a.png").json
+    assert b["duplicate"] is False and b["id"] != a["id"]
+
+
+# ---------------------------
+# Batch-Upload und Fortschritt
+# ---------------------------
+
+def test_batch_upload_rejects_per_file(admin_client):
+    files = [(io.BytesIO(_unique_png(10)), "gut.png", "image/png"),
+             (io.BytesIO(b"hallo"), "notiz.txt", "text/plain")]
+    r = admin_client.post("/media/upload/batch", data={"files": files}, content_type="multipart/form-data")
+
+    assert r.status_code == 200
+    ok, rejected = r.json["items"]
+    assert ok["upload_name"] == "gut.png" and ok["id"] and ok["status"] == "pending"
+    assert rejected == {"filename": "notiz.txt", "error": "Nicht unterstützter Dateityp."}
+
+    assert admin_client.post("/media/upload/batch", data={}, content_type="multipart/form-data").status_code == 400
+
+
+def test_ingest_progress_until_done(admin_client):
+    files = [(io.BytesIO(_unique_png(20 + i)), f"serie{i}.png", "image/png") for i in range(3)]
+    items = admin_client.post("/media/upload/batch", data={"files": files},
+                              content_type="multipart/form-data").json["items"]
+    ids = [it["id"] for it in items]
+
+    ingest_service._queue.join()
+    r = admin_client.get("/media/ingest?ids=" + ",".join(map(str, ids + [999999])))
+
+    by_id = {it["id"]: it for it in r.json["items"]}
+    assert all(by_id[i]["status"] == "ready" for i in ids)
+    assert by_id[999999]["status"] == "missing"
+    assert r.json["done"] is True
+    assert r.headers["Cache-Control"] == "no-store"
+
+    tiles = admin_client.get("/media/tiles?ids=" + ",".join(map(str, ids))).get_data(as_text=True)
+    assert all(f"serie{i}.png" in tiles for i in range(3))
+
+
+# ---------------------------
+# Gestreute Ablage: Reservierung und migrate-storage
+# ---------------------------
+
+def _fail(*args, **kwargs):
+    raise OSError("Platte voll")
+
+
+def test_failed_upload_removes_reserved_file(admin_client, media_dir, monkeypatch):
+    monkeypatch.setattr(media_routes, "save_upload", _fail)
+    before = _originals(media_dir)
+
+    with pytest.raises(OSError):
+        _upload(admin_client, _unique_png(30), "voll.png")
+
+    assert _originals(media_dir) == before
+
+
+def test_failed_batch_file_removes_reserved_file(admin_client, media_dir, monkeypatch):
+    monkeypatch.setattr(media_routes, "save_upload", _fail)
+    before = _originals(media_dir)
+
+    r = admin_client.post("/media/upload/batch", data={"files": [(io.BytesIO(b"x"), "voll.png", "image/png")]},
+                          content_type="multipart/form-data")
+
+    assert r.json["items"] == [{"filename": "voll.png", "error": "Speichern fehlgeschlagen."}]
+    assert _originals(media_dir) == before
+
+
+_flat_runs = itertools.count()
+
+
+@pytest.fixture
+def flat_media(db, media_dir):
+    """Drei flach abgelegte Bestandsdateien (Layout vor der Streuung)."""
+    ids = []
+    run = next(_flat_runs)
+    for i in range(3):
+        path = os.path.join(media_dir, f"flat{run}-{i}.bin")
+        with open(path, "wb") as f:
+            f.write(b"x" * (i + 1))
+        m = Media(filename=os.path.basename(path), path=path, mime="image/png")
+        db.add(m)
+        db.commit()
+        ids.append(m.id)
+    return ids
+
+
+def test_migrate_dry_run_changes_nothing(db, media_dir, flat_media):
+    paths = [db.get(Media, i).path for i in flat_media]
+
+    stats = migrate_media_storage(db, media_dir, dry_run=True)
+
+    assert stats["moved"] >= 3
+    assert [db.get(Media, i).path for i in flat_media] == paths
+    assert all(os.path.isfile(p) for p in paths)
+
+
+def test_migrate_resumes_after_partial_run(db, media_dir, flat_media):
+    linked, renamed, untouched = (db.get(Media, i) for i in flat_media)
+    stat_before = os.stat(linked.path)
+
+    # Abbruch nach dem Hardlink, vor dem Commit
+    linked_new = sharded_path(media_dir, migration_token(linked.id, linked.path), linked.filename)
+    os.makedirs(os.path.dirname(linked_new), exist_ok=True)
+    os.link(linked.path, linked_new)
+    # Abbruch nach dem Rename (Dateisystem ohne Hardlinks), vor dem Commit
+    renamed_new = sharded_path(media_dir, migration_token(renamed.id, renamed.path), renamed.filename)
+    os.makedirs(os.path.dirname(renamed_new), exist_ok=True)
+    old_renamed = renamed.path
+    os.rename(renamed.path, renamed_new)
+
+    stats = migrate_media_storage(db, media_dir)
+
+    assert stats["moved"] >= 3  # ggf. auch flache Dateien anderer Tests
+    assert linked.path == linked_new and renamed.path == renamed_new
+    assert is_sharded(media_dir, untouched.path)
+    assert all(os.path.isfile(m.path) for m in (linked, renamed, untouched))
+    assert not os.path.exists(old_renamed)
+    assert not any(name.startswith("flat") for name in os.listdir(media_dir))
+    # Größe/mtime bleiben -> Versions-Tokens (Thumbnails) bleiben gültig
+    assert os.stat(linked.path).st_mtime_ns == stat_before.st_mtime_ns
+
+    again = migrate_media_storage(db, media_dir)
+    assert again["moved"] == 0 and again["already"] >= 3
+
+
+def test_migrate_cli_reaches_running_server(app, client, active_item, monkeypatch):
+    monkeypatch.setattr(feed_cache, "REVALIDATE_S", 0.0)
+    media_id = active_item()[2]
+    assert client.get(f"/media/raw/{media_id}").status_code == 200  # Pfad jetzt im media_cache
+    client.get("/api/feed")  # Snapshot, den die Revalidierung prüft
+
+    result = app.test_cli_runner().invoke(args=["slidepi", "migrate-storage"])
+    assert result.exit_code == 0 and "Verschoben: 0" not in result.output
+
+    client.get("/api/feed")  # Revalidierung sieht die neue globale Revision
+    assert client.get(f"/media/raw/{media_id}").status_code == 200
+
+
+# ---------------------------
+# Metadaten-Probe: ein ffprobe-Lauf, Folgeschritte nutzen das Ergebnis
+# ---------------------------
+
+_FFPROBE_JSON = json.dumps({
+    "streams": [
+        {"codec_type": "audio", "codec_name": "aac"},
+        {"codec_type": "video", "codec_name": "hevc", "width": 3840, "height": 2160, "pix_fmt": "yuv420p10le",
+         "avg_frame_rate": "30/1", "bit_rate": "20000000"},
+    ],
+    "format": {"duration": "12.4"},
+}).encode()
+
+
+def _no_ffprobe(*args, **kwargs):
+    raise AssertionError("ffprobe erneut aufgerufen")
+
+
+def test_probe_reports_audio_and_playability(tmp_path, monkeypatch):
+    clip = tmp_path / "clip.mp4"
+    clip.write_bytes(b"x" * 10)
+    calls = []
+    monkeypatch.setattr(media_service, "ffprobe_available", lambda: True)
+    monkeypatch.setattr(media_service.subprocess, "check_output", lambda cmd, **kw: calls.append(cmd) or _FFPROBE_JSON)
+
+    info = media_service.probe_media(str(clip), "video/mp4")
+
+    assert len(calls) == 1
+    assert info["has_audio"] is True and info["playable"] is False
+    assert (info["codec"], info["width"], info["height"], info["duration"]) == ("hevc", 3840, 2160, 12.4)
+    m = Media(filename="clip.mp4", path=str(clip), mime="video/mp4")
+    media_service.apply_media_info(m, info)
+    assert m.has_audio is True and m.duration_s == 12 and m.file_size == 10
+
+
+def test_remux_uses_stored_audio_flag(tmp_path, monkeypatch):
+    clip = tmp_path / "clip.mp4"
+    clip.write_bytes(b"\x00\x00\x00\x08moov\x00\x00\x00\x08mdat")
+    monkeypatch.setattr(media_service.shutil, "which", lambda name: f"/usr/bin/{name}")
+    monkeypatch.setattr(media_service, "ffprobe_available", lambda: False)
+    monkeypatch.setattr(media_service, "_has_audio_stream", _no_ffprobe)
+
+    assert remux_faststart(str(clip), "video/mp4", has_audio=False) == 0
+    assert remux_faststart(str(clip), "video/mp4") is None  # ohne Probe-Ergebnis und ohne ffprobe
+
+
+def test_poster_sampling_uses_stored_duration(monkeypatch):
+    times = []
+    monkeypatch.setattr(media_service.shutil, "which", lambda name: f"/usr/bin/{name}")
+    monkeypatch.setattr(media_service, "probe_video_duration", _no_ffprobe)
+    monkeypatch.setattr(media_service, "grab_video_frame", lambda path, t, w: times.append(t))
+
+    assert media_service.sample_video_frames("clip.mp4", 320, duration=10) == []
+    assert times == media_service.video_sample_times(10)
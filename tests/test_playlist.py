@@ -0,0 +1,164 @@
+# tests/test_playlist.py
+"""Feed-Lesepfad (playlist_service) und Feed-Cache."""
+import pytest
+
+from app.services.feed_cache import (
+    FeedEntry,
+    compute_feed_delta,
+    current_generation,
+    get_cached_feed,
+    get_or_build_feed,
+    invalidate_feed_cache,
+)
+from app.services.playlist_service import (
+    FeedRow,
+    add_item_to_playlist_end,
+    create_playlist,
+    delete_playlist,
+    list_active_feed_rows,
+    remove_item,
+    replace_playlist_items,
+    set_active_playlist,
+    set_item_duration,
+    sort_playlist,
+)
+from app.services.settings_service import set_setting
+
+
+# ---------------------------
+# Lesepfad: ein Core-JOIN, keine ORM-Objekte
+# ---------------------------
+
+def test_feed_rows_single_join_statement(db, active_item, count_sql):
+    ids = [active_item()[1] for _ in range(3)]
+
+    rows, statements = count_sql(lambda: list_active_feed_rows(db))
+
+    assert len(statements) == 1
+    assert "JOIN" in statements[0].upper()
+    assert all(type(r) is FeedRow for r in rows)
+    mine = [r for r in rows if r.playlist_item_id in ids]
+    assert [r.playlist_item_id for r in mine] == ids
+    assert [r.position for r in rows] == sorted(r.position for r in rows)
+    assert all(r.mime == "image/png" and r.version for r in mine)
+
+
+# ---------------------------
+# Feed-Cache: jeder feed-relevante Schreibpfad verwirft den Snapshot
+# ---------------------------
+
+def _primed(client, playlist_id):
+    assert client.get("/api/feed").status_code == 200
+    assert get_cached_feed(playlist_id) is not None
+    return current_generation()
+
+
+@pytest.mark.parametrize("mutate", [
+    lambda db, pid, item_id, media_id: add_item_to_playlist_end(db, pid, media_id),
+    lambda db, pid, item_id, media_id: remove_item(db, item_id),
+    lambda db, pid, item_id, media_id: sort_playlist(db, pid, [item_id]),
+    lambda db, pid, item_id, media_id: set_item_duration(db, item_id, 7),
+    lambda db, pid, item_id, media_id: replace_playlist_items(db, pid, [media_id]),
+    lambda db, pid, item_id, media_id: set_active_playlist(db, pid),
+    lambda db, pid, item_id, media_id: set_setting("default_duration", "12"),
+], ids=["add", "remove", "sort", "duration", "replace", "activate", "setting"])
+def test_mutators_invalidate_feed_cache(client, db, active_item, mutate):
+    pid, item_id, media_id = active_item()
+    gen = _primed(client, pid)
+
+    mutate(db, pid, item_id, media_id)
+
+    assert get_cached_feed(pid) is None
+    assert current_generation() > gen
+
+
+def test_delete_playlist_invalidates_feed_cache(client, db, active_item):
+    pid = active_item()[0]
+    other = create_playlist(db, "weg")
+    _primed(client, pid)
+
+    assert delete_playlist(db, other.id)
+    assert get_cached_feed(pid) is None
+
+
+@pytest.mark.parametrize("action", ["rename", "delete"])
+def test_media_routes_invalidate_feed_cache(admin_client, active_item, action):
+    pid, _, media_id = active_item()
+    gen = _primed(admin_client, pid)
+
+    data = {"new_name": "neu.png"} if action == "rename" else {}
+    assert admin_client.post(f"/media/{action}/{media_id}", data=data).status_code == 302
+
+    assert get_cached_feed(pid) is None
+    assert current_generation() > gen
+
+
+# ---------------------------
+# Delta-Berechnung (feed_cache.compute_feed_delta)
+# ---------------------------
+
+def _item(pid, position, duration=10, media_id=1):
+    return {"playlist_item_id": pid, "position": position, "media_id": media_id, "duration": duration}
+
+
+def _snapshot(revision, items, playlist_id=900):
+    """Baut einen Snapshot über get_or_build_feed, damit er in der Historie landet."""
+    invalidate_feed_cache(playlist_id)
+    entry = FeedEntry(playlist_id, b"{}", f'"{revision}"', revision, items)
+    return get_or_build_feed(lambda: entry, playlist_id)
+
+
+def test_delta_reports_inserted_modified_moved_removed():
+    _snapshot("900.1.0", [_item(1, 1), _item(2, 2), _item(3, 3)])
+    new = _snapshot("900.2.0", [_item(3, 1), _item(1, 2, duration=5), _item(4, 3, media_id=7)])
+
+    delta = compute_feed_delta("900.1.0", new)
+
+    assert delta["inserted"] == [_item(4, 3, media_id=7)]
+    assert delta["modified"] == [_item(1, 2, duration=5)]  # geändert + verschoben -> nur modified
+    assert delta["moved"] == [{"playlist_item_id": 3, "position": 1}]
+    assert delta["removed"] == [2]
+
+
+def test_delta_against_same_revision_is_empty():
+    entry = _snapshot("900.3.0", [_item(1, 1), _item(2, 2)])
+
+    assert compute_feed_delta("900.3.0", entry) == {"inserted": [], "modified": [], "moved": [], "removed": []}
+
+
+def test_delta_unknown_revision_needs_full_feed():
+    entry = _snapshot("900.4.0", [_item(1, 1)])
+
+    assert compute_feed_delta("900.0.0", entry) is None
+
+
+# ---------------------------
+# Nicht abspielbare Originale (media.playable = False)
+# ---------------------------
+
+@pytest.mark.parametrize("status, in_feed", [
+    ("pending", False), ("running", False), ("failed", True), ("skipped", True), (None, True),
+])
+def test_unplayable_hidden_only_while_rendition_runs(db, active_item, status, in_feed):
+    item_id = active_item(mime="video/mp4", playable=False, rendition_status=status)[1]
+
+    rows = {r.playlist_item_id: r for r in list_active_feed_rows(db)}
+
+    assert (item_id in rows) is in_feed
+    if in_feed:
+        assert rows[item_id].playable is False
+
+
+def test_ready_rendition_is_playable(db, active_item):
+    item_id = active_item(mime="video/quicktime", playable=False, rendition_status="ready")[1]
+
+    row = next(r for r in list_active_feed_rows(db) if r.playlist_item_id == item_id)
+
+    assert row.playable is True and row.mime == "video/mp4"
+
+
+def test_views_show_missing_rendition(admin_client, active_item):
+    active_item(mime="video/mp4", playable=False, rendition_status="failed")
+
+    assert "nicht abspielbar, keine Rendition" in admin_client.get("/media/").get_data(as_text=True)
+    assert "nicht abspielbar, keine Rendition" in admin_client.get("/admin/playlists").get_data(as_text=True)
@@ -0,0 +1,142 @@
+# tests/test_thumb_pack.py
+"""Gepackter Thumbnail-Speicher: Format, Tombstones, Kompaktierung, lock-freies Lesen."""
+import os
+import threading
+
+import app.services.thumb_pack as thumb_pack
+from app.services.thumb_pack import _REC, DATA, MAGIC, PACK_FILENAME, TOMBSTONE, ThumbPack
+
+
+def _pack(tmp_path):
+    return ThumbPack(str(tmp_path / PACK_FILENAME))
+
+
+def _put(pack, tmp_path, **items):
+    files = []
+    for key, data in items.items():
+        path = tmp_path / key
+        path.write_bytes(data)
+        files.append((key, str(path)))
+    return pack.put_files(files)
+
+
+def _records(path):
+    """(Typ, Schlüssel, Daten) aller Records der Datei."""
+    raw = open(path, "rb").read()
+    assert raw[:len(MAGIC)] == MAGIC
+    pos, out = len(MAGIC), []
+    while pos < len(raw):
+        marker, kind, klen, dlen = _REC.unpack_from(raw, pos)
+        assert marker == b"TP"
+        start = pos + _REC.size
+        out.append((kind, raw[start:start + klen].decode(), raw[start + klen:start + klen + dlen]))
+        pos = start + klen + dlen
+    return out
+
+
+def test_put_writes_records_and_removes_loose_files(tmp_path):
+    pack = _pack(tmp_path)
+    assert _put(pack, tmp_path, a=b"AAA", b=b"BB") == ["a", "b"]
+
+    assert _records(pack.path) == [(DATA, "a", b"AAA"), (DATA, "b", b"BB")]
+    assert not (tmp_path / "a").exists()
+    assert pack.get("a") == b"AAA" and "b" in pack
+    assert pack.get("fehlt") is None and "fehlt" not in pack
+
+
+def test_reopen_rebuilds_index_last_record_wins(tmp_path):
+    pack = _pack(tmp_path)
+    _put(pack, tmp_path, a=b"alt")
+    _put(pack, tmp_path, a=b"neu", b=b"B")
+
+    again = _pack(tmp_path)
+    assert again.get("a") == b"neu"
+    assert sorted(again.keys()) == ["a", "b"]
+    assert again.stats()["dead_bytes"] == _REC.size + 1 + 3
+
+
+def test_truncated_tail_is_ignored_and_overwritten(tmp_path):
+    pack = _pack(tmp_path)
+    _put(pack, tmp_path, a=b"AAA")
+    with open(pack.path, "ab") as f:
+        f.write(_REC.pack(b"TP", DATA, 1, 100) + b"x" + b"kurz")  # Stromausfall mitten im Record
+
+    again = _pack(tmp_path)
+    assert again.keys() == ["a"]
+    _put(again, tmp_path, b=b"BB")
+    assert _records(again.path) == [(DATA, "a", b"AAA"), (DATA, "b", b"BB")]
+
+
+def test_discard_writes_tombstones(tmp_path):
+    pack = _pack(tmp_path)
+    _put(pack, tmp_path, a=b"AAA", b=b"BB")
+
+    assert pack.discard(["a", "gibt-es-nicht"]) == 1
+
+    assert _records(pack.path)[-1] == (TOMBSTONE, "a", b"")
+    assert pack.get("a") is None and "a" not in pack
+    assert _pack(tmp_path).keys() == ["b"]
+    assert pack.stats()["dead_bytes"] > 0
+
+
+def test_compact_swaps_in_new_file(tmp_path):
+    pack = _pack(tmp_path)
+    _put(pack, tmp_path, a=b"A" * 100, b=b"B" * 50)
+    pack.discard(["a"])
+    old_ino = os.stat(pack.path).st_ino
+    old_snap = pack._snap
+
+    gained = pack.compact()
+
+    assert gained > 100
+    assert os.stat(pack.path).st_ino != old_ino
+    assert _records(pack.path) == [(DATA, "b", b"B" * 50)]
+    assert pack.get("b") == b"B" * 50 and pack.stats()["dead_bytes"] == 0
+    # Leser mit dem alten Snapshot lesen aus der alten Map weiter
+    off, length = old_snap.index["b"]
+    assert old_snap.mm[off:off + length] == b"B" * 50
+
+
+def test_compact_keeps_records_appended_meanwhile(tmp_path, monkeypatch):
+    pack = _pack(tmp_path)
+    other = _pack(tmp_path)  # zweiter Prozess auf derselben Datei
+    _put(pack, tmp_path, a=b"A" * 100, b=b"BB")
+    pack.discard(["a"])
+    tmp_name = thumb_pack.atomic_tmp_path
+
+    def append_during_copy(path):
+        # läuft nach dem Snapshot, bevor kopiert wird
+        _put(other, tmp_path, c=b"CC")
+        other.discard(["b"])
+        return tmp_name(path)
+
+    monkeypatch.setattr(thumb_pack, "atomic_tmp_path", append_during_copy)
+    pack.compact()
+
+    assert pack.get("c") == b"CC" and pack.get("b") is None
+    assert other.get("c") == b"CC" and "b" not in other
+    assert sorted(_pack(tmp_path).keys()) == ["c"]
+
+
+def test_hits_do_not_take_the_lock(tmp_path):
+    pack = _pack(tmp_path)
+    _put(pack, tmp_path, a=b"AAA")
+    held, release = threading.Event(), threading.Event()
+
+    def hold():
+        with pack._lock:
+            held.set()
+            release.wait(5)
+
+    t = threading.Thread(target=hold)
+    t.start()
+    held.wait(5)
+    try:
+        result = []
+        reader = threading.Thread(target=lambda: result.append((pack.get("a"), "a" in pack)))
+        reader.start()
+        reader.join(1)
+        assert result == [(b"AAA", True)]
+    finally:
+        release.set()
+        t.join()